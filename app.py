@@ -1,11 +1,26 @@
 import os
-from flask import Flask, send_from_directory, jsonify, render_template, request, redirect, url_for
+from flask import Flask, g, session, send_from_directory, jsonify, render_template, request, redirect, url_for
 from flask_cors import CORS
 from flask_login import LoginManager, current_user, login_required
 from flask_wtf.csrf import CSRFProtect
 from flask_migrate import Migrate
 from models import db, User
 from config import Config
+from services.game_counters import game_counters
+from utils.audit import audit_writer
+from utils.ids import id_generator
+from utils.db import upgrade_schema
+from services.bet_ledger import bet_ledger
+from services.payment_gateway import payment_gateway
+from services.identity_cache import identity_cache
+from services.password_hasher import password_hasher
+from services.token_auth import token_auth, bearer_token
+from services.event_hub import event_hub
+from services.resource_versions import resource_versions
+from services.unit_of_work import register_db_stats
+from services.limits_service import LimitsService
+from utils.sessions import init_sessions
+from commands import register_commands
 
 def create_app():
     app = Flask(__name__, static_folder='static', template_folder='templates')
@@ -19,13 +34,44 @@ def create_app():
 
     csrf = CSRFProtect(app)
     migrate = Migrate(app, db)
+    game_counters.init_app(app)
+    audit_writer.init_app(app)
+    id_generator.init_app(app)
+    bet_ledger.init_app(app)
+    payment_gateway.init_app(app)
+    identity_cache.init_app(app)
+    password_hasher.init_app(app)
+    token_auth.init_app(app)
+    event_hub.init_app(app)
+    resource_versions.init_app(app)
+    init_sessions(app)
+    register_db_stats(app)
+    register_commands(app)
 
     @login_manager.user_loader
     def load_user(user_id):
+        # A cached slim identity; the full row is only read if a request needs it
         try:
-            return User.query.get(int(user_id))
+            user = identity_cache.load(int(user_id))
         except:
             return None
+        if user is not None and 'login_at' not in session:
+            # Restored from the remember cookie: the time limit counts from here
+            LimitsService.start_session()
+        return user
+
+    @login_manager.request_loader
+    def load_user_from_token(request):
+        # API clients send the login token as a bearer header instead of a cookie session
+        token = bearer_token(request)
+        if not token:
+            return None
+        claims = token_auth.authenticate(token)
+        if claims is None:
+            return None
+        # The token is issued at login, so its iat starts the session time limit
+        g.login_at = claims.get('iat')
+        return identity_cache.load(int(claims['sub']))
 
     from routes.auth import auth_bp, admin_required, moderator_required, support_required, staff_required
     from routes.games import games_bp
@@ -240,7 +286,7 @@ app = create_app()
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        upgrade_schema()
         print("✅ Database tables created")
     print("Casino Server starting...")
     print(f"http://localhost:5000")
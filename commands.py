@@ -0,0 +1,219 @@
+import click
+
+
+def register_commands(app):
+
+    @app.cli.command('simulate-rtp')
+    @click.option('--rounds', default=10_000_000, show_default=True, help='Rounds to simulate per game.')
+    @click.option('--game-id', 'game_ids', type=int, multiple=True, help='Limit to these games (repeatable).')
+    @click.option('--workers', type=int, default=None, help='Process pool size (defaults to CPU count).')
+    @click.option('--chunk-size', default=1_000_000, show_default=True, help='Rounds per worker task.')
+    @click.option('--seed', type=int, default=None, help='Seed for a reproducible run.')
+    def simulate_rtp(rounds, game_ids, workers, chunk_size, seed):
+        """Monte Carlo check of each game's RTP against its advertised value."""
+        from services.simulation_service import SimulationService
+
+        results = SimulationService.simulate_games(rounds, game_ids, workers, chunk_size, seed)
+        if not results:
+            click.echo('No games found')
+            return
+
+        for r in results:
+            low, high = r['rtp_ci_95']
+            status = 'OK' if r['matches_advertised'] else 'MISMATCH'
+            click.echo(f"#{r['game_id']} {r['title']} ({r['category']}/{r['volatility']}) - {r['rounds']:,} rounds")
+            click.echo(f"  advertised RTP:  {r['advertised_rtp']:.3f}%")
+            click.echo(f"  theoretical RTP: {r['theoretical_rtp']:.3f}%")
+            click.echo(f"  empirical RTP:   {r['empirical_rtp']:.3f}% (95% CI {low:.3f}% - {high:.3f}%) {status}")
+            click.echo(f"  hit rate:        {r['hit_rate'] * 100:.3f}%")
+            click.echo(f"  variance:        {r['variance']:.4f} (std dev {r['std_dev']:.4f})")
+
+    @app.cli.command('upgrade-db')
+    def upgrade_db():
+        """Add the tables, columns and indexes newer releases expect to an existing database."""
+        from utils.db import upgrade_schema
+
+        statements = upgrade_schema()
+        for statement in statements:
+            click.echo(statement)
+        click.echo(f'Ran {len(statements)} schema changes' if statements else 'Schema is up to date')
+
+    @app.cli.command('compact-bet-data')
+    @click.option('--batch-size', default=5000, show_default=True, help='Bets converted per transaction.')
+    def compact_bet_data(batch_size):
+        """Pack legacy JSON Bet.game_data into the binary round_data column."""
+        from services.game_service import GameService
+
+        converted = GameService.compact_legacy_game_data(batch_size)
+        click.echo(f'Converted {converted} bets')
+
+    @app.cli.command('rebuild-game-stats')
+    @click.option('--batch-size', default=5000, show_default=True, help='Bets streamed per fetch.')
+    def rebuild_game_stats(batch_size):
+        """Regenerate the closed hourly game statistics rollups from raw and archived bets."""
+        from services.game_stats_service import GameStatsService
+
+        rollups = GameStatsService.rebuild(batch_size)
+        click.echo(f'Rebuilt {rollups} hourly rollups')
+
+    @app.cli.command('bench-settlement')
+    @click.option('--bets', default=2000, show_default=True, help='Bets placed per mode.')
+    @click.option('--threads', default=16, show_default=True, help='Concurrent simulated requests.')
+    @click.option('--players', default=50, show_default=True, help='Distinct bench_N players to spread bets over.')
+    @click.option('--game-id', type=int, default=None, help='Game to play (defaults to the first active game).')
+    @click.option('--amount', type=float, default=None, help='Bet amount (defaults to the game minimum).')
+    @click.confirmation_option(prompt='This writes bench players and bets to the configured database. Continue?')
+    def bench_settlement(bets, threads, players, game_id, amount):
+        """Compare direct and group-commit bet settlement throughput and latency."""
+        from flask import current_app
+        from services.settlement_benchmark import SettlementBenchmark
+
+        results = SettlementBenchmark.compare(current_app._get_current_object(), bets, threads, players, game_id, amount)
+        if results is None:
+            click.echo('No games found')
+            return
+
+        for r in results:
+            click.echo(f"{r['mode']:>6}: {r['bets_per_second']:8.1f} bets/s  "
+                       f"p50 {r['p50_ms']:7.2f} ms  p99 {r['p99_ms']:7.2f} ms  "
+                       f"({r['bets']} ok, {r['errors']} failed in {r['seconds']:.2f}s)")
+            if r['first_error']:
+                click.echo(f"        first error: {r['first_error']}")
+
+    @app.cli.command('purge-idempotency-keys')
+    def purge_idempotency_keys():
+        """Delete idempotency keys whose replay window has passed."""
+        from utils.idempotency import purge_expired
+
+        click.echo(f'Deleted {purge_expired()} expired idempotency keys')
+
+    @app.cli.command('archive')
+    @click.option('--horizon-days', type=int, default=None, help='Archive whole months older than this (defaults to ARCHIVE_HORIZON_DAYS).')
+    @click.option('--table', 'tables', multiple=True, type=click.Choice(['bets', 'transactions']),
+                  help='Table to archive; repeatable (defaults to both).')
+    @click.option('--batch-size', default=5000, show_default=True, help='Rows streamed and deleted per batch.')
+    def archive(horizon_days, tables, batch_size):
+        """Move old bets and transactions into compressed monthly archive segments."""
+        from services.archive_service import ArchiveService
+
+        segments = ArchiveService.archive(horizon_days, tables or None, batch_size)
+        for s in segments:
+            click.echo(f"{s['table']} {s['month']} part {s['part']}: "
+                       f"{s['rows']} rows, {s['users']} users, {s['bytes']} bytes")
+        click.echo(f'Archived {sum(s["rows"] for s in segments)} rows into {len(segments)} segments')
+
+    @app.cli.command('calibrate-bcrypt')
+    @click.option('--target-ms', default=250.0, show_default=True, help='Longest acceptable time for one hash.')
+    @click.option('--min-rounds', default=10, show_default=True)
+    @click.option('--max-rounds', default=16, show_default=True)
+    @click.option('--samples', default=3, show_default=True, help='Hashes timed per cost; the median is used.')
+    def calibrate_bcrypt(target_ms, min_rounds, max_rounds, samples):
+        """Time bcrypt costs on this host and recommend BCRYPT_LOG_ROUNDS."""
+        from flask import current_app
+        from services.password_hasher import PasswordHasher
+
+        result = PasswordHasher.calibrate(target_ms, min_rounds, max_rounds, samples)
+        for rounds, ms in result['timings']:
+            click.echo(f'  cost {rounds:2d}: {ms:8.1f} ms')
+        click.echo(f"Recommended BCRYPT_LOG_ROUNDS={result['rounds']} "
+                   f"(current {current_app.config['BCRYPT_LOG_ROUNDS']}); "
+                   f'existing hashes are upgraded on next login')
+
+    @app.cli.command('payment-stub')
+    @click.option('--host', default='127.0.0.1', show_default=True)
+    @click.option('--port', default=5055, show_default=True)
+    @click.option('--delay', default=1.0, show_default=True, help='Seconds before the webhook is sent.')
+    @click.option('--fail-rate', default=0.0, show_default=True, help='Fraction of charges that fail.')
+    @click.option('--latency', default=0.0, show_default=True, help='Seconds each charge call takes.')
+    def payment_stub(host, port, delay, fail_rate, latency):
+        """Run a local stand-in for the stripe, paypal and crypto provider APIs."""
+        from flask import current_app
+        from services.payment_gateway.stub import create_stub_app
+
+        stub = create_stub_app(current_app.config['PAYMENT_WEBHOOK_SECRET'], delay, fail_rate, latency)
+        stub.run(host=host, port=port, threaded=True)
+
+    @app.cli.command('sweep-deposits')
+    @click.option('--stale-minutes', type=int, default=None,
+                  help='Retry intents untouched this long (defaults to PAYMENT_INTENT_STALE_MINUTES).')
+    @click.option('--ttl-hours', type=int, default=None,
+                  help='Fail intents still unresolved after this (defaults to PAYMENT_INTENT_TTL_HOURS).')
+    def sweep_deposits(stale_minutes, ttl_hours):
+        """Resubmit, look up or expire gateway deposits that never got a webhook."""
+        from datetime import timedelta
+        from flask import current_app
+        from services.payment_service import PaymentService
+
+        config = current_app.config
+        counts = PaymentService.sweep_intents(
+            timedelta(minutes=stale_minutes or config['PAYMENT_INTENT_STALE_MINUTES']),
+            timedelta(hours=ttl_hours or config['PAYMENT_INTENT_TTL_HOURS'])
+        )
+        click.echo(', '.join(f'{name}: {count}' for name, count in counts.items()))
+
+    @app.cli.command('process-payouts')
+    @click.argument('action', type=click.Choice(['approve', 'reject']))
+    @click.option('--id', 'payout_ids', type=int, multiple=True, help='Payout to process (repeatable).')
+    @click.option('--status', type=click.Choice(['pending', 'processing']), default=None,
+                  help='Filter: payout status (defaults to both open statuses).')
+    @click.option('--method', default=None, help='Filter: payout method.')
+    @click.option('--before', default=None, help='Filter: requested before this ISO date.')
+    @click.option('--min-amount', type=float, default=None, help='Filter: minimum amount.')
+    @click.option('--max-amount', type=float, default=None, help='Filter: maximum amount.')
+    @click.option('--admin', 'admin_username', required=True, help='Admin username recorded in the audit log.')
+    @click.option('--notes', default=None, help='Admin notes stored on each payout.')
+    @click.option('--format', 'file_format', type=click.Choice(['csv', 'xml']), default='csv', show_default=True)
+    @click.option('--output', type=click.Path(dir_okay=False), default=None,
+                  help='Where to write the provider batch file (defaults to <batch id>.<format>).')
+    def process_payouts(action, payout_ids, status, method, before, min_amount, max_amount,
+                        admin_username, notes, file_format, output):
+        """Approve or reject payouts in one batch and write the provider file."""
+        from models import User, UserRole
+        from services.payout_service import PayoutService
+
+        admin = User.query.filter_by(username=admin_username, role=UserRole.ADMIN).first()
+        if admin is None:
+            raise click.ClickException(f'No admin named {admin_username}')
+
+        filters = {'status': status, 'method': method, 'before': before,
+                   'min_amount': min_amount, 'max_amount': max_amount}
+        result = PayoutService.process_batch(
+            action, admin, payout_ids=list(payout_ids),
+            filters=filters if not payout_ids else None,
+            notes=notes, file_format=file_format
+        )
+        if not result['success']:
+            raise click.ClickException(result['error'])
+
+        click.echo(f"{result['batch_id']}: {action}d {len(result['processed'])} payouts "
+                   f"totalling {result['total_amount']:.2f}")
+        for failure in result['failures']:
+            click.echo(f"  #{failure['id']}: {failure['error']}")
+
+        if 'batch_file' in result:
+            path = output or result['batch_file']['filename']
+            with open(path, 'w') as f:
+                f.write(result['batch_file']['content'])
+            click.echo(f'Wrote {path}')
+
+    @app.cli.command('reconcile')
+    @click.option('--workers', type=int, default=None, help='Process pool size (defaults to CPU count).')
+    @click.option('--partitions', type=int, default=None, help='User id ranges to split the work into.')
+    @click.option('--yield-per', default=10_000, show_default=True, help='Rows fetched per round trip.')
+    @click.option('--report', type=click.Path(dir_okay=False), default='reconciliation.csv', show_default=True,
+                  help='Where to write the discrepancy report.')
+    def reconcile(workers, partitions, yield_per, report):
+        """Check every wallet's transaction chain and balance against the ledger."""
+        from services.reconciliation_service import ReconciliationService
+
+        result = ReconciliationService.reconcile(
+            app.config['SQLALCHEMY_DATABASE_URI'], workers, partitions, yield_per, report
+        )
+        click.echo(f"Checked {result['users']} users and {result['transactions']} transactions "
+                   f"in {result['ranges']} ranges")
+        kinds = {}
+        for discrepancy in result['discrepancies']:
+            kinds[discrepancy[1]] = kinds.get(discrepancy[1], 0) + 1
+        for kind, count in sorted(kinds.items()):
+            click.echo(f'  {kind}: {count}')
+        click.echo(f"{len(result['discrepancies'])} discrepancies written to {report}")
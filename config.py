@@ -17,42 +17,108 @@ class Config:
         'pool_pre_ping': True,
     }
     
-    SESSION_TYPE = 'filesystem'
-    SESSION_FILE_DIR = './.flask_session/'
+    # cookie | memory | redis; redis shares sessions across nodes through REDIS_URL
+    SESSION_TYPE = os.environ.get('SESSION_TYPE', 'cookie')
+    SESSION_KEY_PREFIX = 'session:'
     SESSION_PERMANENT = False
     SESSION_USE_SIGNER = True
     PERMANENT_SESSION_LIFETIME = timedelta(hours=1)
     
-    JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-production-key'
+    JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', '')  # required; the app will not start without it
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
+    TOKEN_CACHE_SIZE = 10000  # verified tokens remembered per process
+    TOKEN_REVOCATION_REFRESH = 5  # seconds between pulls of newly closed sessions
+    TOKEN_REVOCATION_CAPACITY = 100000  # revoked tokens the filter holds before it is rebuilt larger
     
     SECURITY_PASSWORD_SALT = os.environ.get('SECURITY_PASSWORD_SALT') or 'password-salt-production'
-    BCRYPT_LOG_ROUNDS = 13
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 13))  # pick with flask calibrate-bcrypt
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))  # 0 hashes on the request thread
+    PASSWORD_HASH_MAX_QUEUE = 32  # hashes queued or running before logins get 503
+    PASSWORD_HASH_TIMEOUT = 10
     
     MAX_BET = 10000
     MIN_BET = 0.10
     DAILY_LOSS_LIMIT = 1000
     SESSION_TIME_LIMIT = 1800
+    MAX_BATCH_ROUNDS = 100
+    AUTOPLAY_MAX_SPINS = 1000
+    AUTOPLAY_CHUNK_SIZE = 10  # rounds settled per batched write
+    AUTOPLAY_SPIN_INTERVAL = 1.0  # seconds between streamed rounds
+    AUTOPLAY_ATTACH_TIMEOUT = 5  # seconds the first round waits for the player's stream
+    AUTOPLAY_STALE_AFTER = 60  # seconds without progress before a running session counts as dead
+    GAME_COUNTER_FLUSH_INTERVAL = 5
     
     MAX_CONTENT_LENGTH = 10 * 1024 * 1024  # 10MB
     UPLOAD_FOLDER = './uploads'
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf', 'gif'}
     
     DEBUG = os.environ.get('DEBUG', 'False').lower() == 'true'
+    DB_STATS_HEADERS = os.environ.get('DB_STATS_HEADERS', 'False').lower() == 'true'  # X-DB-* headers outside debug
     ENV = os.environ.get('ENV', 'production')
     
     MIN_DEPOSIT = 10.00
     MAX_DEPOSIT = 10000.00
     MIN_WITHDRAWAL = 20.00
     MAX_WITHDRAWAL = 5000.00
+    DAILY_WITHDRAWAL_LIMIT = 10000.00
     
     KYC_THRESHOLD = 1000.00
     
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     LOG_FILE = os.environ.get('LOG_FILE', './logs/casino.log')
     
+    # Off: deposits complete inline. On: they go to the provider and complete by webhook
+    PAYMENT_GATEWAY_ENABLED = os.environ.get('PAYMENT_GATEWAY_ENABLED', 'False').lower() == 'true'
+    PAYMENT_PROVIDER_URLS = {
+        'stripe': os.environ.get('STRIPE_API_URL', 'http://127.0.0.1:5055'),
+        'paypal': os.environ.get('PAYPAL_API_URL', 'http://127.0.0.1:5055'),
+        'crypto': os.environ.get('CRYPTO_API_URL', 'http://127.0.0.1:5055')
+    }
+    PAYMENT_PROVIDER_KEYS = {
+        'stripe': os.environ.get('STRIPE_API_KEY', ''),
+        'paypal': os.environ.get('PAYPAL_API_KEY', ''),
+        'crypto': os.environ.get('CRYPTO_API_KEY', '')
+    }
+    PAYMENT_WEBHOOK_SECRET = os.environ.get('PAYMENT_WEBHOOK_SECRET', '')  # required when the gateway is enabled
+    PAYMENT_WEBHOOK_BASE_URL = os.environ.get('PAYMENT_WEBHOOK_BASE_URL', 'http://127.0.0.1:5000')
+    PAYMENT_PROVIDER_TIMEOUT = 10
+    PAYMENT_POOL_SIZE = 20  # pooled provider connections per process
+    PAYMENT_GATEWAY_WORKERS = 4  # threads for the gateway's database writes
+    PAYMENT_INTENT_STALE_MINUTES = 10  # sweep-deposits retries intents untouched this long
+    PAYMENT_INTENT_TTL_HOURS = 24  # and fails those still unresolved after this
+    
+    IDEMPOTENCY_KEY_TTL = 24 * 3600  # seconds a completed response is replayed
+    IDEMPOTENCY_IN_FLIGHT_TTL = 60  # seconds before an unfinished claim can be taken over
+    IDEMPOTENCY_WAIT_TIMEOUT = 10  # seconds a duplicate waits for the first request
+    
+    # 'direct' commits each bet on its own; 'group' batches them through the bet ledger
+    BET_SETTLEMENT_MODE = os.environ.get('BET_SETTLEMENT_MODE', 'direct')
+    BET_LEDGER_COMMIT_INTERVAL = 0.005
+    BET_LEDGER_MAX_BATCH = 500
+    BET_LEDGER_TIMEOUT = 10
+    
+    # Distinguishes hosts in generated reference ids (0-65535)
+    NODE_ID = int(os.environ.get('NODE_ID', 0))
+    
+    # Bets and transactions older than the horizon move to compressed monthly segments
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', './archive')
+    ARCHIVE_HORIZON_DAYS = int(os.environ.get('ARCHIVE_HORIZON_DAYS', 365))
+    
+    AUDIT_LOG_SYNC = os.environ.get('AUDIT_LOG_SYNC', 'False').lower() == 'true'
+    AUDIT_QUEUE_SIZE = 10000
+    AUDIT_BATCH_SIZE = 500
+    AUDIT_FLUSH_INTERVAL = 1.0
+    
     REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
     
+    IDENTITY_CACHE_TTL = 5  # seconds a process reuses a signed-in user's identity
+    IDENTITY_CACHE_SHARED_TTL = 60
+    IDENTITY_CACHE_SIZE = 10000
+    EVENT_HUB_REDIS_URL = os.environ.get('EVENT_HUB_REDIS_URL')  # unset: events reach this process only
+    EVENT_STREAM_KEEPALIVE = 15
+    EVENT_STREAM_QUEUE_SIZE = 100  # undelivered events before a slow stream is dropped
+    IDENTITY_CACHE_REDIS_URL = os.environ.get('IDENTITY_CACHE_REDIS_URL')  # unset: per process only
+    
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
     MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
     MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'True').lower() == 'true'
@@ -19,7 +19,12 @@ from .models import (
     SupportTicket,
     KYCDocument,
     SupportMessage,
-    Announcement
+    Announcement,
+    UserDailyTotals,
+    GameStatsHourly,
+    IdempotencyKey,
+    PaymentIntent,
+    AutoplayRun
 )
 
 __all__ = [
@@ -43,5 +48,10 @@ __all__ = [
     'SupportTicket',
     'KYCDocument',
     'SupportMessage',
-    'Announcement'
+    'Announcement',
+    'UserDailyTotals',
+    'GameStatsHourly',
+    'IdempotencyKey',
+    'PaymentIntent',
+    'AutoplayRun'
 ]
\ No newline at end of file
@@ -84,6 +84,7 @@ class User(db.Model, UserMixin):
     session_time_limit = db.Column(db.Integer, default=120)
     cool_off_period = db.Column(db.Integer, default=0)
     self_excluded_until = db.Column(db.DateTime)
+    version = db.Column(db.Integer, default=0, nullable=False)  # bumped when the status fields change; feeds ETags
 
     sessions = db.relationship('Session', backref='user', lazy=True, cascade='all, delete-orphan')
     bets = db.relationship('Bet', backref='user', lazy=True, cascade='all, delete-orphan')
@@ -125,6 +126,7 @@ class Game(db.Model):
     popularity = db.Column(db.Integer, default=0)
     has_bonus = db.Column(db.Boolean, default=False)
     jackpot = db.Column(db.Float, default=0.00)
+    version = db.Column(db.Integer, default=0, nullable=False)
     
     bets = db.relationship('Bet', backref='game', lazy=True, cascade='all, delete-orphan')
     
@@ -133,6 +135,9 @@ class Game(db.Model):
 
 class Bet(db.Model):
     __tablename__ = 'bets'
+    __table_args__ = (
+        db.Index('ix_bets_user_timestamp_id', 'user_id', 'timestamp', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -142,7 +147,8 @@ class Bet(db.Model):
     result = db.Column(db.String(20))
     win_amount = db.Column(db.Float, default=0.00)
     timestamp = db.Column(db.DateTime, default=datetime.now)
-    game_data = db.Column(db.Text) 
+    game_data = db.deferred(db.Column(db.Text))  # legacy JSON, see round_data
+    round_data = db.deferred(db.Column(db.LargeBinary(16)))
     ip_address = db.Column(db.String(45))
     
     def __repr__(self):
@@ -155,6 +161,7 @@ class Transaction(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     type = db.Column(db.Enum(TransactionType), nullable=False)
     amount = db.Column(db.Float, nullable=False)
+    fee = db.Column(db.Float)  # deposits only: the part of amount that never reached the balance
     balance_before = db.Column(db.Float)
     balance_after = db.Column(db.Float)
     status = db.Column(db.String(20), default='completed')
@@ -165,6 +172,26 @@ class Transaction(db.Model):
     def __repr__(self):
         return f'<Transaction {self.id} {self.type.value}>'
 
+class PaymentIntent(db.Model):
+    __tablename__ = 'payment_intents'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id'), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    provider = db.Column(db.String(20), nullable=False)
+    provider_ref = db.Column(db.String(100), index=True)
+    status = db.Column(db.String(20), default='created', nullable=False)  # created -> submitted -> completed | failed
+    amount = db.Column(db.Float, nullable=False)
+    fee = db.Column(db.Float, default=0.00, nullable=False)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    
+    transaction = db.relationship('Transaction')
+    
+    def __repr__(self):
+        return f'<PaymentIntent {self.id} {self.provider} {self.status}>'
+
 class Payout(db.Model):
     __tablename__ = 'payouts'
     
@@ -178,6 +205,7 @@ class Payout(db.Model):
     account_details = db.Column(db.Text) 
     fee = db.Column(db.Float, default=0.00)
     admin_notes = db.Column(db.Text)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id'))  # the WITHDRAWAL it settles
     
     def __repr__(self):
         return f'<Payout {self.id}>'
@@ -201,6 +229,9 @@ class Bonus(db.Model):
 
 class Session(db.Model):
     __tablename__ = 'sessions'
+    __table_args__ = (
+        db.Index('ix_sessions_active_logout_time', 'active', 'logout_time'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -210,7 +241,8 @@ class Session(db.Model):
     login_time = db.Column(db.DateTime, default=datetime.now)
     logout_time = db.Column(db.DateTime)
     active = db.Column(db.Boolean, default=True)
-    token = db.Column(db.String(500))
+    token = db.Column(db.String(500))  # legacy raw token; new sessions store only token_hash
+    token_hash = db.Column(db.String(64), unique=True, index=True)
     user_agent = db.Column(db.Text)
     
     def __repr__(self):
@@ -257,7 +289,7 @@ class SupportTicket(db.Model):
     __tablename__ = 'support_tickets'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     subject = db.Column(db.String(200), nullable=False)
     message = db.Column(db.Text, nullable=False)
     status = db.Column(db.Enum(TicketStatus), default=TicketStatus.OPEN)
@@ -268,6 +300,7 @@ class SupportTicket(db.Model):
     closed_at = db.Column(db.DateTime)
     admin_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     last_reply_by = db.Column(db.Enum(UserRole))
+    version = db.Column(db.Integer, default=0, nullable=False)  # also bumped by message inserts and reads
     
     messages = db.relationship('SupportMessage', backref='ticket', lazy=True, cascade='all, delete-orphan')
     
@@ -306,4 +339,67 @@ class Announcement(db.Model):
     creator = db.relationship('User')
     
     def __repr__(self):
-        return f'<Announcement {self.id} {self.title}>'
\ No newline at end of file
+        return f'<Announcement {self.id} {self.title}>'
+
+class UserDailyTotals(db.Model):
+    __tablename__ = 'user_daily_totals'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    deposits = db.Column(db.Float, default=0.00, nullable=False)
+    withdrawals = db.Column(db.Float, default=0.00, nullable=False)
+    wagered = db.Column(db.Float, default=0.00, nullable=False)
+    losses = db.Column(db.Float, default=0.00, nullable=False)  # wagered minus won, may go negative
+    
+    def __repr__(self):
+        return f'<UserDailyTotals {self.user_id} {self.day}>'
+
+class GameStatsHourly(db.Model):
+    __tablename__ = 'game_stats_hourly'
+    
+    game_id = db.Column(db.Integer, db.ForeignKey('games.id'), primary_key=True)
+    hour = db.Column(db.DateTime, primary_key=True)
+    bets = db.Column(db.Integer, default=0, nullable=False)
+    wins = db.Column(db.Integer, default=0, nullable=False)
+    wagered = db.Column(db.Float, default=0.00, nullable=False)
+    paid = db.Column(db.Float, default=0.00, nullable=False)  # win_amount over every bet
+    won = db.Column(db.Float, default=0.00, nullable=False)  # win_amount over bets with result 'win'
+    biggest_win = db.Column(db.Float, default=0.00, nullable=False)
+    
+    def __repr__(self):
+        return f'<GameStatsHourly {self.game_id} {self.hour}>'
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)  # sha256 of method, path and body
+    status_code = db.Column(db.Integer)  # NULL while the first request is still running
+    response_body = db.Column(db.Text)
+    content_type = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<IdempotencyKey {self.user_id} {self.key}>'
+
+class AutoplayRun(db.Model):
+    __tablename__ = 'autoplay_runs'
+    __table_args__ = (
+        db.Index('ix_autoplay_runs_user_status', 'user_id', 'status'),
+    )
+    
+    id = db.Column(db.String(32), primary_key=True)  # the session id handed to the client
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    game_id = db.Column(db.Integer, db.ForeignKey('games.id'), nullable=False)
+    status = db.Column(db.String(20), default='running', nullable=False)  # running -> finished
+    stop_requested = db.Column(db.Boolean, default=False, nullable=False)  # set by any worker
+    rounds_played = db.Column(db.Integer, default=0, nullable=False)
+    net = db.Column(db.Float, default=0.00, nullable=False)
+    reason = db.Column(db.String(30))
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    
+    def __repr__(self):
+        return f'<AutoplayRun {self.id} user:{self.user_id} {self.status}>'
@@ -4,6 +4,9 @@ from routes.auth import admin_required, moderator_required, support_required, st
 from services.admin_service import AdminService
 from services.kyc_service import KYCService
 from services.support_service import SupportService
+from services.payout_service import PayoutService
+from services.payment_service import PaymentService
+from services.game_service import GameService
 from utils.helpers import export_to_csv, generate_reference
 from models import (
     db, User, Game, Bet, Transaction, Payout, 
@@ -16,7 +19,8 @@ from sqlalchemy import func, desc, or_
 from io import StringIO
 import csv
 import json
-from werkzeug.security import generate_password_hash
+from services.password_hasher import password_hasher, HasherBusy
+from utils.conditional import conditional_stats
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -48,10 +52,15 @@ def create_staff_user():
     if not is_valid:
         return jsonify({'error': message}), 400
     
+    try:
+        password_hash = password_hasher.hash(data['password'])
+    except HasherBusy:
+        return jsonify({'error': 'Server is busy, please try again'}), 503
+    
     user = User(
         username=data['username'],
         email=data['email'],
-        password_hash=generate_password_hash(data['password']),
+        password_hash=password_hash,
         role=role,
         status=UserStatus.ACTIVE,
         balance=0.00,
@@ -110,6 +119,122 @@ def list_staff_users():
         'page': page
     })
 
+@admin_bp.route('/conditional-stats', methods=['GET'])
+@admin_required
+def get_conditional_stats():
+    # 304 hit ratios of the polled endpoints, for this worker process
+    return jsonify({'endpoints': conditional_stats()})
+
+@admin_bp.route('/payouts', methods=['GET'])
+@admin_required
+def list_payouts():
+    status = request.args.get('status')
+    if status and status not in [s.value for s in PayoutStatus]:
+        return jsonify({'error': 'Invalid status'}), 400
+    
+    return jsonify({'payouts': PayoutService.list_payouts(status)})
+
+@admin_bp.route('/payouts/batch', methods=['POST'])
+@admin_required
+def process_payout_batch():
+    data = request.get_json() or {}
+    
+    try:
+        result = PayoutService.process_batch(
+            data.get('action'),
+            current_user,
+            payout_ids=[int(i) for i in data.get('payout_ids') or []],
+            filters=data.get('filter'),
+            notes=data.get('notes'),
+            file_format=data.get('format', 'csv'),
+            request=request
+        )
+    except ValueError as e:
+        return jsonify({'error': f'Invalid batch request: {e}'}), 400
+    
+    if not result['success']:
+        return jsonify({'error': result['error']}), 400
+    
+    return jsonify(result)
+
+@admin_bp.route('/payouts/<int:payout_id>/approve', methods=['POST'])
+@admin_required
+def approve_payout(payout_id):
+    return _process_single_payout('approve', payout_id)
+
+@admin_bp.route('/payouts/<int:payout_id>/reject', methods=['POST'])
+@admin_required
+def reject_payout(payout_id):
+    return _process_single_payout('reject', payout_id)
+
+def _process_single_payout(action, payout_id):
+    data = request.get_json(silent=True) or {}
+    result = PayoutService.process_batch(
+        action, current_user, payout_ids=[payout_id], notes=data.get('notes'), request=request
+    )
+    
+    if result['failures']:
+        return jsonify({'error': result['failures'][0]['error']}), 400
+    
+    return jsonify(result)
+
+@admin_bp.route('/transactions', methods=['GET'])
+@admin_required
+def list_transactions():
+    user_id = request.args.get('user_id', type=int)
+    before_id = request.args.get('before_id', type=int)
+    limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+    
+    if user_id:
+        # One user's ledger follows its cursor into the archive
+        user = User.query.get_or_404(user_id)
+        result = PaymentService.get_user_transaction_history(
+            user_id, before_id, request.args.get('after_id', type=int), limit
+        )
+        if not result['success']:
+            return jsonify({'error': result['error']}), 400
+        for t in result['transactions']:
+            t['user'] = {'id': user.id, 'username': user.username}
+        return jsonify(result)
+    
+    # The archive is indexed per user, so the site-wide feed covers the hot table
+    query = db.session.query(Transaction, User.username).join(User, Transaction.user_id == User.id)
+    if before_id:
+        query = query.filter(Transaction.id < before_id)
+    rows = query.order_by(Transaction.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    
+    transactions = []
+    for t, username in rows[:limit]:
+        entry = PaymentService._transaction_dict(t)
+        entry['user'] = {'id': t.user_id, 'username': username}
+        transactions.append(entry)
+    
+    return jsonify({
+        'success': True,
+        'transactions': transactions,
+        'has_more': has_more,
+        'next_cursor': transactions[-1]['id'] if transactions and has_more else None
+    })
+
+@admin_bp.route('/users/<int:user_id>/bets', methods=['GET'])
+@admin_required
+def get_user_bets(user_id):
+    User.query.get_or_404(user_id)
+    result = GameService.get_user_game_history(
+        user_id,
+        request.args.get('before_id', type=int),
+        request.args.get('after_id', type=int),
+        request.args.get('limit', 50, type=int),
+        request.args.get('include_total', 'false').lower() in ('1', 'true'),
+        request.args.get('details', 'false').lower() in ('1', 'true')
+    )
+    
+    if not result['success']:
+        return jsonify({'error': result['error']}), 400
+    
+    return jsonify(result)
+
 @admin_bp.route('/support/dashboard', methods=['GET'])
 @staff_required
 def support_dashboard():
@@ -262,6 +387,7 @@ def quick_reply_to_ticket(ticket_id):
     ticket.last_reply_by = UserRole.SUPPORT if current_user.role == UserRole.SUPPORT else UserRole.MODERATOR
     
     db.session.add(support_message)
+    SupportService.notify_reply(ticket, support_message)
     db.session.commit()
     
     return jsonify({
@@ -401,6 +527,7 @@ def reply_to_ticket(ticket_id):
         ticket.closed_at = datetime.now()
     
     db.session.add(message)
+    SupportService.notify_reply(ticket, message)
     db.session.commit()
     
     return jsonify({
@@ -1,10 +1,14 @@
-from flask import Blueprint, request, jsonify, make_response, render_template
+from flask import Blueprint, request, jsonify, make_response, render_template, session
 from flask_login import login_user, logout_user, current_user, login_required
 from services.auth_service import AuthService
 from services.kyc_service import KYCService
+from services.limits_service import LimitsService
+from services.token_auth import token_auth
+from utils.sessions import regenerate_session
+from services.resource_versions import ResourceVersions
+from utils.conditional import conditional
 from models import UserRole, db, User, KYCDocument, KYCStatus
-import jwt
-from datetime import datetime, timedelta
+from datetime import datetime
 from functools import wraps
 import os
 from werkzeug.utils import secure_filename
@@ -37,17 +41,18 @@ def login():
     
     result = AuthService.login_user(username, password, request)
     
+    if result.get('busy'):
+        return jsonify({'error': result['error']}), 503, {'Retry-After': '1'}
     if not result['success']:
         return jsonify({'error': result['error']}), 401
     
     user = result['user']
     
+    regenerate_session()
     login_user(user, remember=True)
+    LimitsService.start_session()
     
-    token = jwt.encode({
-        'user_id': user.id,
-        'exp': datetime.now() + timedelta(hours=24)
-    }, 'secret-key', algorithm='HS256')
+    token = result['token']
     
     response = make_response(jsonify({
         'message': 'Login successful',
@@ -58,6 +63,8 @@ def login():
             'balance': user.balance,
             'kyc_verified': user.kyc_verified
         },
+        'token': token,
+        'expires_in': int(token_auth.expires.total_seconds()),
         'redirect': '/dashboard'
     }))
     
@@ -67,7 +74,7 @@ def login():
         httponly=True,
         secure=False,
         samesite='Strict',
-        max_age=86400
+        max_age=int(token_auth.expires.total_seconds())
     )
     
     return response
@@ -85,17 +92,18 @@ def register():
     
     result = AuthService.register_user(username, email, password, request)
     
+    if result.get('busy'):
+        return jsonify({'error': result['error']}), 503, {'Retry-After': '1'}
     if not result['success']:
         return jsonify({'error': result['error']}), 400
     
     user = result['user']
     
+    regenerate_session()
     login_user(user, remember=True)
+    LimitsService.start_session()
     
-    token = jwt.encode({
-        'user_id': user.id,
-        'exp': datetime.now() + timedelta(hours=24)
-    }, 'secret-key', algorithm='HS256')
+    token = result['token']
     
     response = make_response(jsonify({
         'message': 'Registration successful',
@@ -106,6 +114,8 @@ def register():
             'balance': user.balance,
             'kyc_verified': user.kyc_verified
         },
+        'token': token,
+        'expires_in': int(token_auth.expires.total_seconds()),
         'redirect': '/dashboard'
     }), 201)
     
@@ -115,7 +125,7 @@ def register():
         httponly=True,
         secure=False,
         samesite='Strict',
-        max_age=86400
+        max_age=int(token_auth.expires.total_seconds())
     )
     
     return response
@@ -125,6 +135,9 @@ def register():
 def logout():
     result = AuthService.logout_user(current_user.id, request)
     
+    # Drop everything but what logout_user writes to clear the remember cookie
+    session.clear()
+    regenerate_session()
     logout_user()
     
     response = make_response(jsonify({'message': 'Logged out'}))
@@ -167,12 +180,18 @@ def change_password():
     
     result = AuthService.change_password(current_user.id, current_password, new_password)
     
+    if result.get('busy'):
+        return jsonify({'error': result['error']}), 503, {'Retry-After': '1'}
     if not result['success']:
         return jsonify({'error': result['error']}), 400
     
     return jsonify({'message': 'Password changed successfully'})
 
+def _status_version():
+    return ResourceVersions.user(current_user) if current_user.is_authenticated else None
+
 @auth_bp.route('/status', methods=['GET'])
+@conditional(_status_version)
 def check_auth_status():
     if current_user.is_authenticated:
         return jsonify({
@@ -1,11 +1,15 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from flask_login import login_required, current_user
 from services.game_service import GameService
+from services.autoplay_service import AutoplayService
+from services.resource_versions import ResourceVersions
+from utils.conditional import conditional
 
 games_bp = Blueprint('games', __name__)
 
 @games_bp.route('/available', methods=['GET'])
 @login_required
+@conditional(ResourceVersions.games)
 def get_available_games():
     games = GameService.get_available_games()
     return jsonify({'games': games})
@@ -26,11 +30,89 @@ def play_game(game_id):
     
     return jsonify(result)
 
+@games_bp.route('/<int:game_id>/play-batch', methods=['POST'])
+@login_required
+def play_batch(game_id):
+    data = request.get_json()
+    bet_amount = float(data.get('amount', 0))
+    rounds = int(data.get('rounds', 10))
+    loss_limit = data.get('loss_limit')
+    win_target = data.get('win_target')
+    
+    if bet_amount <= 0:
+        return jsonify({'error': 'Invalid bet amount'}), 400
+    
+    result = GameService.play_batch(
+        current_user, game_id, bet_amount, rounds, request,
+        stop_on_win=bool(data.get('stop_on_win', False)),
+        loss_limit=float(loss_limit) if loss_limit is not None else None,
+        win_target=float(win_target) if win_target is not None else None
+    )
+    
+    if not result['success']:
+        return jsonify({'error': result['error']}), 400
+    
+    return jsonify(result)
+
+@games_bp.route('/<int:game_id>/autoplay', methods=['POST'])
+@login_required
+def start_autoplay(game_id):
+    data = request.get_json()
+    bet_amount = float(data.get('amount', 0))
+    spins = int(data.get('spins', 10))
+    loss_limit = data.get('loss_limit')
+    win_target = data.get('win_target')
+    
+    if bet_amount <= 0:
+        return jsonify({'error': 'Invalid bet amount'}), 400
+    
+    result = AutoplayService.start(
+        current_user, game_id, bet_amount, spins, request,
+        loss_limit=float(loss_limit) if loss_limit is not None else None,
+        win_target=float(win_target) if win_target is not None else None,
+        stop_on_win=bool(data.get('stop_on_win', False))
+    )
+    
+    if not result['success']:
+        return jsonify({'error': result['error']}), 400
+    
+    return jsonify(result)
+
+@games_bp.route('/autoplay/<session_id>/stream', methods=['GET'])
+@login_required
+def stream_autoplay(session_id):
+    autoplay = AutoplayService.get(session_id, current_user.id)
+    if not autoplay:
+        return jsonify({'error': 'Auto-play session not found'}), 404
+    
+    return Response(
+        AutoplayService.stream(autoplay),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@games_bp.route('/autoplay/<session_id>/stop', methods=['POST'])
+@login_required
+def stop_autoplay(session_id):
+    if not AutoplayService.stop(session_id, current_user.id):
+        return jsonify({'error': 'Auto-play session not found'}), 404
+    
+    return jsonify({'success': True})
+
 @games_bp.route('/history', methods=['GET'])
 @login_required
 def get_game_history():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
+    before_id = request.args.get('before_id', type=int)
+    after_id = request.args.get('after_id', type=int)
+    limit = request.args.get('limit', request.args.get('per_page', 20, type=int), type=int)
+    include_total = request.args.get('include_total', 'false').lower() in ('1', 'true')
+    details = request.args.get('details', 'false').lower() in ('1', 'true')
+    
+    result = GameService.get_user_game_history(
+        current_user.id, before_id, after_id, limit, include_total, details
+    )
+    
+    if not result['success']:
+        return jsonify({'error': result['error']}), 400
     
-    result = GameService.get_user_game_history(current_user.id, page, per_page)
     return jsonify(result)
\ No newline at end of file
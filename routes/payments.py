@@ -1,17 +1,25 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from services.payment_service import PaymentService
+from utils.idempotency import idempotent
+from utils.conditional import conditional
+from services.resource_versions import ResourceVersions
+from services.payment_gateway import payment_gateway, verify_signature
 
 payments_bp = Blueprint('payments', __name__)
 
+METHODS_VERSION = ResourceVersions.static(PaymentService.PAYMENT_METHODS)
+
 @payments_bp.route('/methods', methods=['GET'])
 @login_required
+@conditional(lambda: METHODS_VERSION)
 def get_payment_methods():
     methods = PaymentService.get_payment_methods()
     return jsonify({'methods': methods})
 
 @payments_bp.route('/deposit', methods=['POST'])
 @login_required
+@idempotent
 def create_deposit():
     data = request.get_json()
     
@@ -26,10 +34,34 @@ def create_deposit():
     if not result['success']:
         return jsonify({'error': result['error']}), 400
     
+    return jsonify(result), 202 if result.get('status') == 'pending' else 200
+
+@payments_bp.route('/deposit/<reference>', methods=['GET'])
+@login_required
+def get_deposit_status(reference):
+    status = PaymentService.get_deposit_status(current_user.id, reference)
+    if not status:
+        return jsonify({'error': 'Deposit not found'}), 404
+    return jsonify(status)
+
+@payments_bp.route('/webhooks/<provider>', methods=['POST'])
+def provider_webhook(provider):
+    # Without a private secret no signature can be trusted
+    if payment_gateway.webhook_secret is None:
+        return jsonify({'error': 'Webhooks are not configured'}), 404
+    if not verify_signature(payment_gateway.webhook_secret,
+                            request.get_data(), request.headers.get('X-Signature')):
+        return jsonify({'error': 'Invalid signature'}), 401
+    
+    result = PaymentService.handle_webhook(provider, request.get_json(silent=True) or {})
+    if not result['success']:
+        return jsonify({'error': result['error']}), 404
+    
     return jsonify(result)
 
 @payments_bp.route('/withdraw', methods=['POST'])
 @login_required
+@idempotent
 def request_withdrawal():
     data = request.get_json()
     
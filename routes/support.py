@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from services.support_service import SupportService
+from services.resource_versions import ResourceVersions
+from utils.conditional import conditional
 from models import db, SupportTicket, SupportMessage, TicketStatus, TicketPriority
 from datetime import datetime
 
@@ -119,6 +121,7 @@ def close_ticket(ticket_id):
 
 @support_bp.route('/unread-count', methods=['GET'])
 @login_required
+@conditional(lambda: ResourceVersions.tickets(current_user.id))
 def get_unread_count():
     """Количество непрочитанных сообщений"""
     count = SupportService.get_user_unread_count(current_user.id)
@@ -1,8 +1,9 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from flask_login import login_required, current_user
 from services.payment_service import PaymentService
 from services.auth_service import AuthService
-from models import db, Session, Bonus
+from services.event_hub import event_hub
+from models import db, Session, Bonus, UserRole
 from datetime import datetime, timedelta
 
 user_bp = Blueprint('user', __name__)
@@ -28,12 +29,40 @@ def update_profile():
 @user_bp.route('/transactions', methods=['GET'])
 @login_required
 def get_transactions():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 50, type=int)
+    # Numbered pages only cover the hot table; cursors continue into the archive
+    if 'page' in request.args:
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 50, type=int)
+        return jsonify(PaymentService.get_user_transactions(current_user.id, page, per_page))
+    
+    result = PaymentService.get_user_transaction_history(
+        current_user.id,
+        request.args.get('before_id', type=int),
+        request.args.get('after_id', type=int),
+        request.args.get('limit', request.args.get('per_page', 50, type=int), type=int)
+    )
+    
+    if not result['success']:
+        return jsonify({'error': result['error']}), 400
     
-    result = PaymentService.get_user_transactions(current_user.id, page, per_page)
     return jsonify(result)
 
+@user_bp.route('/events', methods=['GET'])
+@login_required
+def stream_events():
+    # One stream per tab for balance changes, ticket replies and, for staff, dashboard updates
+    channels = [f'user:{current_user.id}']
+    if current_user.role in (UserRole.ADMIN, UserRole.MODERATOR, UserRole.SUPPORT):
+        channels.append('staff')
+    if current_user.role == UserRole.ADMIN:
+        channels.append('admin')
+    
+    return Response(
+        event_hub.stream(channels),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @user_bp.route('/sessions', methods=['GET'])
 @login_required
 def get_sessions():
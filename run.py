@@ -123,7 +123,7 @@ def create_default_data():
             print(f"Error creating default data: {e}")
 
 if __name__ == '__main__':
-    directories = ['logs', 'uploads/kyc', 'uploads/avatars', '.flask_session']
+    directories = ['logs', 'uploads/kyc', 'uploads/avatars']
     
     for directory in directories:
         os.makedirs(directory, exist_ok=True)
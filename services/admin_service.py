@@ -1,6 +1,7 @@
 from models import db, User, Game, Bet, Transaction, Payout
 from sqlalchemy import func, extract
 from datetime import datetime, timedelta
+from services.game_stats_service import GameStatsService
 
 class AdminService:
     
@@ -38,18 +39,11 @@ class AdminService:
     
     @staticmethod
     def get_game_total_bets(game_id):
-        result = db.session.query(func.sum(Bet.amount)).filter(
-            Bet.game_id == game_id
-        ).scalar()
-        return float(result or 0)
+        return GameStatsService.get_totals(game_id)['wagered']
     
     @staticmethod
     def get_game_total_wins(game_id):
-        result = db.session.query(func.sum(Bet.win_amount)).filter(
-            Bet.game_id == game_id,
-            Bet.result == 'win'
-        ).scalar()
-        return float(result or 0)
+        return GameStatsService.get_totals(game_id)['won']
     
     @staticmethod
     def get_chart_data(days=30):
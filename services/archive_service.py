@@ -0,0 +1,368 @@
+import base64
+import gzip
+import json
+import os
+from array import array
+from datetime import datetime, timedelta
+from itertools import islice
+from flask import current_app
+from models import db, Bet, Transaction, Payout, PaymentIntent
+
+TABLES = {'bets': Bet, 'transactions': Transaction}
+
+# Per-user totals stored in the segment index, so summaries never open the data file
+SUMS = {
+    'bets': (
+        ('amount', lambda row: row['amount'] or 0),
+        ('win_amount', lambda row: row['win_amount'] or 0),
+        ('wins', lambda row: 1 if row['result'] == 'win' else 0)
+    ),
+    'transactions': ()
+}
+
+_indexes = {}
+
+
+class ArchivedRow:
+    # Read-only stand-in for a model instance, rebuilt from one segment line
+
+    archived = True
+
+    def __init__(self, values):
+        self.__dict__.update(values)
+
+
+def _codecs(model):
+    # (name, encode, decode) per column; json only carries strings and numbers
+    codecs = []
+    for column in model.__table__.columns:
+        if isinstance(column.type, db.Enum) and column.type.enum_class:
+            enum_class = column.type.enum_class
+            codecs.append((column.name, lambda v: v.value, enum_class))
+        elif isinstance(column.type, db.DateTime):
+            codecs.append((column.name, datetime.isoformat, datetime.fromisoformat))
+        elif isinstance(column.type, db.LargeBinary):
+            codecs.append((column.name, lambda v: base64.b64encode(v).decode(), base64.b64decode))
+        else:
+            codecs.append((column.name, None, None))
+    return codecs
+
+
+def _month_after(start):
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+def _write_synced(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class ArchiveService:
+    # Rows older than the horizon move into immutable gzip JSONL segments,
+    # one per table and month, laid out as one gzip member per user. The
+    # sidecar index maps user_id -> [offset, length, rows, min_id, max_id, *sums]
+    # so a user's history is a seek and a small decompress.
+
+    @staticmethod
+    def directory(table, root=None):
+        # root lets worker processes without an app context read the archive
+        return os.path.join(root or current_app.config['ARCHIVE_DIR'], table)
+
+    @staticmethod
+    def cutoff(horizon_days):
+        # Only whole months older than the horizon are archived
+        return (datetime.now() - timedelta(days=horizon_days))\
+            .replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def _archivable(table):
+        model = TABLES[table]
+        conditions = [model.timestamp.isnot(None)]
+        if table == 'transactions':
+            # Rows still referenced by payouts or payment intents stay hot
+            conditions.append(~db.exists().where(Payout.transaction_id == Transaction.id))
+            conditions.append(~db.exists().where(PaymentIntent.transaction_id == Transaction.id))
+        return conditions
+
+    @staticmethod
+    def archive(horizon_days=None, tables=None, batch_size=5000):
+        horizon_days = horizon_days or current_app.config['ARCHIVE_HORIZON_DAYS']
+        cutoff = ArchiveService.cutoff(horizon_days)
+        written = []
+
+        for table in tables or TABLES:
+            model = TABLES[table]
+            conditions = ArchiveService._archivable(table)
+            start = None
+            while True:
+                query = db.session.query(db.func.min(model.timestamp)).filter(*conditions, model.timestamp < cutoff)
+                if start is not None:
+                    query = query.filter(model.timestamp >= start)
+                oldest = query.scalar()
+                if oldest is None:
+                    break
+                start = oldest.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+                segment = ArchiveService._write_segment(table, start, _month_after(start), batch_size)
+                if segment:
+                    written.append(segment)
+                start = _month_after(start)
+
+        return written
+
+    @staticmethod
+    def _write_segment(table, start, end, batch_size):
+        model = TABLES[table]
+        codecs = _codecs(model)
+        sums = SUMS[table]
+        query = db.select(*model.__table__.columns)\
+            .where(*ArchiveService._archivable(table), model.timestamp >= start, model.timestamp < end)\
+            .order_by(model.user_id, model.id)\
+            .execution_options(yield_per=batch_size)
+
+        directory = ArchiveService.directory(table)
+        os.makedirs(directory, exist_ok=True)
+        month = start.strftime('%Y-%m')
+        part = 1 + sum(1 for name in os.listdir(directory)
+                       if name.startswith(month) and name.endswith('.index.json'))
+        base = os.path.join(directory, f'{month}-{part:03d}')
+        data_path, index_path = base + '.jsonl.gz', base + '.index.json'
+
+        users = {}
+        ids = array('q')
+
+        def close_member(f, user_id, lines, entry):
+            blob = gzip.compress(b''.join(lines))
+            entry[0], entry[1] = f.tell(), len(blob)
+            f.write(blob)
+            users[str(user_id)] = entry
+
+        with open(data_path + '.tmp', 'wb') as f:
+            user_id, lines, entry = None, [], None
+            for row in db.session.execute(query).mappings():
+                if row['user_id'] != user_id:
+                    if lines:
+                        close_member(f, user_id, lines, entry)
+                    user_id, lines = row['user_id'], []
+                    entry = [0, 0, 0, row['id'], row['id']] + [0] * len(sums)
+                values = {name: (encode(row[name]) if encode and row[name] is not None else row[name])
+                          for name, encode, _ in codecs}
+                lines.append(json.dumps(values, separators=(',', ':')).encode() + b'\n')
+                entry[2] += 1
+                entry[4] = row['id']
+                for i, (_, value) in enumerate(sums):
+                    entry[5 + i] += value(row)
+                ids.append(row['id'])
+            if lines:
+                close_member(f, user_id, lines, entry)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if not ids:
+            os.remove(data_path + '.tmp')
+            return None
+
+        index = {
+            'table': table,
+            'month': month,
+            'part': part,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'rows': len(ids),
+            'created_at': datetime.now().isoformat(),
+            'sums': [name for name, _ in sums],
+            'users': users
+        }
+        _write_synced(index_path + '.tmp', json.dumps(index, separators=(',', ':')).encode())
+
+        # The rows leave the hot table in the same transaction that publishes the
+        # files; a crash in between leaves duplicates, which readers drop by id
+        try:
+            for offset in range(0, len(ids), batch_size):
+                db.session.execute(
+                    db.delete(model)
+                    .where(model.id.in_(ids[offset:offset + batch_size].tolist()))
+                    .execution_options(synchronize_session=False)
+                )
+            os.replace(data_path + '.tmp', data_path)
+            os.replace(index_path + '.tmp', index_path)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            for path in (data_path, index_path, data_path + '.tmp', index_path + '.tmp'):
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+
+        return {'table': table, 'month': month, 'part': part, 'rows': len(ids),
+                'users': len(users), 'bytes': os.path.getsize(data_path)}
+
+    @staticmethod
+    def segments(table, root=None):
+        directory = ArchiveService.directory(table, root)
+        try:
+            names = sorted(os.listdir(directory))
+        except FileNotFoundError:
+            return []
+
+        segments = []
+        for name in names:
+            if not name.endswith('.index.json'):
+                continue
+            path = os.path.join(directory, name)
+            mtime = os.stat(path).st_mtime_ns
+            cached = _indexes.get(path)
+            if cached is None or cached[0] != mtime:
+                with open(path) as f:
+                    index = json.load(f)
+                index['path'] = path[:-len('.index.json')] + '.jsonl.gz'
+                index['start'] = datetime.fromisoformat(index['start'])
+                index['end'] = datetime.fromisoformat(index['end'])
+                cached = _indexes[path] = (mtime, index)
+            segments.append(cached[1])
+        return segments
+
+    @staticmethod
+    def _user_segments(table, user_id):
+        key = str(user_id)
+        return [s for s in ArchiveService.segments(table) if key in s['users']]
+
+    @staticmethod
+    def _read_member(table, segment, user_id):
+        offset, length = segment['users'][str(user_id)][:2]
+        with open(segment['path'], 'rb') as f:
+            f.seek(offset)
+            blob = f.read(length)
+        return list(ArchiveService._decode(table, gzip.decompress(blob).splitlines()))
+
+    @staticmethod
+    def _decode(table, lines):
+        codecs = [(name, decode) for name, _, decode in _codecs(TABLES[table]) if decode]
+        for line in lines:
+            values = json.loads(line)
+            for name, decode in codecs:
+                if values.get(name) is not None:
+                    values[name] = decode(values[name])
+            yield ArchivedRow(values)
+
+    @staticmethod
+    def newest_end(table, user_id):
+        # Upper bound on the timestamps archived for this user, None if there are none
+        segments = ArchiveService._user_segments(table, user_id)
+        return max((s['end'] for s in segments), default=None)
+
+    @staticmethod
+    def user_rows(table, user_id, newest_first=True, before=None, after=None):
+        # Yields a user's archived rows in (timestamp, id) order, strictly past
+        # the before/after position, opening only the months that can match
+        months = {}
+        for segment in ArchiveService._user_segments(table, user_id):
+            months.setdefault(segment['start'], []).append(segment)
+
+        for start in sorted(months, reverse=newest_first):
+            parts = months[start]
+            if before is not None and start > before[0]:
+                continue
+            if after is not None and parts[0]['end'] <= after[0]:
+                continue
+
+            rows = {}
+            for segment in parts:
+                for row in ArchiveService._read_member(table, segment, user_id):
+                    rows.setdefault(row.id, row)
+            ordered = sorted(rows.values(), key=lambda r: (r.timestamp, r.id), reverse=newest_first)
+            for row in ordered:
+                position = (row.timestamp, row.id)
+                if before is not None and position >= before:
+                    continue
+                if after is not None and position <= after:
+                    continue
+                yield row
+
+    @staticmethod
+    def find(table, user_id, row_id):
+        key = str(user_id)
+        for segment in ArchiveService._user_segments(table, user_id):
+            entry = segment['users'][key]
+            if entry[3] <= row_id <= entry[4]:
+                for row in ArchiveService._read_member(table, segment, user_id):
+                    if row.id == row_id:
+                        return row
+        return None
+
+    @staticmethod
+    def position(table, user_id, row_id):
+        # The (timestamp, id) keyset position of a cursor row, hot or archived
+        model = TABLES[table]
+        timestamp = db.session.query(model.timestamp)\
+            .filter(model.id == row_id, model.user_id == user_id).scalar()
+        if timestamp is None:
+            row = ArchiveService.find(table, user_id, row_id)
+            timestamp = row.timestamp if row else None
+        return (timestamp, row_id) if timestamp is not None else None
+
+    @staticmethod
+    def merge_page(table, user_id, rows, position, newest_first, limit):
+        # rows are the hot page (at most limit + 1, already past the cursor);
+        # archived rows are folded in only when the page can reach them
+        end = ArchiveService.newest_end(table, user_id)
+        if end is None:
+            return rows
+        if newest_first and len(rows) > limit and rows[-1].timestamp >= end:
+            return rows
+        if not newest_first and position is not None and position[0] >= end:
+            return rows
+
+        archived = ArchiveService.user_rows(
+            table, user_id, newest_first,
+            before=position if newest_first else None,
+            after=None if newest_first else position
+        )
+        hot_ids = {row.id for row in rows}
+        merged = rows + [row for row in islice(archived, limit + 1 + len(rows)) if row.id not in hot_ids]
+        merged.sort(key=lambda r: (r.timestamp, r.id), reverse=newest_first)
+        return merged[:limit + 1]
+
+    @staticmethod
+    def user_totals(table, user_id):
+        key = str(user_id)
+        totals = {'rows': 0}
+        for segment in ArchiveService._user_segments(table, user_id):
+            entry = segment['users'][key]
+            totals['rows'] += entry[2]
+            for name, value in zip(segment['sums'], entry[5:]):
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    @staticmethod
+    def range_rows(table, low, high, root=None):
+        # Archived rows of users in [low, high), in (user_id, id) order,
+        # reading one user's members at a time
+        segments = ArchiveService.segments(table, root)
+        user_ids = sorted({int(key) for segment in segments for key in segment['users']
+                           if low <= int(key) < high})
+        for user_id in user_ids:
+            rows = {}
+            for segment in segments:
+                if str(user_id) in segment['users']:
+                    for row in ArchiveService._read_member(table, segment, user_id):
+                        rows.setdefault(row.id, row)
+            for row_id in sorted(rows):
+                yield rows[row_id]
+
+    @staticmethod
+    def iter_rows(table):
+        # Every archived row, month by month, for rebuilds that need full history
+        months = {}
+        for segment in ArchiveService.segments(table):
+            months.setdefault(segment['start'], []).append(segment)
+
+        for start in sorted(months):
+            seen = set()
+            for segment in months[start]:
+                with gzip.open(segment['path'], 'rb') as f:
+                    for row in ArchiveService._decode(table, f):
+                        if row.id not in seen:
+                            seen.add(row.id)
+                            yield row
@@ -1,8 +1,10 @@
 from models import db, User, Session, AuditLog, UserRole, UserStatus
 from utils.security import validate_password, validate_email, create_audit_log
-from flask_bcrypt import generate_password_hash, check_password_hash  # Фикс: Импорт bcrypt
+from services.unit_of_work import unit_of_work
+from services.password_hasher import password_hasher, HasherBusy
+from services.token_auth import token_auth, token_hash, bearer_token
+from services.event_hub import event_hub
 from datetime import datetime
-import jwt
 
 class AuthService:
     @staticmethod
@@ -18,45 +20,68 @@ class AuthService:
             return {'success': False, 'error': 'Username already exists'}
         if User.query.filter_by(email=email).first():
             return {'success': False, 'error': 'Email already registered'}
+        try:
+            password_hash = password_hasher.hash(password)
+        except HasherBusy:
+            return {'success': False, 'error': 'Server is busy, please try again', 'busy': True}
 
-        user = User(
-            username=username,
-            email=email,
-            password_hash=generate_password_hash(password).decode('utf-8'),
-            role=UserRole.PLAYER,
-            status=UserStatus.VERIFICATION,
-            registered_at=datetime.now()
-        )
-        db.session.add(user)
-        db.session.commit()
+        with unit_of_work():
+            user = User(
+                username=username,
+                email=email,
+                password_hash=password_hash,
+                role=UserRole.PLAYER,
+                status=UserStatus.VERIFICATION,
+                registered_at=datetime.now()
+            )
+            db.session.add(user)
+            db.session.flush()
 
-        session = AuthService._create_session(user.id, request)
+            session, token = AuthService._create_session(user.id, request)
+            event_hub.publish('admin', 'dashboard', {'users': {'total': 1, 'new': 1}})
         create_audit_log('REGISTER', f'User {username} registered', user.id, request)
-        return {'success': True, 'user': user, 'session': session}
+        return {'success': True, 'user': user, 'session': session, 'token': token}
 
     @staticmethod
     def login_user(username, password, request):
         user = User.query.filter_by(username=username).first()
-        if not user or not check_password_hash(user.password_hash, password):
+        try:
+            valid = user is not None and password_hasher.verify(user.password_hash, password)
+        except HasherBusy:
+            return {'success': False, 'error': 'Server is busy, please try again', 'busy': True}
+        if not valid:
             return {'success': False, 'error': 'Invalid credentials'}
         if user.status == UserStatus.BLOCKED:
             return {'success': False, 'error': 'Account is blocked'}
         if user.status == UserStatus.VERIFICATION:
             return {'success': False, 'error': 'Account pending verification'}
 
-        user.last_login = datetime.now()
-        session = AuthService._create_session(user.id, request)
-        db.session.commit()
+        # The plaintext is only in hand at login, so hashes are upgraded here
+        # when the cost or scheme has changed; a busy pool just defers it
+        new_hash = None
+        if password_hasher.needs_rehash(user.password_hash):
+            try:
+                new_hash = password_hasher.hash(password)
+            except HasherBusy:
+                pass
+
+        with unit_of_work():
+            if new_hash:
+                user.password_hash = new_hash
+            user.last_login = datetime.now()
+            session, token = AuthService._create_session(user.id, request)
         create_audit_log('LOGIN', f'User {user.username} logged in', user.id, request)
-        return {'success': True, 'user': user, 'session': session}
+        return {'success': True, 'user': user, 'session': session, 'token': token}
 
     
     @staticmethod
     def logout_user(user_id, request):
-        session = Session.query.filter_by(
-            user_id=user_id,
-            active=True
-        ).order_by(Session.login_time.desc()).first()
+        query = Session.query.filter_by(user_id=user_id, active=True)
+        token = bearer_token(request)
+        if token:
+            # A token client ends its own session, not the latest browser one
+            query = query.filter_by(token_hash=token_hash(token))
+        session = query.order_by(Session.login_time.desc()).first()
         
         if session:
             session.active = False
@@ -77,16 +102,33 @@ class AuthService:
             active=True
         )
         
-        token = jwt.encode({
-            'user_id': user_id,
-            'exp': datetime.now().timestamp() + 86400 
-        }, 'secret-key', algorithm='HS256')
-        
-        session.token = token
         db.session.add(session)
-        db.session.commit()
+        db.session.flush()
+        
+        # The raw token goes back to the client once; only its hash is kept
+        token, session.token_hash = token_auth.issue(user_id, session.id)
         
-        return session
+        return session, token
+    
+    @staticmethod
+    def change_password(user_id, current_password, new_password):
+        user = User.query.get(user_id)
+        if not user:
+            return {'success': False, 'error': 'User not found'}
+        is_valid, message = validate_password(new_password)
+        if not is_valid:
+            return {'success': False, 'error': message}
+        try:
+            if not password_hasher.verify(user.password_hash, current_password):
+                return {'success': False, 'error': 'Current password is incorrect'}
+            password_hash = password_hasher.hash(new_password)
+        except HasherBusy:
+            return {'success': False, 'error': 'Server is busy, please try again', 'busy': True}
+
+        with unit_of_work():
+            user.password_hash = password_hash
+        create_audit_log('PASSWORD_CHANGE', f'User {user.username} changed password', user.id)
+        return {'success': True}
     
     @staticmethod
     def get_user_profile(user_id):
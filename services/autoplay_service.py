@@ -0,0 +1,271 @@
+import json
+import queue
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from flask import current_app
+from models import db, User, Game, AutoplayRun
+from services.game_service import GameService
+from services.limits_service import LimitsService
+from services.event_hub import event_hub
+from services.unit_of_work import unit_of_work
+
+
+class AutoplaySession:
+    # What the thread playing a session needs; the shared state is its AutoplayRun row
+
+    def __init__(self, user_id, game_id, bet_amount, spins, loss_limit, win_target, stop_on_win, request):
+        self.id = secrets.token_urlsafe(16)
+        self.user_id = user_id
+        self.game_id = game_id
+        self.bet_amount = bet_amount
+        self.spins = spins
+        self.loss_limit = loss_limit
+        self.win_target = win_target
+        self.stop_on_win = stop_on_win
+        self.login_at = LimitsService.session_started_at()
+        # Enough of the originating request for bet rows and audit entries
+        self.request = SimpleNamespace(
+            remote_addr=request.remote_addr,
+            user_agent=SimpleNamespace(string=request.user_agent.string)
+        )
+        self.stop_requested = threading.Event()
+        # Hears when the player's stream is listening, wherever it was opened
+        self.listener = event_hub.subscribe([AutoplayService.channel(self.id)])
+        self.rounds_played = 0
+        self.net = 0
+
+
+class AutoplayService:
+    # Sessions are rows in autoplay_runs and rounds go out through the event
+    # hub, so start, stream and stop may each land on a different worker.
+    # The worker that started a session plays it; the others reach it through
+    # the row's stop_requested flag.
+
+    _running = {}  # sessions played by this process, so a local stop wakes them at once
+    _lock = threading.Lock()
+
+    @staticmethod
+    def channel(session_id):
+        return f'autoplay:{session_id}'
+
+    @staticmethod
+    def start(user, game_id, bet_amount, spins, request, loss_limit=None, win_target=None, stop_on_win=False):
+        max_spins = current_app.config.get('AUTOPLAY_MAX_SPINS', 1000)
+        if spins < 1 or spins > max_spins:
+            return {'success': False, 'error': f'Spins must be between 1 and {max_spins}'}
+
+        game = Game.query.get(game_id)
+        error = GameService._validate_bet(user, game, bet_amount)
+        if error:
+            return {'success': False, 'error': error}
+
+        autoplay = AutoplaySession(user.id, game.id, bet_amount, spins, loss_limit, win_target, stop_on_win, request)
+        # A session whose worker died stops making progress and no longer blocks a new one
+        alive_since = datetime.now() - timedelta(seconds=current_app.config.get('AUTOPLAY_STALE_AFTER', 60))
+        with unit_of_work():
+            running = AutoplayRun.query.filter(
+                AutoplayRun.user_id == user.id,
+                AutoplayRun.status == 'running',
+                AutoplayRun.updated_at >= alive_since
+            ).first()
+            if running is not None:
+                event_hub.unsubscribe(autoplay.listener)
+                return {'success': False, 'error': 'Auto-play is already running'}
+            db.session.add(AutoplayRun(id=autoplay.id, user_id=user.id, game_id=game.id))
+
+        with AutoplayService._lock:
+            AutoplayService._running[autoplay.id] = autoplay
+        app = current_app._get_current_object()
+        threading.Thread(
+            target=AutoplayService._run, args=(app, autoplay),
+            name=f'autoplay-{autoplay.id}', daemon=True
+        ).start()
+
+        return {'success': True, 'session_id': autoplay.id, 'spins': spins}
+
+    @staticmethod
+    def get(session_id, user_id):
+        return AutoplayRun.query.filter_by(id=session_id, user_id=user_id).first()
+
+    @staticmethod
+    def stop(session_id, user_id):
+        with unit_of_work():
+            found = db.session.execute(
+                db.update(AutoplayRun)
+                .where(AutoplayRun.id == session_id, AutoplayRun.user_id == user_id)
+                .values(stop_requested=True)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+        with AutoplayService._lock:
+            autoplay = AutoplayService._running.get(session_id)
+        if autoplay is not None:
+            autoplay.stop_requested.set()
+        return bool(found)
+
+    @staticmethod
+    def stream(run):
+        # Subscribed before the row is re-read, so no event falls between the snapshot and the stream
+        subscriber = event_hub.subscribe([AutoplayService.channel(run.id)])
+        db.session.refresh(run)
+        session_id, user_id, state = run.id, run.user_id, AutoplayService._state(run)
+        # Rounds are not buffered, so the worker playing the session waits for this
+        AutoplayService._emit(session_id, 'attached', {})
+        return AutoplayService._stream(current_app._get_current_object(), session_id, user_id, state, subscriber)
+
+    @staticmethod
+    def _stream(app, session_id, user_id, state, subscriber):
+        # Server-Sent Events; comment lines keep idle proxies from closing the stream
+        ended = False
+        try:
+            if state is not None:
+                yield f"event: {state[0]}\ndata: {json.dumps(state[1])}\n\n"
+                ended = state[0] == 'end'
+            while not ended and not subscriber.overflowed:
+                try:
+                    message = subscriber.events.get(timeout=event_hub.keepalive)
+                except queue.Empty:
+                    # Without a redis bridge the rounds of a session played on
+                    # another worker never arrive here, but its end still does
+                    with app.app_context():
+                        run = db.session.get(AutoplayRun, session_id)
+                        state = AutoplayService._state(run)
+                    if state is not None and state[0] == 'end':
+                        yield f"event: end\ndata: {json.dumps(state[1])}\n\n"
+                        ended = True
+                        continue
+                    yield ': keepalive\n\n'
+                    continue
+                if message['event'] == 'attached':
+                    continue
+                yield f"event: {message['event']}\ndata: {json.dumps(message['data'])}\n\n"
+                ended = message['event'] == 'end'
+        finally:
+            event_hub.unsubscribe(subscriber)
+            if not ended and not subscriber.overflowed:
+                # The player closed the page; no more spins are played on their behalf
+                with app.app_context():
+                    AutoplayService.stop(session_id, user_id)
+
+    @staticmethod
+    def _state(run):
+        # The end of a finished session, or how far a running one has got
+        if run is None:
+            return None
+        summary = {'rounds_played': run.rounds_played, 'net': round(run.net, 2)}
+        if run.status == 'finished':
+            return 'end', dict(summary, reason=run.reason)
+        return 'progress', summary
+
+    @staticmethod
+    def _emit(session_id, name, data):
+        # Events raised inside a transaction wait for its commit, and callers
+        # only ever read before this, so whatever they have open is ended
+        db.session.remove()
+        event_hub.publish(AutoplayService.channel(session_id), name, data)
+
+    @staticmethod
+    def _await_stream(autoplay, timeout):
+        # Holds the first round until a stream is listening, or for at most
+        # timeout seconds when nobody opens one
+        deadline = time.monotonic() + timeout
+        try:
+            while not autoplay.stop_requested.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    message = autoplay.listener.events.get(timeout=remaining)
+                except queue.Empty:
+                    return
+                if message['event'] == 'attached':
+                    return
+        finally:
+            event_hub.unsubscribe(autoplay.listener)
+
+    @staticmethod
+    def _stop_requested(autoplay):
+        # A stop that came in on another worker is only on the row
+        if not autoplay.stop_requested.is_set():
+            stop = db.session.query(AutoplayRun.stop_requested).filter_by(id=autoplay.id).scalar()
+            db.session.remove()
+            if stop:
+                autoplay.stop_requested.set()
+        return autoplay.stop_requested.is_set()
+
+    @staticmethod
+    def _save_progress(autoplay, **values):
+        with unit_of_work():
+            db.session.execute(
+                db.update(AutoplayRun)
+                .where(AutoplayRun.id == autoplay.id)
+                .values(rounds_played=autoplay.rounds_played, net=autoplay.net, updated_at=datetime.now(), **values)
+                .execution_options(synchronize_session=False)
+            )
+
+    @staticmethod
+    def _run(app, autoplay):
+        with app.app_context():
+            reason = 'error'
+            try:
+                reason = AutoplayService._play(autoplay)
+            except Exception:
+                current_app.logger.exception(f'Auto-play session {autoplay.id} failed')
+            finally:
+                db.session.remove()
+                try:
+                    AutoplayService._save_progress(autoplay, status='finished', reason=reason)
+                except Exception:
+                    current_app.logger.exception(f'Auto-play session {autoplay.id} could not be closed')
+                AutoplayService._emit(autoplay.id, 'end', {
+                    'reason': reason,
+                    'rounds_played': autoplay.rounds_played,
+                    'net': round(autoplay.net, 2)
+                })
+                with AutoplayService._lock:
+                    AutoplayService._running.pop(autoplay.id, None)
+
+    @staticmethod
+    def _play(autoplay):
+        chunk_size = current_app.config.get('AUTOPLAY_CHUNK_SIZE', 10)
+        interval = current_app.config.get('AUTOPLAY_SPIN_INTERVAL', 1.0)
+        AutoplayService._await_stream(autoplay, current_app.config.get('AUTOPLAY_ATTACH_TIMEOUT', 5))
+
+        while autoplay.rounds_played < autoplay.spins:
+            if AutoplayService._stop_requested(autoplay):
+                return 'stopped'
+
+            user = db.session.get(User, autoplay.user_id, populate_existing=True)
+            error = LimitsService.check_session_time(user, autoplay.login_at)
+            if error:
+                AutoplayService._emit(autoplay.id, 'failed', {'error': error})
+                return 'session_time_limit'
+
+            # Limits carry over between chunks as what is left of them
+            result = GameService.play_batch(
+                user, autoplay.game_id, autoplay.bet_amount,
+                min(chunk_size, autoplay.spins - autoplay.rounds_played), autoplay.request,
+                stop_on_win=autoplay.stop_on_win,
+                loss_limit=None if autoplay.loss_limit is None else autoplay.loss_limit + autoplay.net,
+                win_target=None if autoplay.win_target is None else autoplay.win_target - autoplay.net
+            )
+            db.session.remove()
+            if not result['success']:
+                AutoplayService._emit(autoplay.id, 'failed', {'error': result['error']})
+                return 'error'
+
+            autoplay.net += result['total_win'] - result['total_bet']
+            for round_result in result['rounds']:
+                autoplay.rounds_played += 1
+                AutoplayService._emit(autoplay.id, 'round', dict(round_result, round=autoplay.rounds_played))
+                # Rounds of a settled chunk are always reported, just without pacing once stopped
+                if not AutoplayService._stop_requested(autoplay):
+                    autoplay.stop_requested.wait(interval)
+            AutoplayService._save_progress(autoplay)
+
+            if result['stop_reason'] != 'completed':
+                return result['stop_reason']
+
+        return 'completed'
@@ -0,0 +1,144 @@
+import atexit
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from models import db, Bet, Transaction
+from services.wallet_service import WalletService
+from services.limits_service import LimitsService
+from services.game_stats_service import GameStatsService
+from services.game_counters import game_counters
+
+
+class BetLedger:
+    # Group-commit settlement: play requests queue a ledger entry and one
+    # committer thread writes many players' entries per transaction
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._app = None
+        self._thread = None
+        self.enabled = False
+        self.commit_interval = 0.005
+        self.max_batch = 500
+        self.timeout = 10
+
+    def init_app(self, app):
+        self._app = app
+        self.commit_interval = app.config.get('BET_LEDGER_COMMIT_INTERVAL', 0.005)
+        self.max_batch = app.config.get('BET_LEDGER_MAX_BATCH', 500)
+        self.timeout = app.config.get('BET_LEDGER_TIMEOUT', 10)
+        self.set_mode(app.config.get('BET_SETTLEMENT_MODE', 'direct'))
+
+    def set_mode(self, mode):
+        if mode not in ('direct', 'group'):
+            raise ValueError(f'Unknown bet settlement mode: {mode}')
+        self.enabled = mode == 'group'
+
+        if self.enabled and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='bet-ledger', daemon=True)
+            self._thread.start()
+            atexit.register(self._drain)
+
+    def submit(self, entry):
+        # entry: user_id, game_id, delta, required, bet_row, transaction_rows
+        # (balances relative to the starting balance) and jackpot
+        future = Future()
+        self._queue.put((entry, future))
+        return future
+
+    def settle(self, entry):
+        return self.submit(entry).result(timeout=self.timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.commit_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._commit_in_context(batch)
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._commit_in_context(batch)
+
+    def _commit_in_context(self, batch):
+        with self._app.app_context():
+            self._commit(batch)
+
+    def _commit(self, batch):
+        entries = [entry for entry, _ in batch]
+        try:
+            results = BetLedger._settle(entries)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) > 1:
+                # Isolate the bad entry so it cannot fail everyone else's bets
+                for item in batch:
+                    self._commit([item])
+                return
+            batch[0][1].set_exception(e)
+            return
+
+        # In-memory counters only move once the rows are durable
+        for entry, result in zip(entries, results):
+            if result['success']:
+                game_counters.increment(entry['game_id'], popularity=1, jackpot=entry.get('jackpot', 0))
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    @staticmethod
+    def _settle(entries):
+        results = []
+        transaction_rows = []
+        bet_rows = defaultdict(list)
+        user_totals = defaultdict(lambda: [0, 0])
+
+        for entry in entries:
+            new_balance = WalletService.apply_to(entry['user_id'], entry['delta'], entry['required'])
+            if new_balance is None:
+                results.append({'success': False, 'error': 'Insufficient balance'})
+                continue
+
+            # Copy rather than shift in place: a failed batch is retried entry by entry
+            start_balance = new_balance - entry['delta']
+            for row in entry['transaction_rows']:
+                transaction_rows.append(dict(
+                    row,
+                    balance_before=row['balance_before'] + start_balance,
+                    balance_after=row['balance_after'] + start_balance
+                ))
+
+            bet = entry['bet_row']
+            bet_rows[entry['game_id']].append(bet)
+            user_totals[entry['user_id']][0] += bet['amount']
+            user_totals[entry['user_id']][1] += bet['win_amount']
+            results.append({'success': True, 'new_balance': new_balance})
+
+        if transaction_rows:
+            db.session.execute(db.insert(Transaction), transaction_rows)
+        for game_id, rows in bet_rows.items():
+            db.session.execute(db.insert(Bet), rows)
+            GameStatsService.record_bets(game_id, rows)
+        for user_id, (wagered, won) in user_totals.items():
+            LimitsService.record_bet(user_id, wagered, won)
+
+        return results
+
+
+bet_ledger = BetLedger()
@@ -0,0 +1,150 @@
+import json
+import os
+import queue
+import threading
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession
+from flask import has_app_context
+from models import db
+
+PENDING_KEY = 'event_hub_pending'
+BRIDGE_CHANNEL = 'casino:events'
+
+
+class _Subscriber:
+
+    def __init__(self, channels, max_queue):
+        self.channels = channels
+        self.events = queue.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def put(self, message):
+        try:
+            self.events.put_nowait(message)
+        except queue.Full:
+            # A client that cannot keep up reconnects and reloads its state
+            self.overflowed = True
+
+
+class EventHub:
+    # In-process fan-out of change events to Server-Sent Events streams.
+    # Events raised inside a transaction are sent only once it commits, and
+    # with a redis bridge every worker process receives every event.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._app = None
+        self._bridge = None
+        self._listener_pid = None
+        self._registered = False
+        self.keepalive = 15
+        self.max_queue = 100
+
+    def init_app(self, app):
+        self._app = app
+        self.keepalive = app.config.get('EVENT_STREAM_KEEPALIVE', 15)
+        self.max_queue = app.config.get('EVENT_STREAM_QUEUE_SIZE', 100)
+
+        url = app.config.get('EVENT_HUB_REDIS_URL')
+        if url:
+            try:
+                import redis
+                self._bridge = redis.Redis.from_url(url)
+            except ImportError:
+                app.logger.warning('redis is not installed; events reach this process only')
+
+        if not self._registered:
+            event.listen(OrmSession, 'after_commit', self._after_commit)
+            event.listen(OrmSession, 'after_soft_rollback', self._after_rollback)
+            self._registered = True
+
+    def publish(self, channel, name, data, key=None):
+        # Call before the commit that makes the change visible; the event is
+        # held until then. key coalesces repeats, e.g. the latest balance
+        if has_app_context():
+            session = db.session()
+            if session.in_transaction():
+                pending = session.info.setdefault(PENDING_KEY, {})
+                pending[(channel, name, key) if key is not None else len(pending)] = (channel, name, data)
+                return
+        self._send(channel, name, data)
+
+    def _after_commit(self, session):
+        pending = session.info.pop(PENDING_KEY, None)
+        if pending:
+            for channel, name, data in pending.values():
+                self._send(channel, name, data)
+
+    def _after_rollback(self, session, previous_transaction):
+        if previous_transaction.parent is None:
+            session.info.pop(PENDING_KEY, None)
+
+    def _send(self, channel, name, data):
+        message = {'channel': channel, 'event': name, 'data': data}
+        if self._bridge is not None:
+            try:
+                self._bridge.publish(BRIDGE_CHANNEL, json.dumps(message))
+                return
+            except Exception as e:
+                self._app.logger.warning(f'Event bridge publish failed, delivering locally: {e}')
+        self._dispatch(message)
+
+    def _dispatch(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(message['channel'], ()))
+        for subscriber in subscribers:
+            subscriber.put(message)
+
+    def _ensure_listener(self):
+        # One bridge listener per process, started on first subscription
+        if self._bridge is None or self._listener_pid == os.getpid():
+            return
+        self._listener_pid = os.getpid()
+        threading.Thread(target=self._listen, name='event-bridge', daemon=True).start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._bridge.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(BRIDGE_CHANNEL)
+                for item in pubsub.listen():
+                    self._dispatch(json.loads(item['data']))
+            except Exception as e:
+                self._app.logger.warning(f'Event bridge listener restarting: {e}')
+                threading.Event().wait(1)
+
+    def subscribe(self, channels):
+        subscriber = _Subscriber(tuple(channels), self.max_queue)
+        with self._lock:
+            self._ensure_listener()
+            for channel in subscriber.channels:
+                self._subscribers.setdefault(channel, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            for channel in subscriber.channels:
+                listeners = self._subscribers.get(channel)
+                if listeners:
+                    listeners.discard(subscriber)
+                    if not listeners:
+                        del self._subscribers[channel]
+
+    def stream(self, channels):
+        # Server-Sent Events; comment lines keep idle proxies from closing the stream
+        subscriber = self.subscribe(channels)
+        try:
+            yield 'retry: 5000\nevent: ready\ndata: {}\n\n'
+            while not subscriber.overflowed:
+                try:
+                    message = subscriber.events.get(timeout=self.keepalive)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f"event: {message['event']}\ndata: {json.dumps(message['data'])}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+
+event_hub = EventHub()
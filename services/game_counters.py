@@ -0,0 +1,106 @@
+import atexit
+import threading
+import time
+from collections import defaultdict
+from models import db, Game
+from services.unit_of_work import unit_of_work
+
+
+class GameCounters:
+
+    FIELDS = ('popularity', 'jackpot')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(lambda: dict.fromkeys(GameCounters.FIELDS, 0))
+        self._app = None
+        self._thread = None
+        self.flush_interval = 5
+
+    def init_app(self, app):
+        self._app = app
+        self.flush_interval = app.config.get('GAME_COUNTER_FLUSH_INTERVAL', 5)
+
+        if self.flush_interval and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='game-counters', daemon=True)
+            self._thread.start()
+            atexit.register(self._flush_in_context)
+
+    def increment(self, game_id, popularity=0, jackpot=0):
+        if not self.flush_interval:
+            # Write-through mode: callers increment once their bet is committed,
+            # so this commits on its own unless it joins an open unit of work
+            with unit_of_work():
+                GameCounters._apply(game_id, {'popularity': popularity, 'jackpot': jackpot})
+            return
+
+        with self._lock:
+            pending = self._pending[game_id]
+            pending['popularity'] += popularity
+            pending['jackpot'] += jackpot
+
+    def pending(self, game_id):
+        with self._lock:
+            pending = self._pending.get(game_id)
+            return dict(pending) if pending else dict.fromkeys(GameCounters.FIELDS, 0)
+
+    def snapshot(self):
+        # Increments not yet flushed, as a hashable value
+        with self._lock:
+            return tuple(sorted(
+                (game_id, pending['popularity'], pending['jackpot'])
+                for game_id, pending in self._pending.items()
+            ))
+
+    def popularity(self, game):
+        return (game.popularity or 0) + self.pending(game.id)['popularity']
+
+    def jackpot(self, game):
+        return (game.jackpot or 0) + self.pending(game.id)['jackpot']
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, defaultdict(lambda: dict.fromkeys(GameCounters.FIELDS, 0))
+
+        if not batch:
+            return 0
+
+        try:
+            for game_id, deltas in batch.items():
+                GameCounters._apply(game_id, deltas)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            with self._lock:
+                for game_id, deltas in batch.items():
+                    for field, value in deltas.items():
+                        self._pending[game_id][field] += value
+            print(f"Failed to flush game counters: {e}")
+            return 0
+
+        return len(batch)
+
+    @staticmethod
+    def _apply(game_id, deltas):
+        values = {
+            field: db.func.coalesce(getattr(Game, field), 0) + value
+            for field, value in deltas.items() if value
+        }
+        if values:
+            values['version'] = db.func.coalesce(Game.version, 0) + 1
+            db.session.execute(
+                db.update(Game).where(Game.id == game_id).values(**values)
+                .execution_options(synchronize_session=False)
+            )
+
+    def _flush_in_context(self):
+        with self._app.app_context():
+            self.flush()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self._flush_in_context()
+
+
+game_counters = GameCounters()
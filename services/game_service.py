@@ -1,9 +1,19 @@
 from models import db, Game, Bet, Transaction, AuditLog, TransactionType
 from utils.security import create_audit_log
+from utils.helpers import generate_reference
+from services.outcome_model import get_outcome_model
+from services.wallet_service import WalletService
+from services.game_counters import game_counters
+from services.unit_of_work import unit_of_work
+from services.limits_service import LimitsService
+from services.game_stats_service import GameStatsService
+from services.bet_ledger import bet_ledger
+from services.archive_service import ArchiveService
+from utils.round_data import pack_round, describe_round
+from flask import current_app
 from datetime import datetime
-import random
+from types import SimpleNamespace
 import json
-import math
 
 class GameService:
     
@@ -23,90 +33,89 @@ class GameService:
             'provider': g.provider,
             'image_url': g.image_url,
             'has_bonus': g.has_bonus,
-            'jackpot': g.jackpot,
-            'popularity': g.popularity or 0
+            'jackpot': game_counters.jackpot(g),
+            'popularity': game_counters.popularity(g)
         } for g in games]
     
     @staticmethod
     def play_game(user, game_id, bet_amount, request):
         game = Game.query.get(game_id)
-        if not game:
-            return {'success': False, 'error': 'Game not found'}
-        
-        if not game.active:
-            return {'success': False, 'error': 'Game is not active'}
-        if game.maintenance:
-            return {'success': False, 'error': 'Game is under maintenance'}
-        
-        if bet_amount < game.min_bet:
-            return {'success': False, 'error': f'Bet amount below minimum (${game.min_bet})'}
-        if bet_amount > game.max_bet:
-            return {'success': False, 'error': f'Bet amount above maximum (${game.max_bet})'}
-        if bet_amount > user.balance:
-            return {'success': False, 'error': 'Insufficient balance'}
-        
-        if user.bet_limit and bet_amount > user.bet_limit:
-            return {'success': False, 'error': f'Exceeds your bet limit (${user.bet_limit})'}
-        
-        is_win, multiplier, win_amount = GameService._calculate_game_result(game, bet_amount)
-        
-        transaction_bet = Transaction(
-            user_id=user.id,
-            type=TransactionType.BET,
-            amount=bet_amount,
-            balance_before=user.balance,
-            balance_after=user.balance - bet_amount,
-            status='completed',
-            description=f'Bet on {game.title}',
-            timestamp=datetime.now(),
-            reference=f'BET_{datetime.now().strftime("%Y%m%d%H%M%S")}_{random.randint(1000, 9999)}'
-        )
-        
-        user.balance -= bet_amount
-        db.session.add(transaction_bet)
+        error = GameService._validate_bet(user, game, bet_amount)
+        if error:
+            return {'success': False, 'error': error}
         
-        game_data = {
-            'random_seed': random.random(),
-            'timestamp': datetime.now().isoformat(),
-            'game_type': game.category,
-            'volatility': game.volatility,
-            'result_type': 'win' if is_win else 'loss',
-            'multiplier': multiplier,
-            'rtp': game.rtp,
-            'bet_amount': bet_amount
-        }
-        
-        bet = Bet(
-            user_id=user.id,
-            game_id=game.id,
-            amount=bet_amount,
-            multiplier=multiplier,
-            result='win' if is_win else 'loss',
-            win_amount=win_amount,
-            ip_address=request.remote_addr,
-            game_data=json.dumps(game_data)
-        )
-        db.session.add(bet)
+        is_win, multiplier, win_amount, round_data = GameService._calculate_game_result(game, bet_amount)
         
-        if is_win:
-            transaction_win = Transaction(
-                user_id=user.id,
-                type=TransactionType.WIN,
-                amount=win_amount,
-                balance_before=user.balance,
-                balance_after=user.balance + win_amount,
-                status='completed',
-                description=f'Win from {game.title} (x{multiplier})',
-                timestamp=datetime.now(),
-                reference=f'WIN_{datetime.now().strftime("%Y%m%d%H%M%S")}_{random.randint(1000, 9999)}'
-            )
-            user.balance += win_amount
-            db.session.add(transaction_win)
+        if bet_ledger.enabled:
+            entry = GameService._ledger_entry(user, game, bet_amount, is_win, multiplier, win_amount, round_data, request)
+            game_data = describe_round(SimpleNamespace(**entry['bet_row']), game)
+            try:
+                settled = bet_ledger.settle(entry)
+            except Exception as e:
+                # A timed-out entry may still commit later, so never report it as lost
+                if not isinstance(e, TimeoutError):
+                    current_app.logger.exception(f'Bet settlement failed for user {user.id} on game {game.id}')
+                return {'success': False, 'error': 'Bet settlement delayed, check your game history before retrying'}
+            if not settled['success']:
+                return settled
+            WalletService._sync(user, settled['new_balance'])
+        else:
+            with unit_of_work():
+                new_balance = WalletService.debit(user, bet_amount)
+                if new_balance is None:
+                    return {'success': False, 'error': 'Insufficient balance'}
+            
+                transaction_bet = Transaction(
+                    user_id=user.id,
+                    type=TransactionType.BET,
+                    amount=bet_amount,
+                    balance_before=new_balance + bet_amount,
+                    balance_after=new_balance,
+                    status='completed',
+                    description=f'Bet on {game.title}',
+                    timestamp=datetime.now(),
+                    reference=generate_reference('BET')
+                )
+                db.session.add(transaction_bet)
+            
+                bet = Bet(
+                    user_id=user.id,
+                    game_id=game.id,
+                    amount=bet_amount,
+                    multiplier=multiplier,
+                    result='win' if is_win else 'loss',
+                    win_amount=win_amount,
+                    timestamp=datetime.now(),
+                    ip_address=request.remote_addr,
+                    round_data=round_data
+                )
+                db.session.add(bet)
+                game_data = describe_round(bet, game)
+            
+                if is_win:
+                    new_balance = WalletService.credit(user, win_amount)
+                    transaction_win = Transaction(
+                        user_id=user.id,
+                        type=TransactionType.WIN,
+                        amount=win_amount,
+                        balance_before=new_balance - win_amount,
+                        balance_after=new_balance,
+                        status='completed',
+                        description=f'Win from {game.title} (x{multiplier})',
+                        timestamp=datetime.now(),
+                        reference=generate_reference('WIN')
+                    )
+                    db.session.add(transaction_win)
+            
+                LimitsService.record_bet(user.id, bet_amount, win_amount)
+                GameStatsService.record_bet(game.id, bet_amount, win_amount, bet.result, bet.timestamp)
+            
+            # In-memory counters only move once the bet is committed
+            jackpot_contribution = 0
+            if is_win and game_counters.jackpot(game) > 0 and multiplier >= 50:
+                jackpot_contribution = win_amount * 0.01
+            game_counters.increment(game.id, popularity=1, jackpot=jackpot_contribution)
             
-            if game.jackpot > 0 and multiplier >= 50:
-                jackpot_contribution = win_amount * 0.01  
-                game.jackpot += jackpot_contribution
-        
         create_audit_log(
             'GAME_PLAY',
             f'User {user.username} played {game.title}, bet: ${bet_amount}, {"win" if is_win else "loss"}: ${win_amount}',
@@ -114,10 +123,6 @@ class GameService:
             request
         )
         
-        game.popularity = (game.popularity or 0) + 1
-        
-        db.session.commit()
-        
         return {
             'success': True,
             'result': 'win' if is_win else 'loss',
@@ -131,135 +136,370 @@ class GameService:
         }
     
     @staticmethod
-    def _calculate_game_result(game, bet_amount):
-        base_win_prob = game.rtp / 100
+    def _ledger_entry(user, game, bet_amount, is_win, multiplier, win_amount, round_data, request):
+        now = datetime.now()
+        transaction_rows = [{
+            'user_id': user.id,
+            'type': TransactionType.BET,
+            'amount': bet_amount,
+            'balance_before': 0,
+            'balance_after': -bet_amount,
+            'status': 'completed',
+            'description': f'Bet on {game.title}',
+            'timestamp': now,
+            'reference': generate_reference('BET')
+        }]
+        jackpot_contribution = 0
+        if is_win:
+            transaction_rows.append({
+                'user_id': user.id,
+                'type': TransactionType.WIN,
+                'amount': win_amount,
+                'balance_before': -bet_amount,
+                'balance_after': win_amount - bet_amount,
+                'status': 'completed',
+                'description': f'Win from {game.title} (x{multiplier})',
+                'timestamp': now,
+                'reference': generate_reference('WIN')
+            })
+            if game_counters.jackpot(game) > 0 and multiplier >= 50:
+                jackpot_contribution = win_amount * 0.01
+        
+        return {
+            'user_id': user.id,
+            'game_id': game.id,
+            'delta': win_amount - bet_amount,
+            'required': bet_amount,
+            'jackpot': jackpot_contribution,
+            'transaction_rows': transaction_rows,
+            'bet_row': {
+                'user_id': user.id,
+                'game_id': game.id,
+                'amount': bet_amount,
+                'multiplier': multiplier,
+                'result': 'win' if is_win else 'loss',
+                'win_amount': win_amount,
+                'timestamp': now,
+                'ip_address': request.remote_addr,
+                'round_data': round_data
+            }
+        }
+    
+    @staticmethod
+    def play_batch(user, game_id, bet_amount, rounds, request,
+                   stop_on_win=False, loss_limit=None, win_target=None):
+        max_rounds = current_app.config.get('MAX_BATCH_ROUNDS', 100)
+        if rounds < 1 or rounds > max_rounds:
+            return {'success': False, 'error': f'Rounds must be between 1 and {max_rounds}'}
         
-        random_factor = random.uniform(0.95, 1.05) 
-        actual_win_prob = min(0.95, max(0.05, base_win_prob * random_factor))
+        game = Game.query.get(game_id)
+        error = GameService._validate_bet(user, game, bet_amount)
+        if error:
+            return {'success': False, 'error': error}
         
-        rng = random.SystemRandom()
+        # Rounds are simulated relative to the starting balance; the real
+        # balances are filled in once the whole batch is settled atomically
+        balance = 0
+        lowest = 0
+        available = user.balance
+        loss_allowance = LimitsService.remaining_loss(user)
+        bet_rows = []
+        transaction_rows = []
+        results = []
+        total_bet = 0
+        total_win = 0
+        jackpot_contribution = 0
+        stop_reason = 'completed'
         
-        if rng.random() < actual_win_prob:
-            if game.category == 'slots':
-                multiplier = GameService._calculate_slot_multiplier(game.volatility)
-            elif game.category == 'roulette':
-                multiplier = GameService._calculate_roulette_multiplier()
-            elif game.category == 'blackjack':
-                multiplier = 1.5  
-            elif game.category == 'poker':
-                multiplier = GameService._calculate_poker_multiplier()
-            else:
-                multiplier = rng.choice([1.5, 2, 3, 5])
+        for round_number in range(1, rounds + 1):
+            if bet_amount > available + balance:
+                stop_reason = 'insufficient_balance'
+                break
+            if total_bet - total_win + bet_amount > loss_allowance:
+                stop_reason = 'daily_loss_limit'
+                break
             
-            max_multiplier = 10000  
-            multiplier = min(multiplier, max_multiplier)
+            is_win, multiplier, win_amount, round_data = GameService._calculate_game_result(game, bet_amount)
+            now = datetime.now()
             
-            win_amount = bet_amount * multiplier
+            transaction_rows.append({
+                'user_id': user.id,
+                'type': TransactionType.BET,
+                'amount': bet_amount,
+                'balance_before': balance,
+                'balance_after': balance - bet_amount,
+                'status': 'completed',
+                'description': f'Bet on {game.title}',
+                'timestamp': now,
+                'reference': generate_reference('BET')
+            })
+            balance -= bet_amount
+            lowest = min(lowest, balance)
             
-            win_amount = round(win_amount, 2)
+            bet_row = {
+                'user_id': user.id,
+                'game_id': game.id,
+                'amount': bet_amount,
+                'multiplier': multiplier,
+                'result': 'win' if is_win else 'loss',
+                'win_amount': win_amount,
+                'timestamp': now,
+                'ip_address': request.remote_addr,
+                'round_data': round_data
+            }
+            bet_rows.append(bet_row)
+            game_data = describe_round(SimpleNamespace(**bet_row), game)
             
-            return True, multiplier, win_amount
-        else:
-            return False, 0, 0
-    
-    @staticmethod
-    def _calculate_slot_multiplier(volatility):
-        rng = random.SystemRandom()
+            if is_win:
+                transaction_rows.append({
+                    'user_id': user.id,
+                    'type': TransactionType.WIN,
+                    'amount': win_amount,
+                    'balance_before': balance,
+                    'balance_after': balance + win_amount,
+                    'status': 'completed',
+                    'description': f'Win from {game.title} (x{multiplier})',
+                    'timestamp': now,
+                    'reference': generate_reference('WIN')
+                })
+                balance += win_amount
+                
+                if game_counters.jackpot(game) > 0 and multiplier >= 50:
+                    jackpot_contribution += win_amount * 0.01
+            
+            total_bet += bet_amount
+            total_win += win_amount
+            results.append({
+                'round': round_number,
+                'result': 'win' if is_win else 'loss',
+                'bet_amount': bet_amount,
+                'win_amount': win_amount,
+                'multiplier': multiplier,
+                'balance': balance,
+                'game_data': game_data
+            })
+            
+            net = total_win - total_bet
+            if stop_on_win and is_win:
+                stop_reason = 'win'
+                break
+            if loss_limit is not None and -net >= loss_limit:
+                stop_reason = 'loss_limit'
+                break
+            if win_target is not None and net >= win_target:
+                stop_reason = 'win_target'
+                break
         
-        if volatility == 'low':
-            weights = [0.4, 0.3, 0.2, 0.08, 0.02]  
-            multipliers = [1.2, 1.5, 2, 3, 5]
-        elif volatility == 'high':
-            weights = [0.2, 0.3, 0.25, 0.15, 0.1]
-            multipliers = [1.5, 2, 5, 10, 20]
-        else:
-            weights = [0.3, 0.35, 0.2, 0.1, 0.05]
-            multipliers = [1.5, 2, 3, 5, 10]
+        if not results:
+            return {'success': False, 'error': 'Insufficient balance'}
+        
+        with unit_of_work():
+            new_balance = WalletService.apply(user, balance, required=-lowest)
+            if new_balance is None:
+                return {'success': False, 'error': 'Insufficient balance'}
+            
+            start_balance = new_balance - balance
+            for row in transaction_rows:
+                row['balance_before'] += start_balance
+                row['balance_after'] += start_balance
+            for result in results:
+                result['balance'] += start_balance
+            
+            db.session.execute(db.insert(Transaction), transaction_rows)
+            db.session.execute(db.insert(Bet), bet_rows)
+            
+            LimitsService.record_bet(user.id, total_bet, total_win)
+            GameStatsService.record_bets(game.id, bet_rows)
         
-        return rng.choices(multipliers, weights=weights)[0]
+        game_counters.increment(game.id, popularity=len(results), jackpot=jackpot_contribution)
+            
+        create_audit_log(
+            'GAME_PLAY_BATCH',
+            f'User {user.username} played {len(results)} rounds of {game.title}, '
+            f'bet: ${total_bet}, won: ${round(total_win, 2)}',
+            user.id,
+            request
+        )
+        
+        return {
+            'success': True,
+            'rounds': results,
+            'rounds_played': len(results),
+            'stop_reason': stop_reason,
+            'total_bet': round(total_bet, 2),
+            'total_win': round(total_win, 2),
+            'new_balance': user.balance,
+            'timestamp': datetime.now().isoformat(),
+            'game_title': game.title
+        }
     
     @staticmethod
-    def _calculate_roulette_multiplier():
-        rng = random.SystemRandom()
+    def _validate_bet(user, game, bet_amount):
+        if not game:
+            return 'Game not found'
         
-        outcomes = {
-            1.1: 0.4865, 
-            2: 0.3243,    
-            3: 0.1622,    
-            8: 0.0811,    
-            11: 0.0541,   
-            17: 0.0270,   
-            35: 0.0270    
-        }
+        if not game.active:
+            return 'Game is not active'
+        if game.maintenance:
+            return 'Game is under maintenance'
         
-        multipliers = list(outcomes.keys())
-        probabilities = list(outcomes.values())
+        if bet_amount < game.min_bet:
+            return f'Bet amount below minimum (${game.min_bet})'
+        if bet_amount > game.max_bet:
+            return f'Bet amount above maximum (${game.max_bet})'
+        if bet_amount > user.balance:
+            return 'Insufficient balance'
+        
+        if user.bet_limit and bet_amount > user.bet_limit:
+            return f'Exceeds your bet limit (${user.bet_limit})'
+        
+        return LimitsService.check_bet(user, bet_amount)
+    
+    @staticmethod
+    def _calculate_game_result(game, bet_amount):
+        model = get_outcome_model(game)
+        outcome, draw = model.draw()
+        is_win, multiplier = model.outcomes[outcome]
+        round_data = pack_round(outcome, draw)
         
-        return rng.choices(multipliers, weights=probabilities)[0]
+        if is_win:
+            win_amount = round(bet_amount * multiplier, 2)
+            return True, multiplier, win_amount, round_data
+        else:
+            return False, 0, 0, round_data
     
     @staticmethod
-    def _calculate_poker_multiplier():
-        rng = random.SystemRandom()
+    def compact_legacy_game_data(batch_size=5000):
+        # Adds bets.round_data on databases created before it existed, then
+        # packs each JSON game_data blob into it and clears the JSON
+        inspector = db.inspect(db.engine)
+        if 'round_data' not in {c['name'] for c in inspector.get_columns('bets')}:
+            column_type = db.LargeBinary(16).compile(dialect=db.engine.dialect)
+            with db.engine.begin() as conn:
+                conn.execute(db.text(f'ALTER TABLE bets ADD COLUMN round_data {column_type}'))
         
-        hand_strength = rng.random()
+        games = {g.id: g for g in Game.query.all()}
+        converted = 0
+        last_id = 0
+        
+        while True:
+            rows = db.session.execute(
+                db.select(Bet.id, Bet.game_id, Bet.result, Bet.multiplier, Bet.game_data)
+                .where(Bet.id > last_id, Bet.game_data.isnot(None))
+                .order_by(Bet.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            
+            updates = []
+            for row in rows:
+                try:
+                    legacy = json.loads(row.game_data)
+                except ValueError:
+                    legacy = {}
+                
+                game = games.get(row.game_id)
+                outcome = None
+                if game:
+                    outcome = get_outcome_model(game).index_of(row.result == 'win', row.multiplier or 0)
+                
+                updates.append({
+                    'id': row.id,
+                    'round_data': pack_round(outcome, float(legacy.get('random_seed') or 0.0)),
+                    'game_data': None
+                })
+            
+            db.session.execute(db.update(Bet), updates)
+            db.session.commit()
+            converted += len(updates)
+            last_id = rows[-1].id
         
-        if hand_strength > 0.95:  
-            return rng.choice([10, 20, 50])
-        elif hand_strength > 0.8: 
-            return rng.choice([3, 5, 8])
-        elif hand_strength > 0.5:
-            return rng.choice([1.5, 2, 2.5])
-        else:  
-            return 1  
+        return converted
     
     @staticmethod
-    def get_user_game_history(user_id, page=1, per_page=20):
-        bets = Bet.query.filter_by(user_id=user_id)\
-            .order_by(Bet.timestamp.desc())\
-            .paginate(page=page, per_page=per_page, error_out=False)
+    def get_user_game_history(user_id, before_id=None, after_id=None, limit=20,
+                              include_total=False, details=False):
+        limit = max(1, min(limit, 100))
+        query = Bet.query.filter(Bet.user_id == user_id)
+        if details:
+            query = query.options(db.undefer(Bet.round_data), db.undefer(Bet.game_data))
+        
+        newest_first = after_id is None
+        anchor_id = after_id if after_id is not None else before_id
+        anchor = None
+        if anchor_id is not None:
+            # The cursor may point into the archive once a user pages far enough back
+            anchor = ArchiveService.position('bets', user_id, anchor_id)
+            if anchor is None:
+                return {'success': False, 'error': 'Invalid cursor'}
+            position = db.tuple_(Bet.timestamp, Bet.id)
+            query = query.filter(position < anchor if newest_first else position > anchor)
+        
+        if newest_first:
+            query = query.order_by(Bet.timestamp.desc(), Bet.id.desc())
+        else:
+            query = query.order_by(Bet.timestamp.asc(), Bet.id.asc())
+        
+        rows = ArchiveService.merge_page('bets', user_id, query.limit(limit + 1).all(), anchor, newest_first, limit)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if not newest_first:
+            rows.reverse()
+        
+        game_ids = {bet.game_id for bet in rows}
+        games = {g.id: g for g in Game.query.filter(Game.id.in_(game_ids))} if game_ids else {}
         
         history = []
-        for bet in bets.items:
-            game_data = {}
-            try:
-                game_data = json.loads(bet.game_data) if bet.game_data else {}
-            except:
-                pass
-            
-            history.append({
+        for bet in rows:
+            game = games.get(bet.game_id)
+            entry = {
                 'id': bet.id,
-                'game_title': bet.game.title if bet.game else 'Unknown Game',
-                'game_category': bet.game.category if bet.game else '',
+                'game_title': game.title if game else 'Unknown Game',
+                'game_category': game.category if game else '',
                 'amount': bet.amount,
                 'multiplier': bet.multiplier,
                 'result': bet.result,
                 'win_amount': bet.win_amount,
                 'timestamp': bet.timestamp.isoformat(),
-                'game_data': game_data,
                 'ip_address': bet.ip_address
-            })
-        
-        total_bets_result = db.session.query(
-            db.func.count(Bet.id).label('count'),
-            db.func.sum(Bet.amount).label('total_bets'),
-            db.func.sum(Bet.win_amount).label('total_wins'),
-            db.func.sum(db.case((Bet.result == 'win', 1), else_=0)).label('wins_count')
-        ).filter_by(user_id=user_id).first()
+            }
+            if details:
+                entry['game_data'] = describe_round(bet, game)
+            history.append(entry)
         
-        return {
+        result = {
+            'success': True,
             'bets': history,
-            'total': bets.total,
-            'pages': bets.pages,
-            'page': page,
-            'stats': {
-                'total_bets': float(total_bets_result.total_bets or 0),
-                'total_wins': float(total_bets_result.total_wins or 0),
-                'total_games': total_bets_result.count or 0,
-                'wins_count': total_bets_result.wins_count or 0,
-                'losses_count': (total_bets_result.count or 0) - (total_bets_result.wins_count or 0),
-                'net_profit': float((total_bets_result.total_wins or 0) - (total_bets_result.total_bets or 0))
-            }
+            'has_more': has_more,
+            'next_cursor': history[-1]['id'] if history and (has_more or not newest_first) else None,
+            'prev_cursor': history[0]['id'] if history and (anchor_id is not None and (newest_first or has_more)) else None
         }
+        
+        if include_total:
+            totals = db.session.query(
+                db.func.count(Bet.id).label('count'),
+                db.func.sum(Bet.amount).label('total_bets'),
+                db.func.sum(Bet.win_amount).label('total_wins'),
+                db.func.sum(db.case((Bet.result == 'win', 1), else_=0)).label('wins_count')
+            ).filter_by(user_id=user_id).first()
+            archived = ArchiveService.user_totals('bets', user_id)
+            
+            count = (totals.count or 0) + archived['rows']
+            total_bets = float(totals.total_bets or 0) + archived.get('amount', 0)
+            total_wins = float(totals.total_wins or 0) + archived.get('win_amount', 0)
+            wins_count = (totals.wins_count or 0) + archived.get('wins', 0)
+            result['total'] = count
+            result['stats'] = {
+                'total_bets': total_bets,
+                'total_wins': total_wins,
+                'total_games': count,
+                'wins_count': wins_count,
+                'losses_count': count - wins_count,
+                'net_profit': total_wins - total_bets
+            }
+        
+        return result
     
     @staticmethod
     def get_game_statistics(game_id):
@@ -267,16 +507,9 @@ class GameService:
         if not game:
             return None
         
-        stats = db.session.query(
-            db.func.count(Bet.id).label('total_bets'),
-            db.func.sum(Bet.amount).label('total_wagered'),
-            db.func.sum(Bet.win_amount).label('total_paid'),
-            db.func.avg(Bet.amount).label('avg_bet'),
-            db.func.max(Bet.win_amount).label('biggest_win')
-        ).filter_by(game_id=game_id).first()
-        
-        total_wagered = stats.total_wagered or 0
-        total_paid = stats.total_paid or 0
+        totals = GameStatsService.get_totals(game_id)
+        total_wagered = totals['wagered']
+        total_paid = totals['paid']
         
         return {
             'game': {
@@ -285,13 +518,13 @@ class GameService:
                 'rtp': game.rtp
             },
             'stats': {
-                'total_bets': stats.total_bets or 0,
+                'total_bets': totals['bets'],
                 'total_wagered': float(total_wagered),
                 'total_paid': float(total_paid),
                 'house_edge': float((total_wagered - total_paid) / total_wagered * 100) if total_wagered > 0 else 0,
                 'actual_rtp': float(total_paid / total_wagered * 100) if total_wagered > 0 else 0,
-                'avg_bet': float(stats.avg_bet or 0),
-                'biggest_win': float(stats.biggest_win or 0),
-                'popularity': game.popularity or 0
+                'avg_bet': total_wagered / totals['bets'] if totals['bets'] else 0,
+                'biggest_win': totals['biggest_win'],
+                'popularity': game_counters.popularity(game)
             }
         }
\ No newline at end of file
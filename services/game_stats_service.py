@@ -0,0 +1,108 @@
+from models import db, Bet, GameStatsHourly
+from utils.db import upsert_increment
+from services.archive_service import ArchiveService
+from datetime import datetime, timedelta
+
+
+class GameStatsService:
+
+    # Longest a bet can take from its timestamp to its commit, with room to spare
+    REBUILD_SETTLE_TIME = timedelta(minutes=5)
+
+    @staticmethod
+    def hour_of(timestamp=None):
+        return (timestamp or datetime.now()).replace(minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def record(game_id, bets, wins, wagered, paid, won, biggest_win, timestamp=None):
+        # Called inside the settling unit of work so rollups commit with the bets
+        upsert_increment(
+            GameStatsHourly,
+            {'game_id': game_id, 'hour': GameStatsService.hour_of(timestamp)},
+            {'bets': bets, 'wins': wins, 'wagered': wagered, 'paid': paid, 'won': won},
+            {'biggest_win': biggest_win}
+        )
+
+    @staticmethod
+    def record_bet(game_id, wagered, paid, result, timestamp=None):
+        rollups = {}
+        GameStatsService._accumulate(rollups, game_id, timestamp, wagered, paid, result)
+        for (_, hour), r in rollups.items():
+            GameStatsService.record(game_id, timestamp=hour, **r)
+
+    @staticmethod
+    def record_bets(game_id, bet_rows):
+        rollups = {}
+        for row in bet_rows:
+            GameStatsService._accumulate(rollups, game_id, row['timestamp'], row['amount'],
+                                         row['win_amount'], row['result'])
+        for (_, hour), r in rollups.items():
+            GameStatsService.record(game_id, timestamp=hour, **r)
+
+    @staticmethod
+    def _accumulate(rollups, game_id, timestamp, amount, paid, result):
+        paid = paid or 0
+        key = (game_id, GameStatsService.hour_of(timestamp))
+        r = rollups.setdefault(key, {'bets': 0, 'wins': 0, 'wagered': 0.0, 'paid': 0.0, 'won': 0.0, 'biggest_win': 0.0})
+        r['bets'] += 1
+        r['wins'] += 1 if paid > 0 else 0
+        r['wagered'] += amount or 0
+        r['paid'] += paid
+        if result == 'win':
+            r['won'] += paid
+        r['biggest_win'] = max(r['biggest_win'], paid)
+
+    @staticmethod
+    def get_totals(game_id, since=None):
+        query = db.session.query(
+            db.func.sum(GameStatsHourly.bets).label('bets'),
+            db.func.sum(GameStatsHourly.wins).label('wins'),
+            db.func.sum(GameStatsHourly.wagered).label('wagered'),
+            db.func.sum(GameStatsHourly.paid).label('paid'),
+            db.func.sum(GameStatsHourly.won).label('won'),
+            db.func.max(GameStatsHourly.biggest_win).label('biggest_win')
+        ).filter(GameStatsHourly.game_id == game_id)
+        if since is not None:
+            query = query.filter(GameStatsHourly.hour >= GameStatsService.hour_of(since))
+        totals = query.first()
+
+        return {
+            'bets': totals.bets or 0,
+            'wins': totals.wins or 0,
+            'wagered': float(totals.wagered or 0),
+            'paid': float(totals.paid or 0),
+            'won': float(totals.won or 0),
+            'biggest_win': float(totals.biggest_win or 0)
+        }
+
+    @staticmethod
+    def rebuild(batch_size=5000, before=None):
+        # Regenerate the rollups of closed hours from raw and archived bets.
+        # Live play keeps upserting the recent hours while this runs, so only
+        # hours wholly before the high-water mark, taken ahead of the scan,
+        # are replaced; the rest are left exactly as live play wrote them.
+        if before is None:
+            before = GameStatsService.hour_of(datetime.now() - GameStatsService.REBUILD_SETTLE_TIME)
+        rollups = {}
+        rows = db.session.query(Bet.game_id, Bet.timestamp, Bet.amount, Bet.win_amount, Bet.result)\
+            .filter(Bet.timestamp < before)\
+            .execution_options(yield_per=batch_size)
+        for game_id, timestamp, amount, win_amount, result in rows:
+            if game_id is not None:
+                GameStatsService._accumulate(rollups, game_id, timestamp, amount, win_amount, result)
+        # Archived bets still count towards the lifetime rollups
+        for bet in ArchiveService.iter_rows('bets'):
+            if bet.timestamp < before:
+                GameStatsService._accumulate(rollups, bet.game_id, bet.timestamp, bet.amount, bet.win_amount, bet.result)
+
+        try:
+            db.session.execute(db.delete(GameStatsHourly).where(GameStatsHourly.hour < before))
+            values = [dict(r, game_id=game_id, hour=hour) for (game_id, hour), r in rollups.items()]
+            for start in range(0, len(values), batch_size):
+                db.session.execute(db.insert(GameStatsHourly), values[start:start + batch_size])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        return len(rollups)
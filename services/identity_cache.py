@@ -0,0 +1,195 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from flask_login import UserMixin
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session as OrmSession, object_session
+from sqlalchemy.orm.attributes import set_committed_value
+from models import db, User, UserRole, UserStatus
+
+# The slice of a user that auth checks, role gates and the status poll read
+FIELDS = ('id', 'username', 'role', 'status', 'balance', 'kyc_verified', 'version')
+PENDING_KEY = 'identity_invalidations'
+
+
+class Identity(UserMixin):
+    # Stands in for current_user; anything outside FIELDS loads the full
+    # User row once, and writes go straight through to that row
+
+    def __init__(self, values):
+        for name in FIELDS:
+            object.__setattr__(self, name, values[name])
+        object.__setattr__(self, '_user', None)
+
+    @property
+    def user(self):
+        if self._user is None:
+            object.__setattr__(self, '_user', db.session.get(User, self.id))
+        return self._user
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.user, name, value)
+        if name in FIELDS:
+            object.__setattr__(self, name, value)
+
+    def sync_balance(self, balance):
+        object.__setattr__(self, 'balance', balance)
+        if self._user is not None:
+            set_committed_value(self._user, 'balance', balance)
+
+    def get_id(self):
+        return str(self.id)
+
+    def __repr__(self):
+        return f'<Identity {self.username}>'
+
+
+class IdentityCache:
+    # Per-process TTL cache of identities, optionally backed by a shared redis
+    # cache. Entries are dropped once a commit changes the user's role,
+    # status or balance; a per-user generation keeps a slow reader from
+    # putting back a row that was read before the change.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = OrderedDict()
+        self._generations = {}
+        self._shared = None
+        self._registered = False
+        self.ttl = 5
+        self.shared_ttl = 60
+        self.max_size = 10000
+
+    def init_app(self, app):
+        self.ttl = app.config.get('IDENTITY_CACHE_TTL', 5)
+        self.shared_ttl = app.config.get('IDENTITY_CACHE_SHARED_TTL', 60)
+        self.max_size = app.config.get('IDENTITY_CACHE_SIZE', 10000)
+
+        url = app.config.get('IDENTITY_CACHE_REDIS_URL')
+        if url:
+            try:
+                import redis
+                self._shared = redis.Redis.from_url(url, socket_timeout=0.2)
+            except ImportError:
+                app.logger.warning('redis is not installed; identity cache is per process only')
+
+        if not self._registered:
+            event.listen(User, 'after_update', self._user_changed)
+            event.listen(User, 'after_delete', self._user_changed)
+            event.listen(OrmSession, 'after_commit', self._after_commit)
+            event.listen(OrmSession, 'after_soft_rollback', self._after_rollback)
+            self._registered = True
+
+    def load(self, user_id):
+        values = self._get_local(user_id)
+        if values is None:
+            generation = self._generations.get(user_id, 0)
+            values = self._get_shared(user_id)
+            if values is None:
+                row = db.session.execute(
+                    db.select(*(getattr(User, name) for name in FIELDS)).where(User.id == user_id)
+                ).first()
+                if row is None:
+                    return None
+                values = dict(row._mapping)
+                self._put_shared(user_id, values)
+            self._put_local(user_id, values, generation)
+        return Identity(values)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._local.pop(user_id, None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        if self._shared is not None:
+            try:
+                self._shared.delete(self._key(user_id))
+            except Exception:
+                pass
+
+    def invalidate_after_commit(self, user_id, session=None):
+        # Dropping the entry before commit would let another request cache
+        # the old row again, so wait until the change is visible
+        session = session or db.session()
+        session.info.setdefault(PENDING_KEY, set()).add(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+    def _get_local(self, user_id):
+        with self._lock:
+            entry = self._local.get(user_id)
+            if entry is None:
+                return None
+            expires, values = entry
+            if expires < time.monotonic():
+                del self._local[user_id]
+                return None
+            self._local.move_to_end(user_id)
+            return values
+
+    def _put_local(self, user_id, values, generation):
+        if not self.ttl:
+            return
+        with self._lock:
+            if self._generations.get(user_id, 0) != generation:
+                return
+            self._local[user_id] = (time.monotonic() + self.ttl, values)
+            self._local.move_to_end(user_id)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+
+    @staticmethod
+    def _key(user_id):
+        return f'identity:{user_id}'
+
+    def _get_shared(self, user_id):
+        if self._shared is None:
+            return None
+        try:
+            data = self._shared.get(self._key(user_id))
+        except Exception:
+            return None
+        if data is None:
+            return None
+        values = json.loads(data)
+        if len(values) != len(FIELDS):
+            # Written by a release with a different field set
+            return None
+        values['role'] = UserRole(values['role'])
+        values['status'] = UserStatus(values['status'])
+        return values
+
+    def _put_shared(self, user_id, values):
+        if self._shared is None:
+            return
+        data = dict(values, role=values['role'].value, status=values['status'].value)
+        try:
+            self._shared.set(self._key(user_id), json.dumps(data), ex=self.shared_ttl)
+        except Exception:
+            pass
+
+    def _user_changed(self, mapper, connection, target):
+        state = inspect(target)
+        if state.deleted or state.was_deleted or any(
+                state.attrs[name].history.has_changes() for name in FIELDS):
+            session = object_session(target)
+            if session is not None:
+                self.invalidate_after_commit(target.id, session)
+
+    def _after_commit(self, session):
+        for user_id in session.info.pop(PENDING_KEY, ()):
+            self.invalidate(user_id)
+
+    def _after_rollback(self, session, previous_transaction):
+        if previous_transaction.parent is None:
+            session.info.pop(PENDING_KEY, None)
+
+
+identity_cache = IdentityCache()
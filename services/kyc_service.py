@@ -1,4 +1,6 @@
 from models import db, KYCDocument, KYCStatus, User
+from services.wallet_service import WalletService
+from services.unit_of_work import unit_of_work
 from datetime import datetime
 
 class KYCService:
@@ -47,39 +49,40 @@ class KYCService:
         if not document:
             return {'success': False, 'error': 'Document not found'}
         
-        if approved:
-            document.status = KYCStatus.VERIFIED
-            document.verified_at = datetime.now()
-            document.verified_by = admin_id
+        with unit_of_work():
+            if approved:
+                document.status = KYCStatus.VERIFIED
+                document.verified_at = datetime.now()
+                document.verified_by = admin_id
             
-            document.user.kyc_verified = True
-            document.user.kyc_status = KYCStatus.VERIFIED
+                document.owner.kyc_verified = True
+                document.owner.kyc_status = KYCStatus.VERIFIED
             
-            bonus_amount = 10.00
-            document.user.balance += bonus_amount
+                bonus_amount = 10.00
+                new_balance = WalletService.credit(document.owner, bonus_amount)
             
-            from models import Transaction, TransactionType
-            transaction = Transaction(
-                user_id=document.user.id,
-                type=TransactionType.BONUS,
-                amount=bonus_amount,
-                description='KYC verification bonus',
-                timestamp=datetime.now(),
-                status='completed'
-            )
-            db.session.add(transaction)
+                from models import Transaction, TransactionType
+                transaction = Transaction(
+                    user_id=document.owner.id,
+                    type=TransactionType.BONUS,
+                    amount=bonus_amount,
+                    balance_before=new_balance - bonus_amount,
+                    balance_after=new_balance,
+                    description='KYC verification bonus',
+                    timestamp=datetime.now(),
+                    status='completed'
+                )
+                db.session.add(transaction)
             
-        else:
-            document.status = KYCStatus.REJECTED
-            document.verified_at = datetime.now()
-            document.verified_by = admin_id
-            document.rejection_reason = notes
+            else:
+                document.status = KYCStatus.REJECTED
+                document.verified_at = datetime.now()
+                document.verified_by = admin_id
+                document.rejection_reason = notes
+            
+                document.owner.kyc_status = KYCStatus.REJECTED
+                document.owner.kyc_verified = False
             
-            document.user.kyc_status = KYCStatus.REJECTED
-            document.user.kyc_verified = False
-        
-        db.session.commit()
-        
         return {
             'success': True,
             'document_id': document.id,
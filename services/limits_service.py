@@ -0,0 +1,81 @@
+from models import db, UserDailyTotals
+from utils.db import upsert_increment
+from flask import current_app, g, session, has_request_context
+from datetime import datetime
+
+
+class LimitsService:
+
+    @staticmethod
+    def get_totals(user_id, day=None):
+        day = day or datetime.now().date()
+        totals = db.session.get(UserDailyTotals, (user_id, day), populate_existing=True)
+        if totals is None:
+            totals = UserDailyTotals(user_id=user_id, day=day, deposits=0, withdrawals=0, wagered=0, losses=0)
+        return totals
+
+    @staticmethod
+    def record_bet(user_id, wagered, won):
+        LimitsService._record(user_id, wagered=wagered, losses=wagered - won)
+
+    @staticmethod
+    def record_deposit(user_id, amount):
+        LimitsService._record(user_id, deposits=amount)
+
+    @staticmethod
+    def record_withdrawal(user_id, amount, day=None):
+        # A negative amount takes a refunded withdrawal back off its day
+        LimitsService._record(user_id, day=day, withdrawals=amount)
+
+    @staticmethod
+    def _record(user_id, day=None, **increments):
+        upsert_increment(
+            UserDailyTotals,
+            {'user_id': user_id, 'day': day or datetime.now().date()},
+            dict({'deposits': 0, 'withdrawals': 0, 'wagered': 0, 'losses': 0}, **increments)
+        )
+
+    @staticmethod
+    def remaining_loss(user):
+        limit = user.daily_loss_limit or current_app.config.get('DAILY_LOSS_LIMIT', 1000)
+        return limit - LimitsService.get_totals(user.id).losses
+
+    @staticmethod
+    def check_bet(user, amount):
+        if amount > LimitsService.remaining_loss(user):
+            return 'Daily loss limit exceeded'
+        return LimitsService.check_session_time(user)
+
+    @staticmethod
+    def check_deposit(user, amount):
+        limit = user.daily_deposit_limit
+        if limit and LimitsService.get_totals(user.id).deposits + amount > limit:
+            return 'Daily deposit limit exceeded'
+        return None
+
+    @staticmethod
+    def check_withdrawal(user, amount):
+        limit = current_app.config.get('DAILY_WITHDRAWAL_LIMIT', 10000)
+        if LimitsService.get_totals(user.id).withdrawals + amount > limit:
+            return 'Daily withdrawal limit exceeded'
+        return None
+
+    @staticmethod
+    def check_session_time(user, started_at=None):
+        # Background callers pass the login time they captured from the request
+        if started_at is None and has_request_context():
+            started_at = LimitsService.session_started_at()
+        if not user.session_time_limit:
+            return None
+        if started_at and datetime.now().timestamp() - started_at > user.session_time_limit * 60:
+            return 'Session time limit reached, please take a break'
+        return None
+
+    @staticmethod
+    def start_session(started_at=None):
+        session['login_at'] = started_at or datetime.now().timestamp()
+
+    @staticmethod
+    def session_started_at():
+        # Bearer requests carry their login time in the token, not the session
+        return g.get('login_at') or session.get('login_at')
@@ -0,0 +1,146 @@
+import threading
+from utils.security import secure_random
+
+MAX_MULTIPLIER = 10000
+
+SLOT_TABLES = {
+    'low': ([1.2, 1.5, 2, 3, 5], [0.4, 0.3, 0.2, 0.08, 0.02]),
+    'medium': ([1.5, 2, 3, 5, 10], [0.3, 0.35, 0.2, 0.1, 0.05]),
+    'high': ([1.5, 2, 5, 10, 20], [0.2, 0.3, 0.25, 0.15, 0.1])
+}
+
+ROULETTE_TABLE = (
+    [1.1, 2, 3, 8, 11, 17, 35],
+    [0.4865, 0.3243, 0.1622, 0.0811, 0.0541, 0.0270, 0.0270]
+)
+
+POKER_TABLE = (
+    [1, 1.5, 2, 2.5, 3, 5, 8, 10, 20, 50],
+    [0.5] + [0.3 / 3] * 3 + [0.15 / 3] * 3 + [0.05 / 3] * 3
+)
+
+BLACKJACK_TABLE = ([1.5], [1.0])
+
+DEFAULT_TABLE = ([1.5, 2, 3, 5], [0.25] * 4)
+
+# Per-bet jitter applied to rtp / 100 before clamping the win probability
+WIN_PROB_JITTER = (0.95, 1.05)
+WIN_PROB_BOUNDS = (0.05, 0.95)
+
+
+def multiplier_table(category, volatility):
+    if category == 'slots':
+        return SLOT_TABLES.get(volatility, SLOT_TABLES['medium'])
+    if category == 'roulette':
+        return ROULETTE_TABLE
+    if category == 'blackjack':
+        return BLACKJACK_TABLE
+    if category == 'poker':
+        return POKER_TABLE
+    return DEFAULT_TABLE
+
+
+def win_probability(rtp):
+    base = rtp / 100
+    low, high = base * WIN_PROB_JITTER[0], base * WIN_PROB_JITTER[1]
+    lo, hi = WIN_PROB_BOUNDS
+
+    if high <= low:
+        return min(hi, max(lo, low))
+
+    # Mean of clamp(U(low, high), lo, hi), i.e. the jitter folded into one probability
+    area = max(0.0, min(high, lo) - low) * lo
+    area += max(0.0, high - max(low, hi)) * hi
+    mid_low, mid_high = max(low, lo), min(high, hi)
+    if mid_high > mid_low:
+        area += (mid_high ** 2 - mid_low ** 2) / 2
+    return area / (high - low)
+
+
+class OutcomeModel:
+    def __init__(self, outcomes, probabilities):
+        total = sum(probabilities)
+        self.outcomes = list(outcomes)
+        self.probabilities = [p / total for p in probabilities]
+        self._build_alias_table()
+
+    @classmethod
+    def for_game(cls, category, volatility, rtp):
+        multipliers, weights = multiplier_table(category, volatility)
+        p_win = win_probability(rtp)
+        weight_total = sum(weights)
+
+        outcomes = [(False, 0)]
+        probabilities = [1 - p_win]
+        for multiplier, weight in zip(multipliers, weights):
+            outcomes.append((True, min(multiplier, MAX_MULTIPLIER)))
+            probabilities.append(p_win * weight / weight_total)
+        return cls(outcomes, probabilities)
+
+    @property
+    def win_probability(self):
+        return sum(p for (is_win, _), p in zip(self.outcomes, self.probabilities) if is_win)
+
+    @property
+    def expected_multiplier(self):
+        return sum(m * p for (_, m), p in zip(self.outcomes, self.probabilities))
+
+    def _build_alias_table(self):
+        n = len(self.probabilities)
+        scaled = [p * n for p in self.probabilities]
+        self._accept = [1.0] * n
+        self._alias = list(range(n))
+
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self._accept[s] = scaled[s]
+            self._alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+
+    def alias_table(self):
+        return list(self._accept), list(self._alias)
+
+    def draw(self, source=secure_random):
+        # One 53-bit draw picks the column and the accept/alias coin
+        u = source.random()
+        x = u * len(self.outcomes)
+        column = int(x)
+        if x - column >= self._accept[column]:
+            column = self._alias[column]
+        return column, u
+
+    def sample(self, source=secure_random):
+        return self.outcomes[self.draw(source)[0]]
+
+    def index_of(self, is_win, multiplier):
+        for index, outcome in enumerate(self.outcomes):
+            if outcome == (is_win, multiplier):
+                return index
+        return None
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_outcome_model(game):
+    signature = (game.category, game.volatility, game.rtp)
+    cached = _models.get(game.id)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    model = OutcomeModel.for_game(*signature)
+    with _models_lock:
+        _models[game.id] = (signature, model)
+    return model
+
+
+def invalidate_outcome_model(game_id=None):
+    with _models_lock:
+        if game_id is None:
+            _models.clear()
+        else:
+            _models.pop(game_id, None)
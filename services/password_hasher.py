@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+import bcrypt
+
+BCRYPT_PREFIXES = ('$2a$', '$2b$', '$2y$')
+
+
+class HasherBusy(Exception):
+    # Raised instead of queueing once the hashing backlog is full
+    pass
+
+
+def _encode(password):
+    # bcrypt only reads the first 72 bytes; older releases truncated silently
+    return password.encode('utf-8')[:72]
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(_encode(password), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _verify(password_hash, password):
+    if password_hash.startswith(BCRYPT_PREFIXES):
+        return bcrypt.checkpw(_encode(password), password_hash.encode('utf-8'))
+    # Staff accounts created before the shared hasher used werkzeug hashes
+    from werkzeug.security import check_password_hash
+    return check_password_hash(password_hash, password)
+
+
+def _hash_rounds(password_hash):
+    try:
+        return int(password_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    # bcrypt runs in a small process pool so hashing never pins request
+    # workers; when the backlog is full callers fail fast with HasherBusy
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self._in_flight = 0
+        self.rounds = 12
+        self.workers = 2
+        self.max_queue = 16
+        self.timeout = 10
+
+    def init_app(self, app):
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 2)
+        self.max_queue = app.config.get('PASSWORD_HASH_MAX_QUEUE', 16)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+
+    def hash(self, password):
+        return self._call(_hash, password, self.rounds)
+
+    def verify(self, password_hash, password):
+        if not password_hash or password is None:
+            return False
+        return self._call(_verify, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return not password_hash.startswith(BCRYPT_PREFIXES) or _hash_rounds(password_hash) != self.rounds
+
+    def _call(self, fn, *args):
+        if not self.workers:
+            # Inline mode for tests and single-process tools
+            return fn(*args)
+
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                # Pools do not survive a fork, so each worker process builds its own
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+                self._in_flight = 0
+            if self._in_flight >= self.max_queue:
+                raise HasherBusy()
+            self._in_flight += 1
+            pool = self._pool
+
+        try:
+            future = pool.submit(fn, *args)
+        except Exception:
+            self._done()
+            raise
+        future.add_done_callback(self._done)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HasherBusy()
+
+    def _done(self, future=None):
+        with self._lock:
+            self._in_flight -= 1
+
+    @staticmethod
+    def calibrate(target_ms, min_rounds=10, max_rounds=16, samples=3):
+        # Times each cost on this host and picks the highest one within target
+        timings = []
+        for rounds in range(min_rounds, max_rounds + 1):
+            elapsed = []
+            for _ in range(samples):
+                started = time.perf_counter()
+                _hash('calibration-Passw0rd!', rounds)
+                elapsed.append((time.perf_counter() - started) * 1000)
+            timings.append((rounds, sorted(elapsed)[len(elapsed) // 2]))
+            if timings[-1][1] > target_ms * 2:
+                # Each step doubles the cost, so nothing above can fit
+                break
+
+        fitting = [rounds for rounds, ms in timings if ms <= target_ms]
+        return {
+            'rounds': max(fitting) if fitting else min_rounds,
+            'timings': timings
+        }
+
+
+password_hasher = PasswordHasher()
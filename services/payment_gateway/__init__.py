@@ -0,0 +1,7 @@
+from .gateway import PaymentGateway, payment_gateway
+from .providers import Provider, get_provider, sign_payload, verify_signature
+
+__all__ = [
+    'PaymentGateway', 'payment_gateway',
+    'Provider', 'get_provider', 'sign_payload', 'verify_signature'
+]
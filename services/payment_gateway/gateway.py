@@ -0,0 +1,144 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from services.payment_gateway.providers import get_provider
+
+# Secrets anyone reading the source could sign webhooks with
+INSECURE_WEBHOOK_SECRETS = ('', 'dev-webhook-secret')
+
+# Client errors that say nothing about whether the charge was taken
+RETRYABLE_STATUSES = (408, 409, 429)
+
+
+class PaymentGateway:
+    # Provider calls run on one asyncio loop per process with a pooled
+    # client, so a slow provider never holds a request worker
+
+    def __init__(self):
+        self._app = None
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._client = None
+        self._executor = None
+        self.enabled = False
+        self.webhook_secret = None
+
+    def init_app(self, app):
+        self._app = app
+        self.enabled = app.config.get('PAYMENT_GATEWAY_ENABLED', False)
+
+        # A webhook credits a deposit, so a guessable secret is a way to mint money
+        secret = app.config.get('PAYMENT_WEBHOOK_SECRET') or ''
+        if secret in INSECURE_WEBHOOK_SECRETS:
+            if self.enabled:
+                raise RuntimeError('PAYMENT_WEBHOOK_SECRET must be set to a private value '
+                                   'when PAYMENT_GATEWAY_ENABLED is on')
+            secret = None
+        self.webhook_secret = secret
+
+    def submit_deposit(self, intent_id):
+        # Returns a concurrent Future; callers do not wait on it
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(self._submit_deposit(intent_id), self._loop)
+
+    def poll_deposit(self, intent_id):
+        # Future of the provider's verdict on a submitted charge (None while pending)
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(self._poll_deposit(intent_id), self._loop)
+
+    def _ensure_started(self):
+        with self._lock:
+            # Started lazily and per pid, since loops and sockets do not survive a fork
+            if self._loop is not None and self._pid == os.getpid():
+                return
+
+            import httpx
+
+            config = self._app.config
+            self._loop = asyncio.new_event_loop()
+            threading.Thread(target=self._loop.run_forever, name='payment-gateway', daemon=True).start()
+            self._client = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(
+                    retries=2,
+                    limits=httpx.Limits(max_connections=config.get('PAYMENT_POOL_SIZE', 20))
+                ),
+                timeout=config.get('PAYMENT_PROVIDER_TIMEOUT', 10)
+            )
+            self._executor = ThreadPoolExecutor(
+                max_workers=config.get('PAYMENT_GATEWAY_WORKERS', 4),
+                thread_name_prefix='payment-db'
+            )
+            self._pid = os.getpid()
+
+    async def _submit_deposit(self, intent_id):
+        from services.payment_service import PaymentService
+
+        intent = await self._in_app(PaymentService.get_intent_request, intent_id)
+        if intent is None:
+            return
+
+        provider = get_provider(intent['provider'])
+        config = self._app.config
+        callback_url = f"{config['PAYMENT_WEBHOOK_BASE_URL'].rstrip('/')}/api/payments/webhooks/{provider.name}"
+        headers = dict(self._auth_headers(provider), **{'Idempotency-Key': intent['reference']})
+        # Only a definite refusal fails the deposit. Timeouts, dropped
+        # connections and 5xx may come after the card was charged, so those
+        # stay submitted for the webhook or sweep-deposits to settle
+        try:
+            response = await self._client.post(
+                config['PAYMENT_PROVIDER_URLS'][provider.name].rstrip('/') + provider.path,
+                json=provider.charge_payload(intent['reference'], intent['amount'], callback_url),
+                headers=headers
+            )
+        except Exception as e:
+            await self._in_app(PaymentService.mark_deposit_submitted, intent_id, None, f'{type(e).__name__}: {e}')
+            return
+
+        if 400 <= response.status_code < 500 and response.status_code not in RETRYABLE_STATUSES:
+            await self._in_app(PaymentService.fail_deposit, intent_id,
+                               f'Declined with HTTP {response.status_code}: {response.text[:200]}')
+            return
+        try:
+            response.raise_for_status()
+            data = response.json()
+            provider_ref = provider.parse_charge(data)
+        except Exception as e:
+            await self._in_app(PaymentService.mark_deposit_submitted, intent_id, None, f'{type(e).__name__}: {e}')
+            return
+
+        if provider.parse_status(data) is False:
+            await self._in_app(PaymentService.fail_deposit, intent_id, f'Declined by {provider.name}')
+            return
+        await self._in_app(PaymentService.mark_deposit_submitted, intent_id, provider_ref)
+
+    async def _poll_deposit(self, intent_id):
+        from services.payment_service import PaymentService
+
+        intent = await self._in_app(PaymentService.get_intent_status_request, intent_id)
+        if intent is None:
+            return None
+
+        provider = get_provider(intent['provider'])
+        response = await self._client.get(
+            self._app.config['PAYMENT_PROVIDER_URLS'][provider.name].rstrip('/')
+            + provider.status_path(intent['provider_ref']),
+            headers=self._auth_headers(provider)
+        )
+        response.raise_for_status()
+        return provider.parse_status(response.json())
+
+    def _auth_headers(self, provider):
+        api_key = self._app.config['PAYMENT_PROVIDER_KEYS'].get(provider.name)
+        return {'Authorization': f'Bearer {api_key}'} if api_key else {}
+
+    async def _in_app(self, fn, *args):
+        # Database work is blocking, so it runs on the executor inside an app context
+        def call():
+            with self._app.app_context():
+                return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+
+payment_gateway = PaymentGateway()
@@ -0,0 +1,178 @@
+import hashlib
+import hmac
+from abc import ABC, abstractmethod
+
+
+def sign_payload(secret, body):
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(secret, body, signature):
+    return bool(signature) and hmac.compare_digest(sign_payload(secret, body), signature)
+
+
+class Provider(ABC):
+    # Maps our deposit onto one provider's charge API and webhook events
+
+    name = None
+    path = None
+
+    @abstractmethod
+    def charge_payload(self, reference, amount, callback_url):
+        pass
+
+    @abstractmethod
+    def charge_reference(self, payload):
+        # Inverse of charge_payload; used by the local stub
+        pass
+
+    @abstractmethod
+    def parse_charge(self, data):
+        # Returns the provider's id for the charge
+        pass
+
+    @abstractmethod
+    def parse_webhook(self, data):
+        # Returns (reference, provider_ref, succeeded), succeeded is None for events we ignore
+        pass
+
+    def status_path(self, provider_ref):
+        return f'{self.path}/{provider_ref}'
+
+    @abstractmethod
+    def parse_status(self, data):
+        # Result of a status lookup: True/False once final, None while pending
+        pass
+
+    @abstractmethod
+    def status_body(self, provider_ref, succeeded):
+        # The lookup response this provider would send; used by the local stub
+        pass
+
+    @abstractmethod
+    def webhook_event(self, reference, provider_ref, succeeded):
+        # The event this provider would send; used by the local stub
+        pass
+
+
+class StripeProvider(Provider):
+    name = 'stripe'
+    path = '/v1/charges'
+
+    def charge_payload(self, reference, amount, callback_url):
+        return {
+            'amount': int(round(amount * 100)),
+            'currency': 'usd',
+            'metadata': {'reference': reference},
+            'callback_url': callback_url
+        }
+
+    def charge_reference(self, payload):
+        return payload['metadata']['reference']
+
+    def parse_charge(self, data):
+        return data['id']
+
+    def parse_webhook(self, data):
+        charge = data.get('data', {}).get('object', {})
+        succeeded = {'charge.succeeded': True, 'charge.failed': False}.get(data.get('type'))
+        return charge.get('metadata', {}).get('reference'), charge.get('id'), succeeded
+
+    def webhook_event(self, reference, provider_ref, succeeded):
+        return {
+            'type': 'charge.succeeded' if succeeded else 'charge.failed',
+            'data': {'object': {'id': provider_ref, 'metadata': {'reference': reference}}}
+        }
+
+    def parse_status(self, data):
+        return {'succeeded': True, 'failed': False}.get(data.get('status'))
+
+    def status_body(self, provider_ref, succeeded):
+        status = 'pending' if succeeded is None else 'succeeded' if succeeded else 'failed'
+        return {'id': provider_ref, 'status': status}
+
+
+class PaypalProvider(Provider):
+    name = 'paypal'
+    path = '/v2/checkout/orders'
+
+    def charge_payload(self, reference, amount, callback_url):
+        return {
+            'intent': 'CAPTURE',
+            'purchase_units': [{
+                'custom_id': reference,
+                'amount': {'currency_code': 'USD', 'value': f'{amount:.2f}'}
+            }],
+            'callback_url': callback_url
+        }
+
+    def charge_reference(self, payload):
+        return payload['purchase_units'][0]['custom_id']
+
+    def parse_charge(self, data):
+        return data['id']
+
+    def parse_webhook(self, data):
+        resource = data.get('resource', {})
+        succeeded = {
+            'PAYMENT.CAPTURE.COMPLETED': True,
+            'PAYMENT.CAPTURE.DENIED': False
+        }.get(data.get('event_type'))
+        return resource.get('custom_id'), resource.get('id'), succeeded
+
+    def webhook_event(self, reference, provider_ref, succeeded):
+        return {
+            'event_type': 'PAYMENT.CAPTURE.COMPLETED' if succeeded else 'PAYMENT.CAPTURE.DENIED',
+            'resource': {'id': provider_ref, 'custom_id': reference}
+        }
+
+    def parse_status(self, data):
+        return {'COMPLETED': True, 'VOIDED': False, 'DECLINED': False}.get(data.get('status'))
+
+    def status_body(self, provider_ref, succeeded):
+        status = 'APPROVED' if succeeded is None else 'COMPLETED' if succeeded else 'DECLINED'
+        return {'id': provider_ref, 'status': status}
+
+
+class CryptoProvider(Provider):
+    name = 'crypto'
+    path = '/v1/invoices'
+
+    def charge_payload(self, reference, amount, callback_url):
+        return {
+            'order_id': reference,
+            'price_amount': amount,
+            'price_currency': 'usd',
+            'callback_url': callback_url
+        }
+
+    def charge_reference(self, payload):
+        return payload['order_id']
+
+    def parse_charge(self, data):
+        return data['invoice_id']
+
+    def parse_webhook(self, data):
+        succeeded = {'paid': True, 'expired': False, 'invalid': False}.get(data.get('status'))
+        return data.get('order_id'), data.get('invoice_id'), succeeded
+
+    def webhook_event(self, reference, provider_ref, succeeded):
+        return {
+            'invoice_id': provider_ref,
+            'order_id': reference,
+            'status': 'paid' if succeeded else 'expired'
+        }
+
+    def parse_status(self, data):
+        return {'paid': True, 'expired': False, 'invalid': False}.get(data.get('status'))
+
+    def status_body(self, provider_ref, succeeded):
+        status = 'waiting' if succeeded is None else 'paid' if succeeded else 'expired'
+        return {'invoice_id': provider_ref, 'status': status}
+
+
+PROVIDERS = {p.name: p for p in (StripeProvider(), PaypalProvider(), CryptoProvider())}
+
+
+def get_provider(name):
+    return PROVIDERS.get(name)
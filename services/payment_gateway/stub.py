@@ -0,0 +1,65 @@
+import json
+import random
+import secrets
+import threading
+import time
+import urllib.request
+from flask import Flask, request, jsonify
+from services.payment_gateway.providers import PROVIDERS, sign_payload
+
+
+def create_stub_app(webhook_secret, delay=1.0, fail_rate=0.0, latency=0.0):
+    # Local stand-in for the stripe, paypal and crypto APIs: accepts a charge,
+    # then sends the provider's signed webhook to its callback_url after delay seconds
+    stub = Flask('payment_stub')
+    # provider_ref -> outcome, filled in once the webhook has been sent
+    charges = {}
+
+    def send_webhook(callback_url, event, provider_ref, succeeded):
+        charges[provider_ref] = succeeded
+        body = json.dumps(event).encode()
+        webhook = urllib.request.Request(
+            callback_url,
+            data=body,
+            headers={'Content-Type': 'application/json', 'X-Signature': sign_payload(webhook_secret, body)},
+            method='POST'
+        )
+        try:
+            urllib.request.urlopen(webhook, timeout=10).close()
+        except Exception as e:
+            print(f"Stub webhook to {callback_url} failed: {e}")
+
+    def make_view(provider):
+        def create_charge():
+            if latency:
+                time.sleep(latency)
+
+            data = request.get_json()
+            provider_ref = f'{provider.name}_{secrets.token_hex(8)}'
+            reference = provider.charge_reference(data)
+            succeeded = random.random() >= fail_rate
+            event = provider.webhook_event(reference, provider_ref, succeeded)
+            charges[provider_ref] = None
+            threading.Timer(delay, send_webhook, args=(data['callback_url'], event, provider_ref, succeeded)).start()
+
+            if provider.name == 'crypto':
+                return jsonify({'invoice_id': provider_ref, 'status': 'waiting'}), 201
+            return jsonify({'id': provider_ref, 'status': 'pending'}), 201
+
+        create_charge.__name__ = f'create_{provider.name}_charge'
+        return create_charge
+
+    def make_status_view(provider):
+        def charge_status(provider_ref):
+            if provider_ref not in charges:
+                return jsonify({'error': 'No such charge'}), 404
+            return jsonify(provider.status_body(provider_ref, charges[provider_ref]))
+
+        charge_status.__name__ = f'{provider.name}_charge_status'
+        return charge_status
+
+    for provider in PROVIDERS.values():
+        stub.add_url_rule(provider.path, view_func=make_view(provider), methods=['POST'])
+        stub.add_url_rule(provider.status_path('<provider_ref>'), view_func=make_status_view(provider), methods=['GET'])
+
+    return stub
@@ -1,6 +1,12 @@
-from models import db, Transaction, Payout, AuditLog, TransactionType, PayoutStatus
+from models import db, Transaction, Payout, AuditLog, TransactionType, PayoutStatus, PaymentIntent
 from utils.security import create_audit_log
 from utils.helpers import generate_reference
+from services.wallet_service import WalletService
+from services.unit_of_work import unit_of_work
+from services.limits_service import LimitsService
+from services.payment_gateway import payment_gateway, get_provider
+from services.archive_service import ArchiveService
+from services.event_hub import event_hub
 from datetime import datetime
 import json
 
@@ -45,27 +51,33 @@ class PaymentService:
         if amount > method_config['max']:
             return {'success': False, 'error': f'Maximum amount is {method_config["max"]}'}
         
+        error = LimitsService.check_deposit(user, amount)
+        if error:
+            return {'success': False, 'error': error}
+        
         fee = amount * (method_config['fee_percent'] / 100)
         net_amount = amount - fee
         
-        transaction = Transaction(
-            user_id=user.id,
-            type=TransactionType.DEPOSIT,
-            amount=amount,
-            balance_before=user.balance,
-            balance_after=user.balance + net_amount,
-            status='pending',
-            description=f'Deposit via {method}',
-            reference=generate_reference('DEP'),
-            timestamp=datetime.now()
-        )
-        
-        db.session.add(transaction)
-        db.session.commit()
+        if payment_gateway.enabled:
+            return PaymentService._create_pending_deposit(user, amount, fee, method, request)
         
-        transaction.status = 'completed'
-        user.balance += net_amount
-        db.session.commit()
+        with unit_of_work():
+            new_balance = WalletService.credit(user, net_amount)
+            LimitsService.record_deposit(user.id, amount)
+            transaction = Transaction(
+                user_id=user.id,
+                type=TransactionType.DEPOSIT,
+                amount=amount,
+                fee=fee,
+                balance_before=new_balance - net_amount,
+                balance_after=new_balance,
+                status='completed',
+                description=f'Deposit via {method}',
+                reference=generate_reference('DEP'),
+                timestamp=datetime.now()
+            )
+            db.session.add(transaction)
+            event_hub.publish('admin', 'dashboard', {'financial': {'deposits': amount}})
         
         create_audit_log(
             'DEPOSIT',
@@ -83,6 +95,227 @@ class PaymentService:
             'new_balance': user.balance
         }
     
+    @staticmethod
+    def _create_pending_deposit(user, amount, fee, method, request):
+        with unit_of_work():
+            transaction = Transaction(
+                user_id=user.id,
+                type=TransactionType.DEPOSIT,
+                amount=amount,
+                fee=fee,
+                status='pending',
+                description=f'Deposit via {method}',
+                reference=generate_reference('DEP'),
+                timestamp=datetime.now()
+            )
+            db.session.add(transaction)
+            db.session.flush()
+            
+            intent = PaymentIntent(
+                transaction_id=transaction.id,
+                user_id=user.id,
+                provider=method,
+                amount=amount,
+                fee=fee
+            )
+            db.session.add(intent)
+        
+        # Only hand the intent to the gateway once it is committed, so the
+        # webhook can never arrive for a row that does not exist yet
+        payment_gateway.submit_deposit(intent.id)
+        
+        create_audit_log(
+            'DEPOSIT_INITIATED',
+            f'User initiated deposit of {amount} via {method}',
+            user.id,
+            request
+        )
+        
+        return {
+            'success': True,
+            'status': 'pending',
+            'transaction_id': transaction.id,
+            'reference': transaction.reference,
+            'amount': amount,
+            'fee': fee,
+            'net_amount': amount - fee
+        }
+    
+    @staticmethod
+    def get_intent_request(intent_id):
+        # Created intents, and submitted ones whose charge request got no answer
+        intent = db.session.get(PaymentIntent, intent_id)
+        if intent is None or intent.status not in ('created', 'submitted') or intent.provider_ref:
+            return None
+        return {
+            'provider': intent.provider,
+            'reference': intent.transaction.reference,
+            'amount': intent.amount
+        }
+    
+    @staticmethod
+    def get_intent_status_request(intent_id):
+        intent = db.session.get(PaymentIntent, intent_id)
+        if intent is None or intent.status != 'submitted' or not intent.provider_ref:
+            return None
+        return {'provider': intent.provider, 'provider_ref': intent.provider_ref}
+    
+    @staticmethod
+    def mark_deposit_submitted(intent_id, provider_ref, error=None):
+        # Guarded so a webhook that beat the provider's response is not undone.
+        # Without a provider_ref the outcome is unknown and the sweep submits again
+        with unit_of_work():
+            db.session.execute(
+                db.update(PaymentIntent)
+                .where(PaymentIntent.id == intent_id,
+                       PaymentIntent.status.in_(['created', 'submitted']),
+                       PaymentIntent.provider_ref.is_(None))
+                .values(status='submitted', provider_ref=provider_ref, last_error=error, updated_at=datetime.now())
+            )
+    
+    @staticmethod
+    def fail_deposit(intent_id, error):
+        with unit_of_work():
+            intent = db.session.get(PaymentIntent, intent_id)
+            if intent is None:
+                return False
+            return PaymentService._settle_intent(intent, False, error=error)
+    
+    @staticmethod
+    def settle_deposit(intent_id, succeeded, error=None):
+        with unit_of_work():
+            intent = db.session.get(PaymentIntent, intent_id)
+            if intent is None:
+                return False
+            settled = PaymentService._settle_intent(intent, succeeded, error=error)
+        
+        if settled:
+            create_audit_log(
+                'DEPOSIT' if succeeded else 'DEPOSIT_FAILED',
+                f'Deposit {intent.transaction.reference} of {intent.amount} via {intent.provider} '
+                f'{"completed" if succeeded else "failed"}' + (f': {error}' if error else ''),
+                intent.user_id
+            )
+        return settled
+    
+    @staticmethod
+    def sweep_intents(stale_after, expire_after, timeout=30):
+        # Intents nobody heard back about: those without a provider_ref never
+        # got an answer to their charge request (the process died, or the
+        # provider timed out) and are submitted again, the rest missed their
+        # webhook and are looked up. Past expire_after an intent with no final
+        # answer is failed, closing its pending row.
+        now = datetime.now()
+        intents = db.session.query(PaymentIntent.id, PaymentIntent.provider_ref, PaymentIntent.created_at)\
+            .filter(PaymentIntent.status.in_(['created', 'submitted']),
+                    PaymentIntent.updated_at < now - stale_after)\
+            .order_by(PaymentIntent.id).all()
+        
+        counts = dict.fromkeys(['resubmitted', 'completed', 'failed', 'expired', 'pending', 'errors'], 0)
+        for intent_id, provider_ref, created_at in intents:
+            expired = created_at < now - expire_after
+            result = None
+            try:
+                if not provider_ref and not expired:
+                    # The reference doubles as the provider's idempotency key
+                    payment_gateway.submit_deposit(intent_id).result(timeout)
+                    counts['resubmitted'] += 1
+                    continue
+                if provider_ref:
+                    result = payment_gateway.poll_deposit(intent_id).result(timeout)
+            except Exception as e:
+                # Unknown is not failed: the charge may have gone through
+                print(f"Payment intent {intent_id} lookup failed: {e}")
+                counts['errors'] += 1
+                continue
+            
+            if result is not None:
+                if PaymentService.settle_deposit(intent_id, result):
+                    counts['completed' if result else 'failed'] += 1
+            elif expired:
+                if PaymentService.settle_deposit(intent_id, False, error='Expired without a result from the provider'):
+                    counts['expired'] += 1
+            else:
+                counts['pending'] += 1
+        return counts
+    
+    @staticmethod
+    def handle_webhook(provider_name, data):
+        provider = get_provider(provider_name)
+        if provider is None:
+            return {'success': False, 'error': 'Unknown provider'}
+        
+        reference, provider_ref, succeeded = provider.parse_webhook(data)
+        if succeeded is None:
+            return {'success': True, 'ignored': True}
+        
+        with unit_of_work():
+            intent = db.session.query(PaymentIntent)\
+                .join(Transaction, PaymentIntent.transaction_id == Transaction.id)\
+                .filter(Transaction.reference == reference, PaymentIntent.provider == provider.name)\
+                .first()
+            if intent is None:
+                return {'success': False, 'error': 'Unknown payment reference'}
+            
+            settled = PaymentService._settle_intent(intent, succeeded, provider_ref=provider_ref)
+        
+        if settled:
+            create_audit_log(
+                'DEPOSIT' if succeeded else 'DEPOSIT_FAILED',
+                f'Deposit {reference} of {intent.amount} via {provider.name} '
+                f'{"completed" if succeeded else "failed"}',
+                intent.user_id
+            )
+        
+        # Replayed webhooks are acknowledged without settling twice
+        return {'success': True, 'status': intent.status}
+    
+    @staticmethod
+    def _settle_intent(intent, succeeded, provider_ref=None, error=None):
+        # created/submitted -> completed | failed, claimed with a guarded
+        # update so concurrent or replayed callbacks settle exactly once
+        status = 'completed' if succeeded else 'failed'
+        values = {'status': status, 'updated_at': datetime.now()}
+        if provider_ref:
+            values['provider_ref'] = provider_ref
+        if error:
+            values['last_error'] = error
+        
+        claimed = db.session.execute(
+            db.update(PaymentIntent)
+            .where(PaymentIntent.id == intent.id, PaymentIntent.status.in_(['created', 'submitted']))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.refresh(intent)
+        if not claimed:
+            return False
+        
+        transaction = intent.transaction
+        transaction.status = status
+        if succeeded:
+            net_amount = intent.amount - intent.fee
+            new_balance = WalletService.apply_to(intent.user_id, net_amount)
+            LimitsService.record_deposit(intent.user_id, intent.amount)
+            transaction.balance_before = new_balance - net_amount
+            transaction.balance_after = new_balance
+            event_hub.publish('admin', 'dashboard', {'financial': {'deposits': intent.amount}})
+        return True
+    
+    @staticmethod
+    def get_deposit_status(user_id, reference):
+        transaction = Transaction.query.filter_by(
+            user_id=user_id, reference=reference, type=TransactionType.DEPOSIT
+        ).first()
+        if not transaction:
+            return None
+        return {
+            'reference': transaction.reference,
+            'amount': transaction.amount,
+            'status': transaction.status,
+            'balance_after': transaction.balance_after
+        }
+    
     @staticmethod
     def request_withdrawal(user, amount, method, account_details, request):
         if amount < 20:
@@ -94,45 +327,45 @@ class PaymentService:
         if not user.kyc_verified:
             return {'success': False, 'error': 'KYC verification required'}
         
-        today = datetime.now().date()
-        daily_withdrawals = db.session.query(db.func.sum(Payout.amount)).filter(
-            Payout.user_id == user.id,
-            Payout.status.in_([PayoutStatus.PROCESSING.value, PayoutStatus.COMPLETED.value]),
-            db.func.date(Payout.request_date) == today
-        ).scalar() or 0
-        
-        if daily_withdrawals + amount > 10000:
-            return {'success': False, 'error': 'Daily withdrawal limit exceeded'}
+        error = LimitsService.check_withdrawal(user, amount)
+        if error:
+            return {'success': False, 'error': error}
         
         fee = max(1.0, amount * 0.02)
         net_amount = amount - fee
         
-        payout = Payout(
-            user_id=user.id,
-            amount=amount,
-            method=method,
-            status=PayoutStatus.PROCESSING,
-            account_details=json.dumps(account_details),
-            fee=fee,
-            request_date=datetime.now()
-        )
-        
-        transaction = Transaction(
-            user_id=user.id,
-            type=TransactionType.WITHDRAWAL,
-            amount=amount,
-            balance_before=user.balance,
-            balance_after=user.balance - amount,
-            status='processing',
-            description=f'Withdrawal via {method}',
-            timestamp=datetime.now()
-        )
-        
-        user.balance -= amount
-        
-        db.session.add(payout)
-        db.session.add(transaction)
-        
+        with unit_of_work():
+            new_balance = WalletService.debit(user, amount)
+            if new_balance is None:
+                return {'success': False, 'error': 'Insufficient balance'}
+            LimitsService.record_withdrawal(user.id, amount)
+            
+            transaction = Transaction(
+                user_id=user.id,
+                type=TransactionType.WITHDRAWAL,
+                amount=amount,
+                balance_before=new_balance + amount,
+                balance_after=new_balance,
+                status='processing',
+                description=f'Withdrawal via {method}',
+                reference=generate_reference('WDR'),
+                timestamp=datetime.now()
+            )
+            db.session.add(transaction)
+            db.session.flush()
+            
+            payout = Payout(
+                user_id=user.id,
+                amount=amount,
+                method=method,
+                status=PayoutStatus.PROCESSING,
+                account_details=json.dumps(account_details),
+                fee=fee,
+                request_date=datetime.now(),
+                transaction_id=transaction.id
+            )
+            db.session.add(payout)
+            
         create_audit_log(
             'WITHDRAWAL_REQUEST',
             f'User requested withdrawal: {amount} via {method}',
@@ -140,8 +373,6 @@ class PaymentService:
             request
         )
         
-        db.session.commit()
-        
         return {
             'success': True,
             'payout_id': payout.id,
@@ -158,26 +389,64 @@ class PaymentService:
             .order_by(Transaction.timestamp.desc())\
             .paginate(page=page, per_page=per_page, error_out=False)
         
-        result = []
-        for t in transactions.items:
-            result.append({
-                'id': t.id,
-                'type': t.type.value,
-                'amount': t.amount,
-                'balance_before': t.balance_before,
-                'balance_after': t.balance_after,
-                'status': t.status,
-                'timestamp': t.timestamp.isoformat(),
-                'description': t.description
-            })
-        
         return {
-            'transactions': result,
+            'transactions': [PaymentService._transaction_dict(t) for t in transactions.items],
             'total': transactions.total,
             'pages': transactions.pages,
             'page': page
         }
     
+    @staticmethod
+    def get_user_transaction_history(user_id, before_id=None, after_id=None, limit=50):
+        # Keyset pages that continue into the archive past the hot table
+        limit = max(1, min(limit, 200))
+        query = Transaction.query.filter(Transaction.user_id == user_id)
+        
+        newest_first = after_id is None
+        anchor_id = after_id if after_id is not None else before_id
+        anchor = None
+        if anchor_id is not None:
+            anchor = ArchiveService.position('transactions', user_id, anchor_id)
+            if anchor is None:
+                return {'success': False, 'error': 'Invalid cursor'}
+            position = db.tuple_(Transaction.timestamp, Transaction.id)
+            query = query.filter(position < anchor if newest_first else position > anchor)
+        
+        if newest_first:
+            query = query.order_by(Transaction.timestamp.desc(), Transaction.id.desc())
+        else:
+            query = query.order_by(Transaction.timestamp.asc(), Transaction.id.asc())
+        
+        rows = ArchiveService.merge_page(
+            'transactions', user_id, query.limit(limit + 1).all(), anchor, newest_first, limit
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if not newest_first:
+            rows.reverse()
+        
+        transactions = [PaymentService._transaction_dict(t) for t in rows]
+        return {
+            'success': True,
+            'transactions': transactions,
+            'has_more': has_more,
+            'next_cursor': transactions[-1]['id'] if transactions and (has_more or not newest_first) else None,
+            'prev_cursor': transactions[0]['id'] if transactions and (anchor_id is not None and (newest_first or has_more)) else None
+        }
+    
+    @staticmethod
+    def _transaction_dict(t):
+        return {
+            'id': t.id,
+            'type': t.type.value,
+            'amount': t.amount,
+            'balance_before': t.balance_before,
+            'balance_after': t.balance_after,
+            'status': t.status,
+            'timestamp': t.timestamp.isoformat(),
+            'description': t.description
+        }
+    
     @staticmethod
     def get_user_withdrawals(user_id):
         payouts = Payout.query.filter_by(user_id=user_id)\
@@ -0,0 +1,257 @@
+import csv
+import json
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from datetime import datetime
+from io import StringIO
+from models import db, User, Transaction, Payout, TransactionType, PayoutStatus, UserStatus
+from services.wallet_service import WalletService
+from services.limits_service import LimitsService
+from services.unit_of_work import unit_of_work
+from utils.security import create_audit_log
+from utils.helpers import generate_reference
+from services.event_hub import event_hub
+
+OPEN_STATUSES = (PayoutStatus.PENDING, PayoutStatus.PROCESSING)
+
+
+class PayoutService:
+
+    @staticmethod
+    def list_payouts(status=None, limit=500):
+        query = db.session.query(Payout, User.username)\
+            .join(User, Payout.user_id == User.id)
+        if status:
+            query = query.filter(Payout.status == PayoutStatus(status))
+        rows = query.order_by(Payout.request_date.desc()).limit(limit).all()
+
+        return [{
+            'id': p.id,
+            'user': {'id': p.user_id, 'username': username},
+            'amount': p.amount,
+            'fee': p.fee,
+            'method': p.method,
+            'status': p.status.value,
+            'request_date': p.request_date.isoformat() if p.request_date else None,
+            'processed_date': p.processed_date.isoformat() if p.processed_date else None
+        } for p, username in rows]
+
+    @staticmethod
+    def process_batch(action, admin, payout_ids=None, filters=None, notes=None, file_format='csv', request=None):
+        if action not in ('approve', 'reject'):
+            return {'success': False, 'error': 'Action must be approve or reject'}
+        if file_format not in ('csv', 'xml'):
+            return {'success': False, 'error': 'Format must be csv or xml'}
+        if not payout_ids and not filters:
+            return {'success': False, 'error': 'Provide payout_ids or a filter'}
+
+        candidates = PayoutService._select(payout_ids, filters)
+        failures = []
+        if payout_ids:
+            found = {row.id for row in candidates}
+            failures.extend({'id': i, 'error': 'Payout not found'} for i in payout_ids if i not in found)
+
+        valid = []
+        for row in candidates:
+            error = PayoutService._validate(row, action)
+            if error:
+                failures.append({'id': row.id, 'error': error})
+            else:
+                valid.append(row)
+
+        batch_id = generate_reference('PAYBATCH')
+        processed = []
+        if valid:
+            with unit_of_work():
+                processed = PayoutService._apply(action, valid, batch_id, notes)
+
+        # Anything validated but not updated was settled by someone else meanwhile
+        processed_ids = {row.id for row in processed}
+        failures.extend({'id': row.id, 'error': 'Payout was already processed'}
+                        for row in valid if row.id not in processed_ids)
+
+        if processed:
+            create_audit_log(
+                'PAYOUT_BATCH_APPROVED' if action == 'approve' else 'PAYOUT_BATCH_REJECTED',
+                f'Admin {admin.username} {action}d {len(processed)} payouts in {batch_id} '
+                f'totalling {round(sum(r.amount for r in processed), 2)}',
+                admin.id,
+                request
+            )
+
+        result = {
+            'success': True,
+            'batch_id': batch_id,
+            'action': action,
+            'processed': [row.id for row in processed],
+            'failures': sorted(failures, key=lambda f: f['id']),
+            'total_amount': round(sum(r.amount for r in processed), 2)
+        }
+        if action == 'approve' and processed:
+            result['batch_file'] = {
+                'format': file_format,
+                'filename': f'{batch_id}.{file_format}',
+                'content': PayoutService._batch_file(file_format, batch_id, processed)
+            }
+        return result
+
+    @staticmethod
+    def _select(payout_ids, filters):
+        query = db.session.query(
+            Payout.id, Payout.user_id, Payout.amount, Payout.fee, Payout.method,
+            Payout.status, Payout.account_details, Payout.transaction_id, Payout.request_date,
+            User.status.label('user_status'), User.kyc_verified
+        ).join(User, Payout.user_id == User.id)
+
+        if payout_ids:
+            query = query.filter(Payout.id.in_(payout_ids))
+        else:
+            filters = filters or {}
+            query = query.filter(Payout.status.in_(
+                [PayoutStatus(filters['status'])] if filters.get('status') else OPEN_STATUSES
+            ))
+            if filters.get('method'):
+                query = query.filter(Payout.method == filters['method'])
+            if filters.get('before'):
+                query = query.filter(Payout.request_date < datetime.fromisoformat(filters['before']))
+            if filters.get('min_amount') is not None:
+                query = query.filter(Payout.amount >= float(filters['min_amount']))
+            if filters.get('max_amount') is not None:
+                query = query.filter(Payout.amount <= float(filters['max_amount']))
+
+        return query.order_by(Payout.id).all()
+
+    @staticmethod
+    def _validate(row, action):
+        if row.status not in OPEN_STATUSES:
+            return f'Payout is {row.status.value}'
+        if action == 'reject':
+            return None
+        if not row.kyc_verified:
+            return 'User is not KYC verified'
+        if row.user_status == UserStatus.BLOCKED:
+            return 'User is blocked'
+        try:
+            json.loads(row.account_details or '{}')
+        except ValueError:
+            return 'Invalid account details'
+        return None
+
+    @staticmethod
+    def _apply(action, rows, batch_id, notes):
+        now = datetime.now()
+        ids = [row.id for row in rows]
+        status = PayoutStatus.COMPLETED if action == 'approve' else PayoutStatus.REJECTED
+
+        # Guarded on the open statuses so a concurrent approval is never repeated
+        stmt = db.update(Payout)\
+            .where(Payout.id.in_(ids), Payout.status.in_(OPEN_STATUSES))\
+            .values(status=status, processed_date=now, admin_notes=notes or batch_id)\
+            .execution_options(synchronize_session=False)
+        if db.session.get_bind().dialect.update_returning:
+            updated = set(db.session.execute(stmt.returning(Payout.id)).scalars())
+        else:
+            db.session.execute(stmt)
+            updated = set(db.session.execute(
+                db.select(Payout.id).where(Payout.id.in_(ids), Payout.processed_date == now)
+            ).scalars())
+
+        processed = [row for row in rows if row.id in updated]
+        transaction_ids = [row.transaction_id for row in processed if row.transaction_id]
+        if transaction_ids:
+            db.session.execute(
+                db.update(Transaction)
+                .where(Transaction.id.in_(transaction_ids))
+                .values(status='completed' if action == 'approve' else 'rejected')
+                .execution_options(synchronize_session=False)
+            )
+
+        if action == 'reject':
+            PayoutService._refund(processed, batch_id, now)
+        elif processed:
+            event_hub.publish('admin', 'dashboard', {'financial': {'withdrawals': sum(row.amount for row in processed)}})
+
+        return processed
+
+    @staticmethod
+    def _refund(rows, batch_id, now):
+        # One balance update per user; the ledger rows replay the running balance
+        by_user = defaultdict(list)
+        for row in rows:
+            by_user[row.user_id].append(row)
+
+        adjustments = []
+        for user_id, user_rows in by_user.items():
+            total = sum(row.amount for row in user_rows)
+            balance = WalletService.apply_to(user_id, total) - total
+            # The refunded amount no longer counts against the daily limit of the day it was requested
+            by_day = defaultdict(float)
+            for row in user_rows:
+                by_day[(row.request_date or now).date()] += row.amount
+            for day, amount in by_day.items():
+                LimitsService.record_withdrawal(user_id, -amount, day=day)
+            for row in user_rows:
+                adjustments.append({
+                    'user_id': user_id,
+                    'type': TransactionType.ADJUSTMENT,
+                    'amount': row.amount,
+                    'balance_before': balance,
+                    'balance_after': balance + row.amount,
+                    'status': 'completed',
+                    'description': f'Refund of rejected payout #{row.id} ({batch_id})',
+                    'reference': generate_reference('REF'),
+                    'timestamp': now
+                })
+                balance += row.amount
+
+        if adjustments:
+            db.session.execute(db.insert(Transaction), adjustments)
+
+    @staticmethod
+    def _batch_file(file_format, batch_id, rows):
+        if file_format == 'xml':
+            return PayoutService._sepa_xml(batch_id, rows)
+
+        output = StringIO()
+        writer = csv.writer(output)
+        writer.writerow(['batch_id', 'payout_id', 'user_id', 'method', 'amount', 'fee', 'net_amount', 'account_details'])
+        for row in rows:
+            writer.writerow([
+                batch_id, row.id, row.user_id, row.method,
+                f'{row.amount:.2f}', f'{row.fee or 0:.2f}', f'{row.amount - (row.fee or 0):.2f}',
+                row.account_details or '{}'
+            ])
+        return output.getvalue()
+
+    @staticmethod
+    def _sepa_xml(batch_id, rows):
+        # pain.001-style credit transfer initiation, one transaction per payout
+        ns = 'urn:iso:std:iso:20022:tech:xsd:pain.001.001.03'
+        document = ET.Element('Document', xmlns=ns)
+        initiation = ET.SubElement(document, 'CstmrCdtTrfInitn')
+
+        total = sum(row.amount - (row.fee or 0) for row in rows)
+        header = ET.SubElement(initiation, 'GrpHdr')
+        ET.SubElement(header, 'MsgId').text = batch_id
+        ET.SubElement(header, 'CreDtTm').text = datetime.now().replace(microsecond=0).isoformat()
+        ET.SubElement(header, 'NbOfTxs').text = str(len(rows))
+        ET.SubElement(header, 'CtrlSum').text = f'{total:.2f}'
+
+        info = ET.SubElement(initiation, 'PmtInf')
+        ET.SubElement(info, 'PmtInfId').text = batch_id
+        ET.SubElement(info, 'PmtMtd').text = 'TRF'
+        for row in rows:
+            details = json.loads(row.account_details or '{}')
+            tx = ET.SubElement(info, 'CdtTrfTxInf')
+            ET.SubElement(ET.SubElement(tx, 'PmtId'), 'EndToEndId').text = f'PAYOUT-{row.id}'
+            ET.SubElement(ET.SubElement(tx, 'Amt'), 'InstdAmt', Ccy='USD').text = f'{row.amount - (row.fee or 0):.2f}'
+            ET.SubElement(ET.SubElement(tx, 'Cdtr'), 'Nm').text = str(details.get('name', f'User {row.user_id}'))
+            account = ET.SubElement(ET.SubElement(tx, 'CdtrAcct'), 'Id')
+            if details.get('iban'):
+                ET.SubElement(account, 'IBAN').text = str(details['iban'])
+            else:
+                ET.SubElement(ET.SubElement(account, 'Othr'), 'Id').text = \
+                    str(details.get('account') or details.get('email') or '')
+            ET.SubElement(ET.SubElement(tx, 'RmtInf'), 'Ustrd').text = f'{row.method} payout {row.id}'
+
+        return ET.tostring(document, encoding='unicode', xml_declaration=True)
@@ -0,0 +1,217 @@
+import csv
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+TOLERANCE = 0.005
+YIELD_PER = 10_000
+
+# Which way each transaction type moves the balance
+SIGNS = {'deposit': 1, 'win': 1, 'bonus': 1, 'adjustment': 1, 'bet': -1, 'withdrawal': -1, 'fee': -1}
+
+
+def signed_amount(tx_type, amount, fee, description, fee_percents):
+    # The balance change a row claims to record; deposits credit the amount net of fee
+    if tx_type == 'deposit':
+        if fee is None:
+            # Rows from before the fee column: recompute from the method's rate
+            method = (description or '').rsplit(' ', 1)[-1]
+            fee = amount * fee_percents.get(method, 0) / 100
+        return amount - fee
+    return SIGNS.get(tx_type, 0) * amount
+
+
+class _UserCheck:
+    # Running state for one user's ledger: constant size however many rows it has
+
+    __slots__ = ('user_id', 'rows', 'last_id', 'last_after', 'breaks', 'first_break',
+                 'mismatches', 'first_mismatch')
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.rows = 0
+        self.last_id = None
+        self.last_after = None
+        self.breaks = 0
+        self.first_break = None
+        self.mismatches = 0
+        self.first_mismatch = None
+
+    def add(self, tx_id, before, after, delta):
+        # The opening balance is whatever the first row says it was
+        if self.last_after is not None and abs(before - self.last_after) > TOLERANCE:
+            self.breaks += 1
+            if self.first_break is None:
+                self.first_break = (tx_id, self.last_after, before)
+        # Each row must also move the balance by exactly its own amount
+        if abs((after - before) - delta) > TOLERANCE:
+            self.mismatches += 1
+            if self.first_mismatch is None:
+                self.first_mismatch = (tx_id, delta, after - before)
+        self.rows += 1
+        self.last_id = tx_id
+        self.last_after = after
+
+    def discrepancies(self, balance):
+        found = []
+        if self.breaks:
+            tx_id, expected, actual = self.first_break
+            found.append((self.user_id, 'chain_break', tx_id, expected, actual, self.breaks))
+        if self.mismatches:
+            tx_id, expected, actual = self.first_mismatch
+            found.append((self.user_id, 'amount_mismatch', tx_id, expected, actual, self.mismatches))
+        if balance is None:
+            found.append((self.user_id, 'missing_user', self.last_id, self.last_after, None, self.rows))
+        elif self.rows == 0:
+            if abs(balance) > TOLERANCE:
+                found.append((self.user_id, 'no_ledger', None, 0.0, balance, 0))
+        elif abs(balance - self.last_after) > TOLERANCE:
+            found.append((self.user_id, 'balance_mismatch', self.last_id, self.last_after, balance, self.rows))
+        return found
+
+
+def _archived(low, high, archive_dir):
+    # Archived rows shaped like the hot query's, so the two streams merge
+    from services.archive_service import ArchiveService
+
+    for row in ArchiveService.range_rows('transactions', low, high, archive_dir):
+        if row.balance_before is not None and row.balance_after is not None:
+            yield (row.user_id, row.id, row.balance_before, row.balance_after,
+                   row.type, row.amount, getattr(row, 'fee', None), row.description)
+
+
+def _deduplicated(rows):
+    # An interrupted archive run can leave a row both hot and archived
+    last = None
+    for row in rows:
+        if row[:2] != last:
+            last = row[:2]
+            yield row
+
+
+def _reconcile_range(task):
+    # Runs in a worker process with its own engine; never shares the parent's pool
+    from sqlalchemy import create_engine, select
+    from models import User, Transaction
+
+    database_uri, low, high, yield_per, fee_percents, archive_dir = task
+    engine = create_engine(database_uri)
+    found = []
+    users_checked = transactions_checked = 0
+    try:
+        with engine.connect() as users_conn, engine.connect() as tx_conn:
+            users = users_conn.execution_options(stream_results=True, yield_per=yield_per).execute(
+                select(User.id, User.balance)
+                .where(User.id >= low, User.id < high)
+                .order_by(User.id)
+            )
+            # Rows without balances (pending or failed deposits) move no money
+            transactions = tx_conn.execution_options(stream_results=True, yield_per=yield_per).execute(
+                select(Transaction.user_id, Transaction.id, Transaction.balance_before, Transaction.balance_after,
+                       Transaction.type, Transaction.amount, Transaction.fee, Transaction.description)
+                .where(
+                    Transaction.user_id >= low, Transaction.user_id < high,
+                    Transaction.balance_before.isnot(None), Transaction.balance_after.isnot(None)
+                )
+                .order_by(Transaction.user_id, Transaction.id)
+            )
+            # Archived months are part of every chain, so archiving cannot hide a break
+            transactions = _deduplicated(heapq.merge(
+                transactions, _archived(low, high, archive_dir), key=lambda row: (row[0], row[1])
+            ))
+
+            # Merge join of two streams that are both ordered by user id
+            user_row = next(users, None)
+            check = None
+            for user_id, tx_id, before, after, tx_type, amount, fee, description in transactions:
+                transactions_checked += 1
+                if check is None or check.user_id != user_id:
+                    if check is not None:
+                        found.extend(check.discrepancies(balance))
+                        users_checked += 1
+                    while user_row is not None and user_row[0] < user_id:
+                        found.extend(_UserCheck(user_row[0]).discrepancies(user_row[1]))
+                        users_checked += 1
+                        user_row = next(users, None)
+                    balance = None
+                    if user_row is not None and user_row[0] == user_id:
+                        balance = user_row[1]
+                        user_row = next(users, None)
+                    check = _UserCheck(user_id)
+                check.add(tx_id, before, after,
+                          signed_amount(tx_type.value, amount, fee, description, fee_percents))
+
+            if check is not None:
+                found.extend(check.discrepancies(balance))
+                users_checked += 1
+            while user_row is not None:
+                found.extend(_UserCheck(user_row[0]).discrepancies(user_row[1]))
+                users_checked += 1
+                user_row = next(users, None)
+    finally:
+        engine.dispose()
+
+    return users_checked, transactions_checked, found
+
+
+class ReconciliationService:
+
+    @staticmethod
+    def user_id_ranges(partitions):
+        from models import db, User, Transaction
+        from services.archive_service import ArchiveService
+
+        low, high = db.session.query(db.func.min(User.id), db.func.max(User.id)).one()
+        tx_low, tx_high = db.session.query(db.func.min(Transaction.user_id), db.func.max(Transaction.user_id)).one()
+        archived = [int(key) for segment in ArchiveService.segments('transactions') for key in segment['users']]
+        bounds = [v for v in (low, high, tx_low, tx_high) if v is not None]
+        if archived:
+            bounds += [min(archived), max(archived)]
+        if not bounds:
+            return []
+
+        low, high = min(bounds), max(bounds) + 1
+        step = max(1, -(-(high - low) // partitions))
+        return [(start, min(start + step, high)) for start in range(low, high, step)]
+
+    @staticmethod
+    def reconcile(database_uri, workers=None, partitions=None, yield_per=YIELD_PER, report_path=None):
+        from flask import current_app
+        from services.payment_service import PaymentService
+
+        workers = workers or os.cpu_count()
+        fee_percents = {method: config['fee_percent'] for method, config in PaymentService.PAYMENT_METHODS.items()}
+        # More ranges than workers so one heavy range does not stall the pool
+        ranges = ReconciliationService.user_id_ranges(partitions or workers * 4)
+        archive_dir = current_app.config['ARCHIVE_DIR']
+        tasks = [(database_uri, low, high, yield_per, fee_percents, archive_dir) for low, high in ranges]
+
+        users = transactions = 0
+        discrepancies = []
+        if workers == 1:
+            results = map(_reconcile_range, tasks)
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            results = pool.map(_reconcile_range, tasks)
+        try:
+            for checked_users, checked_transactions, found in results:
+                users += checked_users
+                transactions += checked_transactions
+                discrepancies.extend(found)
+        finally:
+            if workers != 1:
+                pool.shutdown()
+
+        discrepancies.sort(key=lambda d: (d[0], d[1]))
+        if report_path:
+            with open(report_path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['user_id', 'kind', 'transaction_id', 'expected', 'actual', 'count'])
+                writer.writerows(discrepancies)
+
+        return {
+            'users': users,
+            'transactions': transactions,
+            'ranges': len(ranges),
+            'discrepancies': discrepancies
+        }
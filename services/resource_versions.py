@@ -0,0 +1,76 @@
+import hashlib
+import json
+from sqlalchemy import event, inspect
+from models import db, User, Game, SupportTicket, SupportMessage
+from services.game_counters import game_counters
+from services.identity_cache import FIELDS as IDENTITY_FIELDS
+
+
+class ResourceVersions:
+    # Version counters behind the ETags of the polled endpoints. Each one is
+    # bumped in the same UPDATE that changes the data, so reading a version
+    # is either free (cached identity) or one aggregate over indexed rows.
+
+    def __init__(self):
+        self._registered = False
+
+    def init_app(self, app):
+        if not self._registered:
+            event.listen(User, 'before_update', self._user_changed)
+            event.listen(Game, 'before_update', self._bump)
+            event.listen(SupportTicket, 'before_update', self._bump)
+            event.listen(SupportMessage, 'after_insert', self._message_added)
+            event.listen(SupportMessage, 'after_update', self._message_changed)
+            self._registered = True
+
+    @staticmethod
+    def user(identity):
+        # Balance updates bump the column directly (WalletService.apply_to)
+        return identity.id, identity.version
+
+    @staticmethod
+    def games():
+        count, total = db.session.execute(
+            db.select(db.func.count(Game.id), db.func.coalesce(db.func.sum(Game.version), 0))
+            .where(Game.active.is_(True), Game.maintenance.is_(False))
+        ).one()
+        # Unflushed jackpot and popularity increments are part of the response too
+        return count, total, game_counters.snapshot()
+
+    @staticmethod
+    def tickets(user_id):
+        count, total = db.session.execute(
+            db.select(db.func.count(SupportTicket.id), db.func.coalesce(db.func.sum(SupportTicket.version), 0))
+            .where(SupportTicket.user_id == user_id)
+        ).one()
+        return user_id, count, total
+
+    @staticmethod
+    def static(value):
+        # For responses built from configuration, fixed for the process lifetime
+        return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+    @staticmethod
+    def _bump(mapper, connection, target):
+        # A SQL expression, so concurrent writers never lose an increment
+        target.version = db.func.coalesce(type(target).version, 0) + 1
+
+    def _user_changed(self, mapper, connection, target):
+        # last_login and profile edits leave the status poll untouched
+        state = inspect(target)
+        if any(state.attrs[name].history.has_changes() for name in IDENTITY_FIELDS if name != 'version'):
+            self._bump(mapper, connection, target)
+
+    @staticmethod
+    def _message_added(mapper, connection, target):
+        connection.execute(
+            db.update(SupportTicket).where(SupportTicket.id == target.ticket_id)
+            .values(version=db.func.coalesce(SupportTicket.version, 0) + 1)
+        )
+
+    def _message_changed(self, mapper, connection, target):
+        if inspect(target).attrs.read.history.has_changes():
+            self._message_added(mapper, connection, target)
+
+
+resource_versions = ResourceVersions()
@@ -0,0 +1,104 @@
+import statistics
+import threading
+import time
+from models import db, User, Game, UserRole, UserStatus, KYCStatus
+from services.bet_ledger import bet_ledger
+
+
+class SettlementBenchmark:
+
+    PLAYER_BALANCE = 1_000_000_000.0
+
+    @staticmethod
+    def prepare_players(count):
+        # Reusable bench_N accounts with limits high enough never to interfere
+        players = []
+        for i in range(count):
+            username = f'bench_{i}'
+            user = User.query.filter_by(username=username).first()
+            if user is None:
+                user = User(
+                    username=username,
+                    email=f'{username}@bench.invalid',
+                    password_hash='!',
+                    role=UserRole.PLAYER,
+                    status=UserStatus.ACTIVE,
+                    kyc_verified=True,
+                    kyc_status=KYCStatus.VERIFIED
+                )
+                db.session.add(user)
+            user.balance = SettlementBenchmark.PLAYER_BALANCE
+            user.daily_loss_limit = SettlementBenchmark.PLAYER_BALANCE
+            user.bet_limit = SettlementBenchmark.PLAYER_BALANCE
+            user.session_time_limit = None
+            players.append(user)
+        db.session.commit()
+        return [p.id for p in players]
+
+    @staticmethod
+    def run(app, mode, bets, threads, player_ids, game_id, bet_amount):
+        from services.game_service import GameService
+
+        previous = 'group' if bet_ledger.enabled else 'direct'
+        bet_ledger.set_mode(mode)
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        counter = iter(range(bets))
+
+        def worker():
+            while True:
+                with lock:
+                    n = next(counter, None)
+                if n is None:
+                    return
+                with app.test_request_context(environ_base={'REMOTE_ADDR': '127.0.0.1'}) as ctx:
+                    user = db.session.get(User, player_ids[n % len(player_ids)])
+                    started = time.perf_counter()
+                    try:
+                        result = GameService.play_game(user, game_id, bet_amount, ctx.request)
+                    except Exception as e:
+                        result = {'success': False, 'error': str(e)}
+                    elapsed = time.perf_counter() - started
+                with lock:
+                    if result['success']:
+                        latencies.append(elapsed)
+                    else:
+                        errors.append(result['error'])
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        started = time.perf_counter()
+        try:
+            for t in pool:
+                t.start()
+            for t in pool:
+                t.join()
+        finally:
+            bet_ledger.set_mode(previous)
+        wall = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'mode': mode,
+            'bets': len(latencies),
+            'errors': len(errors),
+            'first_error': errors[0] if errors else None,
+            'seconds': wall,
+            'bets_per_second': len(latencies) / wall if wall else 0,
+            'p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+            'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000 if latencies else 0
+        }
+
+    @staticmethod
+    def compare(app, bets, threads, players, game_id=None, bet_amount=None):
+        game = db.session.get(Game, game_id) if game_id else \
+            Game.query.filter_by(active=True, maintenance=False).first()
+        if game is None:
+            return None
+
+        player_ids = SettlementBenchmark.prepare_players(players)
+        amount = bet_amount or game.min_bet
+        return [
+            SettlementBenchmark.run(app, mode, bets, threads, player_ids, game.id, amount)
+            for mode in ('direct', 'group')
+        ]
@@ -0,0 +1,84 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from models import Game
+from services.outcome_model import OutcomeModel
+
+CHUNK_SIZE = 1_000_000
+Z_95 = 1.959964
+
+
+def _simulate_chunk(task):
+    import numpy as np
+
+    accept, alias, multipliers, wins, rounds, seed = task
+    rng = np.random.default_rng(seed)
+    accept = np.asarray(accept)
+    alias = np.asarray(alias)
+    multipliers = np.asarray(multipliers)
+    wins = np.asarray(wins)
+
+    # Vectorised form of OutcomeModel.sample: one uniform per round
+    x = rng.random(rounds) * len(accept)
+    column = x.astype(np.int64)
+    column = np.where(x - column < accept[column], column, alias[column])
+
+    paid = multipliers[column]
+    return rounds, float(paid.sum()), float(np.square(paid).sum()), int(wins[column].sum())
+
+
+class SimulationService:
+
+    @staticmethod
+    def simulate_game(game, rounds, workers=None, chunk_size=CHUNK_SIZE, seed=None):
+        import numpy as np
+
+        model = OutcomeModel.for_game(game.category, game.volatility, game.rtp)
+        accept, alias = model.alias_table()
+        multipliers = [m for _, m in model.outcomes]
+        wins = [is_win for is_win, _ in model.outcomes]
+
+        chunks = [chunk_size] * (rounds // chunk_size)
+        if rounds % chunk_size:
+            chunks.append(rounds % chunk_size)
+        seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+        tasks = [(accept, alias, multipliers, wins, n, s) for n, s in zip(chunks, seeds)]
+
+        total = paid = paid_sq = hits = 0
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            for n, chunk_paid, chunk_sq, chunk_hits in pool.map(_simulate_chunk, tasks):
+                total += n
+                paid += chunk_paid
+                paid_sq += chunk_sq
+                hits += chunk_hits
+
+        mean = paid / total
+        variance = max(0.0, paid_sq / total - mean ** 2)
+        margin = Z_95 * math.sqrt(variance / total)
+
+        return {
+            'game_id': game.id,
+            'title': game.title,
+            'category': game.category,
+            'volatility': game.volatility,
+            'rounds': total,
+            'advertised_rtp': game.rtp,
+            'theoretical_rtp': model.expected_multiplier * 100,
+            'empirical_rtp': mean * 100,
+            'rtp_ci_95': ((mean - margin) * 100, (mean + margin) * 100),
+            'hit_rate': hits / total,
+            'variance': variance,
+            'std_dev': math.sqrt(variance),
+            'matches_advertised': abs(mean * 100 - game.rtp) <= margin * 100
+        }
+
+    @staticmethod
+    def simulate_games(rounds, game_ids=None, workers=None, chunk_size=CHUNK_SIZE, seed=None):
+        query = Game.query
+        if game_ids:
+            query = query.filter(Game.id.in_(game_ids))
+
+        return [
+            SimulationService.simulate_game(game, rounds, workers, chunk_size, seed)
+            for game in query.order_by(Game.id).all()
+        ]
@@ -1,6 +1,7 @@
 from models import db, SupportTicket, SupportMessage, TicketStatus, TicketPriority, UserRole
 from datetime import datetime
 from sqlalchemy import or_
+from services.event_hub import event_hub
 
 class SupportService:
     
@@ -18,6 +19,8 @@ class SupportService:
         )
         
         db.session.add(ticket)
+        db.session.flush()
+        event_hub.publish('staff', 'ticket', {'ticket_id': ticket.id, 'status': ticket.status.value, 'new': True})
         db.session.commit()
         
         return {
@@ -49,6 +52,7 @@ class SupportService:
             ticket.closed_at = None
         
         db.session.add(support_message)
+        SupportService.notify_reply(ticket, support_message)
         db.session.commit()
         
         return {
@@ -145,4 +149,15 @@ class SupportService:
             'created_at': t.created_at.isoformat(),
             'user_id': t.user_id,
             'username': t.user.username if t.user else 'Unknown'
-        } for t in tickets]
\ No newline at end of file
+        } for t in tickets]
+    
+    @staticmethod
+    def notify_reply(ticket, message):
+        # Replies go to the other side of the conversation once the caller commits
+        db.session.flush()
+        event_hub.publish(f'user:{ticket.user_id}' if message.is_admin else 'staff', 'ticket', {
+            'ticket_id': ticket.id,
+            'message_id': message.id,
+            'is_admin': message.is_admin,
+            'status': ticket.status.value
+        })
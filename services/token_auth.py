@@ -0,0 +1,202 @@
+import hashlib
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import jwt
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session as OrmSession, object_session
+from models import db, Session
+from utils.bloom import BloomFilter
+
+PENDING_KEY = 'revoked_token_hashes'
+REVOKED = object()
+
+# Secrets anyone reading the source could sign tokens with
+INSECURE_JWT_SECRETS = ('', 'jwt-secret-production-key')
+
+
+def token_hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def bearer_token(request):
+    header = request.headers.get('Authorization', '')
+    if header[:7].lower() == 'bearer ':
+        return header[7:].strip() or None
+    return None
+
+
+class TokenAuth:
+    # Stateless bearer auth for API clients. Verified claims are cached by
+    # token hash, and revocation is a Bloom filter over the hashes of
+    # deactivated sessions: a miss is final, a hit is confirmed by one
+    # indexed lookup, so a valid token costs no query at all.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._verified = OrderedDict()
+        self._revoked = None
+        self._pid = None
+        self._watermark = None
+        self._refreshed_at = 0
+        self._registered = False
+        self.secret = None
+        self.expires = timedelta(hours=1)
+        self.cache_size = 10000
+        self.refresh_interval = 5
+        self.capacity = 100000
+
+    def init_app(self, app):
+        # A token signed with a known secret signs in as anyone, admins included
+        secret = app.config.get('JWT_SECRET_KEY') or ''
+        if secret in INSECURE_JWT_SECRETS:
+            raise RuntimeError('JWT_SECRET_KEY must be set to a private value')
+        self.secret = secret
+        self.expires = app.config.get('JWT_ACCESS_TOKEN_EXPIRES', timedelta(hours=1))
+        self.cache_size = app.config.get('TOKEN_CACHE_SIZE', 10000)
+        self.refresh_interval = app.config.get('TOKEN_REVOCATION_REFRESH', 5)
+        self.capacity = app.config.get('TOKEN_REVOCATION_CAPACITY', 100000)
+
+        if not self._registered:
+            event.listen(Session, 'after_update', self._session_changed)
+            event.listen(OrmSession, 'after_commit', self._after_commit)
+            event.listen(OrmSession, 'after_soft_rollback', self._after_rollback)
+            self._registered = True
+
+    def issue(self, user_id, session_id):
+        # Returns (token, token_hash); only the hash is ever stored
+        now = datetime.now(timezone.utc)
+        token = jwt.encode({
+            'sub': str(user_id),
+            'sid': session_id,
+            'jti': secrets.token_hex(8),
+            'iat': now,
+            'exp': now + self.expires
+        }, self.secret, algorithm='HS256')
+        return token, token_hash(token)
+
+    def authenticate(self, token):
+        # Returns the claims of a valid, unrevoked token, or None
+        digest = token_hash(token)
+        claims = self._cached(digest)
+        if claims is REVOKED:
+            return None
+        if claims is None:
+            try:
+                claims = jwt.decode(token, self.secret, algorithms=['HS256'],
+                                    options={'require': ['exp', 'sub', 'sid']})
+            except jwt.InvalidTokenError:
+                return None
+            if not self._is_issued(digest, claims):
+                self._remember(digest, REVOKED)
+                return None
+            self._remember(digest, claims)
+
+        if self._maybe_revoked(digest) and self._is_revoked(digest):
+            self._remember(digest, REVOKED)
+            return None
+        return claims
+
+    def _cached(self, digest):
+        with self._lock:
+            claims = self._verified.get(digest)
+            if claims is None:
+                return None
+            if claims is not REVOKED and claims['exp'] <= time.time():
+                del self._verified[digest]
+                return REVOKED
+            self._verified.move_to_end(digest)
+            return claims
+
+    def _remember(self, digest, claims):
+        with self._lock:
+            self._verified[digest] = claims
+            self._verified.move_to_end(digest)
+            while len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+
+    def _maybe_revoked(self, digest):
+        if self._revoked is None or self._pid != os.getpid() \
+                or time.monotonic() - self._refreshed_at > self.refresh_interval:
+            self._refresh()
+        return digest in self._revoked
+
+    @staticmethod
+    def _is_issued(digest, claims):
+        # A valid signature is not enough: the token must be the one stored on
+        # an open session of its user. Checked once, then cached with the claims
+        try:
+            session_id, user_id = int(claims['sid']), int(claims['sub'])
+        except (TypeError, ValueError):
+            return False
+        return db.session.query(Session.id).filter(
+            Session.id == session_id,
+            Session.user_id == user_id,
+            Session.token_hash == digest,
+            Session.active.is_(True)
+        ).first() is not None
+
+    @staticmethod
+    def _is_revoked(digest):
+        active = db.session.query(Session.active).filter(Session.token_hash == digest).scalar()
+        return active is not True
+
+    def _refresh(self):
+        # Full rebuild on first use, after a fork or when the filter fills up;
+        # otherwise only sessions closed since the last refresh are added
+        if not self._refresh_lock.acquire(blocking=self._revoked is None):
+            return
+        try:
+            rebuild = self._revoked is None or self._pid != os.getpid() or self._revoked.full
+            query = db.session.query(Session.token_hash, Session.logout_time)\
+                .filter(Session.active.is_(False), Session.token_hash.isnot(None))
+            if rebuild:
+                # Tokens older than their expiry are rejected anyway
+                query = query.filter(Session.login_time >= datetime.now() - self.expires)
+            else:
+                query = query.filter(Session.logout_time >= self._watermark)
+            rows = query.all()
+
+            if rebuild:
+                revoked = BloomFilter(max(self.capacity, len(rows) * 2))
+                watermark = None
+            else:
+                revoked, watermark = self._revoked, self._watermark
+            for digest, logout_time in rows:
+                revoked.add(digest)
+                if logout_time and (watermark is None or logout_time > watermark):
+                    watermark = logout_time
+
+            self._revoked = revoked
+            self._watermark = watermark or datetime.now() - self.expires
+            self._pid = os.getpid()
+            self._refreshed_at = time.monotonic()
+        finally:
+            self._refresh_lock.release()
+
+    def revoke_local(self, digest):
+        if self._revoked is not None:
+            self._revoked.add(digest)
+        self._remember(digest, REVOKED)
+
+    def _session_changed(self, mapper, connection, target):
+        history = inspect(target).attrs.active.history
+        if history.has_changes() and target.active is False and target.token_hash:
+            session = object_session(target)
+            if session is not None:
+                session.info.setdefault(PENDING_KEY, set()).add(target.token_hash)
+
+    def _after_commit(self, session):
+        for digest in session.info.pop(PENDING_KEY, ()):
+            self.revoke_local(digest)
+
+    def _after_rollback(self, session, previous_transaction):
+        if previous_transaction.parent is None:
+            session.info.pop(PENDING_KEY, None)
+
+
+token_auth = TokenAuth()
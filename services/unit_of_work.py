@@ -0,0 +1,47 @@
+from contextlib import contextmanager
+from flask import g, has_app_context
+from models import db
+
+
+@contextmanager
+def unit_of_work():
+    # Nested units join the outermost one, which commits once or rolls back
+    depth = g.get('uow_depth', 0)
+    g.uow_depth = depth + 1
+    try:
+        yield db.session
+        if depth == 0:
+            db.session.commit()
+    except Exception:
+        if depth == 0:
+            db.session.rollback()
+        raise
+    finally:
+        g.uow_depth = depth
+
+
+def db_stats():
+    return {
+        'flushes': g.get('db_flushes', 0),
+        'commits': g.get('db_commits', 0)
+    }
+
+
+def _count(name):
+    if has_app_context():
+        setattr(g, name, g.get(name, 0) + 1)
+
+
+def register_db_stats(app):
+    db.event.listen(db.session, 'after_flush', lambda session, context: _count('db_flushes'))
+    db.event.listen(db.session, 'after_commit', lambda session: _count('db_commits'))
+
+    @app.after_request
+    def report_db_stats(response):
+        # Internal detail, so only shown to developers and tests unless switched on
+        if not (app.debug or app.testing or app.config.get('DB_STATS_HEADERS')):
+            return response
+        stats = db_stats()
+        response.headers['X-DB-Flushes'] = str(stats['flushes'])
+        response.headers['X-DB-Commits'] = str(stats['commits'])
+        return response
@@ -0,0 +1,57 @@
+from models import db, User
+from sqlalchemy.orm.attributes import set_committed_value
+from services.identity_cache import identity_cache, Identity
+from services.event_hub import event_hub
+
+
+class WalletService:
+
+    @staticmethod
+    def debit(user, amount):
+        return WalletService.apply(user, -amount, required=amount)
+
+    @staticmethod
+    def credit(user, amount):
+        return WalletService.apply(user, amount)
+
+    @staticmethod
+    def apply(user, delta, required=None):
+        # Returns the new balance, or None if balance < required
+        new_balance = WalletService.apply_to(user.id, delta, required)
+        if new_balance is not None:
+            WalletService._sync(user, new_balance)
+        return new_balance
+
+    @staticmethod
+    def apply_to(user_id, delta, required=None):
+        # Same guarded update for callers that hold an id, not a loaded User
+        stmt = db.update(User).where(User.id == user_id)
+        if required is not None:
+            stmt = stmt.where(User.balance >= required)
+        stmt = stmt.values(balance=User.balance + delta, version=db.func.coalesce(User.version, 0) + 1)\
+            .execution_options(synchronize_session=False)
+
+        if db.session.get_bind().dialect.update_returning:
+            new_balance = db.session.execute(stmt.returning(User.balance)).scalar()
+        else:
+            # Older SQLite/MySQL: no RETURNING, so re-read the row we just locked
+            if db.session.execute(stmt).rowcount == 0:
+                return None
+            new_balance = db.session.execute(
+                db.select(User.balance).where(User.id == user_id)
+            ).scalar()
+
+        # Bulk updates skip the mapper events, so cached identities are dropped here
+        if new_balance is not None:
+            identity_cache.invalidate_after_commit(user_id)
+            event_hub.publish(f'user:{user_id}', 'balance', {'balance': new_balance}, key='balance')
+        return new_balance
+
+    @staticmethod
+    def _sync(user, new_balance):
+        # Keep the loaded object in step without marking it dirty, so a
+        # later flush never writes a stale balance back over the update
+        if isinstance(user, Identity):
+            user.sync_balance(new_balance)
+        else:
+            set_committed_value(user, 'balance', new_balance)
@@ -302,9 +302,14 @@ class SupportDashboard {
     }
     
     setupSupportRealTimeUpdates() {
-        setInterval(() => {
-            this.loadSupportDashboard();
-        }, 30000);
+        // Ticket events arrive over the shared stream opened by main.js;
+        // a burst of replies triggers a single reload
+        const reload = () => {
+            clearTimeout(this.reloadTimer);
+            this.reloadTimer = setTimeout(() => this.loadSupportDashboard(), 500);
+        };
+        document.addEventListener('casino:ticket', reload);
+        document.addEventListener('casino:reconnect', reload);
     }
     
     showAlert(message, type = 'info') {
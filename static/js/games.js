@@ -106,7 +106,7 @@ class GameManager {
         if (!container) return;
         
         try {
-            const response = await fetch('/games/history', {
+            const response = await fetch('/api/games/history?limit=10', {
                 credentials: 'include'
             });
             
@@ -503,6 +503,10 @@ class CasinoApp {
             });
             
             if (response.ok) {
+                if (this.eventSource) {
+                    this.eventSource.close();
+                    this.eventSource = null;
+                }
                 this.currentUser = null;
                 this.updateUIForGuest();
                 window.location.href = '/';
@@ -514,11 +518,33 @@ class CasinoApp {
     }
     
     setupBalanceUpdates() {
-        setInterval(async () => {
-            if (this.currentUser) {
-                await this.checkAuth();
+        // One stream per tab; EventSource reconnects by itself, and state is
+        // reloaded after a reconnect since changes may have been missed
+        if (this.eventSource || !this.currentUser || !window.EventSource) return;
+        
+        const source = new EventSource('/api/user/events');
+        this.eventSource = source;
+        
+        let connected = false;
+        source.addEventListener('ready', () => {
+            if (!connected) {
+                connected = true;
+                return;
             }
-        }, 30000); 
+            this.checkAuth();
+            document.dispatchEvent(new CustomEvent('casino:reconnect'));
+        });
+        source.addEventListener('balance', event => {
+            if (!this.currentUser) return;
+            this.currentUser.balance = JSON.parse(event.data).balance;
+            this.updateUIForLoggedInUser();
+        });
+        source.addEventListener('ticket', event => {
+            document.dispatchEvent(new CustomEvent('casino:ticket', { detail: JSON.parse(event.data) }));
+        });
+        source.addEventListener('dashboard', event => {
+            document.dispatchEvent(new CustomEvent('casino:dashboard', { detail: JSON.parse(event.data) }));
+        });
     }
     
     showAlert(message, type = 'info') {
@@ -5,6 +5,8 @@ class SlotMachine {
         this.spinDuration = options.duration || 2000;
         this.reelsCount = options.reels || 5;
         this.rowsCount = options.rows || 3;
+        this.gameId = options.gameId || this.container.dataset.gameId || null;
+        this.autoSpins = options.autoSpins || 50;
         this.symbols = [
             { icon: '🍒', name: 'Cherry', value: 2, weight: 20 },
             { icon: '🍋', name: 'Lemon', value: 3, weight: 15 },
@@ -145,7 +147,8 @@ class SlotMachine {
         this.container.classList.add('spinning');
         
         document.getElementById('spin-btn').disabled = true;
-        document.getElementById('auto-btn').disabled = true;
+        // Keep STOP clickable while server auto-play rounds animate
+        document.getElementById('auto-btn').disabled = !this.autoplaySession;
         
         this.hideWinLines();
         
@@ -439,6 +442,16 @@ class SlotMachine {
     }
     
     toggleAutoSpin() {
+        if (this.gameId) {
+            // Real-money auto-play runs on the server and streams each round back
+            if (this.autoplaySession) {
+                this.stopServerAutoPlay();
+            } else {
+                this.startServerAutoPlay();
+            }
+            return;
+        }
+        
         const autoBtn = document.getElementById('auto-btn');
         if (this.autoSpinInterval) {
             clearInterval(this.autoSpinInterval);
@@ -456,6 +469,94 @@ class SlotMachine {
         }
     }
     
+    async startServerAutoPlay() {
+        const betAmount = parseFloat(this.container.parentNode.querySelector('.bet-amount')?.value || 1);
+        
+        try {
+            const response = await fetch(`/api/games/${this.gameId}/autoplay`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                credentials: 'include',
+                body: JSON.stringify({ amount: betAmount, spins: this.autoSpins })
+            });
+            const data = await response.json();
+            
+            if (!response.ok) {
+                this.showAutoPlayMessage(data.error || 'Failed to start auto-play');
+                return;
+            }
+            
+            this.autoplaySession = data.session_id;
+            this.setAutoButton(true);
+            
+            // Rounds can arrive faster than the reels animate, so play them in order
+            let animations = Promise.resolve();
+            const source = new EventSource(`/api/games/autoplay/${data.session_id}/stream`);
+            this.autoplaySource = source;
+            
+            source.addEventListener('round', event => {
+                const round = JSON.parse(event.data);
+                animations = animations.then(async () => {
+                    await this.spin();
+                    this.showServerRound(round);
+                });
+            });
+            source.addEventListener('failed', event => {
+                this.showAutoPlayMessage(JSON.parse(event.data).error);
+            });
+            source.addEventListener('end', () => {
+                source.close();
+                animations.then(() => this.finishServerAutoPlay());
+            });
+            source.onerror = () => {
+                if (source.readyState === EventSource.CLOSED) {
+                    this.finishServerAutoPlay();
+                }
+            };
+        } catch (error) {
+            console.error('Auto-play error:', error);
+            this.showAutoPlayMessage('Network error occurred');
+        }
+    }
+    
+    async stopServerAutoPlay() {
+        if (!this.autoplaySession) return;
+        
+        await fetch(`/api/games/autoplay/${this.autoplaySession}/stop`, {
+            method: 'POST',
+            credentials: 'include'
+        });
+    }
+    
+    finishServerAutoPlay() {
+        if (this.autoplaySource) {
+            this.autoplaySource.close();
+            this.autoplaySource = null;
+        }
+        this.autoplaySession = null;
+        this.setAutoButton(false);
+    }
+    
+    showServerRound(round) {
+        const winAmountElement = this.winDisplay.querySelector('.win-amount');
+        winAmountElement.textContent = `$${round.win_amount.toFixed(2)}`;
+        this.winDisplay.querySelector('.win-multiplier').textContent = `Multiplier: x${round.multiplier}`;
+        
+        document.querySelectorAll('[data-user-balance]').forEach(el => {
+            el.textContent = `$${round.balance.toFixed(2)}`;
+        });
+    }
+    
+    showAutoPlayMessage(message) {
+        this.winDisplay.querySelector('.win-lines-list').innerHTML = `<div class="no-wins">${message}</div>`;
+    }
+    
+    setAutoButton(active) {
+        const autoBtn = document.getElementById('auto-btn');
+        autoBtn.innerHTML = active ? '<i class="fas fa-stop"></i> STOP' : '<i class="fas fa-sync"></i> AUTO';
+        autoBtn.classList.toggle('active', active);
+    }
+    
     sleep(ms) {
         return new Promise(resolve => setTimeout(resolve, ms));
     }
@@ -0,0 +1,79 @@
+import os
+import tempfile
+
+import pytest
+
+# The app is built at import, so the test database and fast settings go in first
+_workdir = tempfile.mkdtemp(prefix='casino-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_workdir, 'casino.db')
+os.environ['AUDIT_LOG_SYNC'] = 'true'
+os.environ['PASSWORD_HASH_WORKERS'] = '0'
+os.environ['BCRYPT_LOG_ROUNDS'] = '4'
+os.environ['SESSION_TYPE'] = 'cookie'
+os.environ['JWT_SECRET_KEY'] = 'test-jwt-secret'
+
+from app import app as casino_app  # noqa: E402
+from models import db, User, Game, UserRole, UserStatus, KYCStatus  # noqa: E402
+from services.game_counters import game_counters  # noqa: E402
+from services.identity_cache import identity_cache  # noqa: E402
+from services.password_hasher import password_hasher  # noqa: E402
+from services.token_auth import token_auth  # noqa: E402
+
+PLAYER_PASSWORD = 'Test123!'
+ADMIN_PASSWORD = 'Admin123!'
+
+
+@pytest.fixture
+def app(tmp_path):
+    casino_app.config.update(TESTING=True, ARCHIVE_DIR=str(tmp_path / 'archive'))
+    with casino_app.app_context():
+        db.create_all()
+        db.session.add_all([
+            User(username='player', email='player@example.com', password_hash=password_hasher.hash(PLAYER_PASSWORD),
+                 role=UserRole.PLAYER, status=UserStatus.ACTIVE, kyc_verified=True,
+                 kyc_status=KYCStatus.VERIFIED, balance=1000.0),
+            User(username='admin', email='admin@example.com', password_hash=password_hasher.hash(ADMIN_PASSWORD),
+                 role=UserRole.ADMIN, status=UserStatus.ACTIVE, kyc_verified=True,
+                 kyc_status=KYCStatus.VERIFIED, balance=0.0),
+            Game(title='Lucky 7', category='slots', min_bet=1, max_bet=100, rtp=96.5, volatility='medium', jackpot=0),
+            Game(title='Roulette', category='roulette', min_bet=1, max_bet=500, rtp=97.3, volatility='low', jackpot=0),
+            Game(title='Poker', category='poker', min_bet=1, max_bet=500, rtp=97.3, volatility='low', jackpot=0),
+        ])
+        db.session.commit()
+
+    yield casino_app
+
+    with casino_app.app_context():
+        game_counters.flush()
+        db.session.remove()
+        db.drop_all()
+    # Ids are reused by the next test's rows, so nothing cached may survive it
+    identity_cache.clear()
+    token_auth._verified.clear()
+    token_auth._revoked = None
+
+
+@pytest.fixture
+def login(app):
+    def signed_in(username='player', password=PLAYER_PASSWORD):
+        client = app.test_client()
+        response = client.post('/api/auth/login', json={'username': username, 'password': password})
+        assert response.status_code == 200, response.get_json()
+        return client
+    return signed_in
+
+
+@pytest.fixture
+def client(login):
+    return login()
+
+
+@pytest.fixture
+def admin_client(login):
+    return login('admin', ADMIN_PASSWORD)
+
+
+@pytest.fixture
+def player(app):
+    with app.app_context():
+        return User.query.filter_by(username='player').first().id
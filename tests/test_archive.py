@@ -0,0 +1,95 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, Bet, Transaction, TransactionType, Payout, PayoutStatus
+from services.archive_service import ArchiveService
+from services.game_stats_service import GameStatsService
+from utils.round_data import pack_round
+
+
+@pytest.fixture
+def old_activity(app, player):
+    # Bets and transactions spread over two years, so some months fall past the horizon
+    rng = random.Random(5)
+    now = datetime.now()
+    with app.app_context():
+        db.session.execute(db.insert(Bet), [dict(
+            user_id=player, game_id=rng.randint(1, 3), amount=1.0, multiplier=2.0 if i % 3 == 0 else 0,
+            result='win' if i % 3 == 0 else 'loss', win_amount=2.0 if i % 3 == 0 else 0,
+            timestamp=now - timedelta(days=rng.randint(0, 800), seconds=rng.randint(0, 86400)),
+            round_data=pack_round(i % 5, 0.5), ip_address='127.0.0.1'
+        ) for i in range(300)])
+        db.session.execute(db.insert(Transaction), [dict(
+            user_id=player, type=TransactionType.BET, amount=1.0, balance_before=0, balance_after=0,
+            status='completed', timestamp=now - timedelta(days=rng.randint(0, 800)), reference=f'OLD{i}'
+        ) for i in range(200)])
+        db.session.commit()
+
+        # An open payout still points at an old transaction, which has to stay hot
+        kept = Transaction.query.filter(Transaction.timestamp < now - timedelta(days=500)).first()
+        db.session.add(Payout(user_id=player, amount=1, method='stripe', status=PayoutStatus.PENDING,
+                              transaction_id=kept.id))
+        db.session.commit()
+        return kept.id
+
+
+def _walk(client, url, key):
+    ids, cursor = [], None
+    while True:
+        page = client.get(url + (f'&before_id={cursor}' if cursor else '')).get_json()
+        ids += [row['id'] for row in page[key]]
+        if not page['has_more']:
+            return ids
+        cursor = page['next_cursor']
+
+
+def test_cursors_page_across_the_archive_boundary(app, client, old_activity):
+    bets_before = _walk(client, '/api/games/history?limit=17', 'bets')
+    transactions_before = _walk(client, '/api/user/transactions?limit=13', 'transactions')
+    stats_before = client.get('/api/games/history?include_total=1').get_json()['stats']
+
+    with app.app_context():
+        segments = ArchiveService.archive(365, batch_size=50)
+        assert sum(s['rows'] for s in segments) > 0
+        assert Bet.query.count() < 300
+        assert db.session.get(Transaction, old_activity) is not None
+
+    assert _walk(client, '/api/games/history?limit=17', 'bets') == bets_before
+    assert _walk(client, '/api/user/transactions?limit=13', 'transactions') == transactions_before
+    assert client.get('/api/games/history?include_total=1').get_json()['stats'] == stats_before
+    assert len(bets_before) == 300 and len(transactions_before) == 200
+
+    # Paging back towards newer rows from a cursor deep in the archive
+    page = client.get(f'/api/games/history?after_id={bets_before[250]}&limit=10&details=1').get_json()
+    assert [b['id'] for b in page['bets']] == bets_before[240:250]
+    assert all(b['game_data']['outcome'] is not None for b in page['bets'])
+
+
+def test_statistics_rebuild_includes_archived_bets(app, old_activity):
+    with app.app_context():
+        GameStatsService.rebuild()
+        totals = [GameStatsService.get_totals(game_id) for game_id in (1, 2, 3)]
+        ArchiveService.archive(365)
+        GameStatsService.rebuild()
+        assert [GameStatsService.get_totals(game_id) for game_id in (1, 2, 3)] == totals
+
+
+def test_admin_ledger_view_reads_archived_rows(app, client, admin_client, player, old_activity):
+    with app.app_context():
+        ArchiveService.archive(365)
+
+    expected = _walk(client, '/api/user/transactions?limit=50', 'transactions')
+    page = admin_client.get(f'/api/admin/transactions?user_id={player}&limit=200').get_json()
+    assert [t['id'] for t in page['transactions']] == expected
+
+
+def test_archive_command_reports_its_segments(app, old_activity):
+    result = app.test_cli_runner().invoke(args=['archive', '--horizon-days', '365', '--table', 'bets'])
+
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines()[-1].startswith('Archived ')
+    with app.app_context():
+        assert Transaction.query.count() == 200
+        assert ArchiveService.segments('transactions') == []
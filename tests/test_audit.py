@@ -0,0 +1,67 @@
+import atexit
+import queue
+from datetime import datetime
+
+from flask import Flask
+
+from models import db, AuditLog
+from utils.audit import AuditWriter
+from utils.security import create_audit_log
+
+
+def _row(action):
+    return {'actor_id': None, 'action': action, 'description': action, 'ip_address': 'unknown',
+            'user_agent': 'unknown', 'timestamp': datetime.now()}
+
+
+def test_request_audit_entries_are_written_when_the_request_ends(app, client, player):
+    client.post('/api/games/1/play', json={'amount': 1})
+
+    with app.app_context():
+        assert [a.action for a in AuditLog.query.filter_by(actor_id=player)][-1] == 'GAME_PLAY'
+
+
+def test_audit_entries_survive_a_rolled_back_transaction(app):
+    with app.app_context():
+        with app.test_request_context():
+            create_audit_log('FAILED_THING', 'kept even though the work was undone')
+            db.session.rollback()
+        assert AuditLog.query.filter_by(action='FAILED_THING').count() == 1
+
+
+def test_full_queue_falls_back_to_a_synchronous_write(app):
+    with app.app_context():
+        writer = AuditWriter()
+        writer.sync = False
+        writer._engine = db.engine
+        writer._queue = queue.Queue(maxsize=2)
+
+        for i in range(5):
+            writer.enqueue(_row(f'ROW_{i}'))
+        # Each entry that found the queue full wrote only itself
+        assert sorted(a.action for a in AuditLog.query) == ['ROW_2', 'ROW_3', 'ROW_4']
+
+        assert writer.flush() == 2
+        assert sorted(a.action for a in AuditLog.query) == [f'ROW_{i}' for i in range(5)]
+
+
+def test_init_app_registers_one_exit_flush(monkeypatch):
+    other = Flask(__name__)
+    other.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', AUDIT_LOG_SYNC=True)
+    db.init_app(other)
+    registered = []
+    monkeypatch.setattr(atexit, 'register', registered.append)
+
+    writer = AuditWriter()
+    for _ in range(3):
+        writer.init_app(other)
+    assert registered == [writer.flush]
+
+
+def test_a_failed_write_is_logged(app, caplog):
+    writer = AuditWriter()
+    writer._app = app
+    with app.app_context():
+        writer._engine = db.engine
+    writer._write([{'action': None}])
+    assert 'Failed to write 1 audit log entries' in caplog.text
@@ -0,0 +1,178 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+from flask import Flask
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from models import db, User, UserRole, Session
+from services.password_hasher import password_hasher, _hash
+from services.token_auth import TokenAuth, token_auth, token_hash
+
+
+@contextmanager
+def user_queries(app):
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+    def record(conn, cursor, statement, *rest):
+        if 'FROM users' in statement:
+            statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def test_signed_in_requests_reuse_the_cached_identity(app, client):
+    client.get('/api/auth/status')
+
+    with user_queries(app) as statements:
+        for _ in range(3):
+            assert client.get('/api/auth/status').get_json()['authenticated']
+    assert statements == []
+
+
+def test_balance_changes_are_visible_on_the_next_request(client):
+    balance = client.post('/api/games/1/play', json={'amount': 5}).get_json()['new_balance']
+
+    assert client.get('/api/auth/status').get_json()['user']['balance'] == balance
+
+
+def test_role_changes_drop_the_cached_identity(app, client, player):
+    assert client.get('/api/auth/status').get_json()['user']['role'] == 'player'
+
+    with app.app_context():
+        db.session.get(User, player).role = UserRole.SUPPORT
+        db.session.commit()
+    assert client.get('/api/auth/status').get_json()['user']['role'] == 'support'
+
+
+def test_an_uncommitted_change_leaves_the_cache_alone(app, client, player):
+    client.get('/api/auth/status')
+
+    with app.app_context():
+        db.session.get(User, player).role = UserRole.ADMIN
+        db.session.flush()
+        db.session.rollback()
+    assert client.get('/api/auth/status').get_json()['user']['role'] == 'player'
+
+
+@pytest.mark.parametrize('legacy_hash', [
+    lambda: generate_password_hash('Test123!'),
+    lambda: _hash('Test123!', password_hasher.rounds + 1),
+], ids=['werkzeug', 'other-cost'])
+def test_login_rehashes_outdated_password_hashes(app, login, player, legacy_hash):
+    with app.app_context():
+        db.session.get(User, player).password_hash = legacy_hash()
+        db.session.commit()
+
+    login()
+    with app.app_context():
+        stored = db.session.get(User, player).password_hash
+    assert not password_hasher.needs_rehash(stored)
+    assert password_hasher.verify(stored, 'Test123!')
+
+
+def test_a_full_hashing_queue_answers_busy(app, monkeypatch):
+    monkeypatch.setattr(password_hasher, 'workers', 1)
+    monkeypatch.setattr(password_hasher, 'max_queue', 0)
+
+    response = app.test_client().post('/api/auth/login', json={'username': 'player', 'password': 'Test123!'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_hashes_run_in_the_process_pool(monkeypatch):
+    monkeypatch.setattr(password_hasher, 'workers', 1)
+
+    hashed = password_hasher.hash('Secret123!')
+    assert password_hasher.verify(hashed, 'Secret123!')
+    assert not password_hasher.verify(hashed, 'wrong')
+
+
+def test_change_password_signs_in_with_the_new_one(client, login):
+    response = client.post('/api/auth/change-password', json={'current_password': 'Test123!', 'new_password': 'New123!x'})
+
+    assert response.status_code == 200
+    login(password='New123!x')
+
+
+def _token(app):
+    response = app.test_client().post('/api/auth/login', json={'username': 'player', 'password': 'Test123!'})
+    return response.get_json()['token']
+
+
+def test_verified_tokens_are_served_from_the_cache(app):
+    token = _token(app)
+    api = app.test_client(use_cookies=False)
+    headers = {'Authorization': f'Bearer {token}'}
+    assert api.get('/api/auth/status', headers=headers).get_json()['authenticated']
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    record = lambda conn, cursor, statement, *rest: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        for _ in range(5):
+            assert api.get('/api/auth/status', headers=headers).get_json()['authenticated']
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    assert statements == []
+    assert token_auth.authenticate('not-a-token') is None
+
+
+def test_logout_revokes_only_that_token(app):
+    token, other = _token(app), _token(app)
+    api = app.test_client(use_cookies=False)
+    assert api.post('/api/auth/logout', headers={'Authorization': f'Bearer {token}'}).status_code == 200
+
+    assert not api.get('/api/auth/status', headers={'Authorization': f'Bearer {token}'}).get_json()['authenticated']
+    assert api.get('/api/auth/status', headers={'Authorization': f'Bearer {other}'}).get_json()['authenticated']
+
+    # Another process starts with empty caches and learns the revocation from the database
+    token_auth._verified.clear()
+    token_auth._revoked = None
+    assert not api.get('/api/auth/status', headers={'Authorization': f'Bearer {token}'}).get_json()['authenticated']
+    assert api.get('/api/auth/status', headers={'Authorization': f'Bearer {other}'}).get_json()['authenticated']
+
+
+def test_tokens_are_stored_as_digests(app, player):
+    token = _token(app)
+    with app.app_context():
+        session = Session.query.filter_by(user_id=player).one()
+        assert session.token_hash == token_hash(token)
+        assert session.token != token
+
+
+@pytest.mark.parametrize('secret', ['', 'jwt-secret-production-key'])
+def test_token_auth_refuses_a_guessable_secret(secret):
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = secret
+    with pytest.raises(RuntimeError):
+        TokenAuth().init_app(app)
+
+
+def test_a_well_signed_token_needs_a_live_session(app, player):
+    token = _token(app)
+    with app.app_context():
+        admin_id = User.query.filter_by(username='admin').one().id
+        session_id = Session.query.filter_by(user_id=player).one().id
+
+    now = datetime.now(timezone.utc)
+    claims = {'iat': now, 'exp': now + timedelta(hours=1)}
+    forged = [
+        jwt.encode({**claims, 'sub': str(admin_id), 'sid': 99999}, token_auth.secret, algorithm='HS256'),
+        # A real session of someone else does not lend itself to another subject
+        jwt.encode({**claims, 'sub': str(admin_id), 'sid': session_id}, token_auth.secret, algorithm='HS256'),
+    ]
+    api = app.test_client(use_cookies=False)
+    for bad in forged:
+        assert not api.get('/api/auth/status', headers={'Authorization': f'Bearer {bad}'}).get_json()['authenticated']
+    assert api.get('/api/auth/status', headers={'Authorization': f'Bearer {token}'}).get_json()['authenticated']
@@ -0,0 +1,125 @@
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, User, Bet, AutoplayRun
+from services.autoplay_service import AutoplayService
+from services.event_hub import event_hub
+
+
+@pytest.fixture
+def fast_autoplay(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'AUTOPLAY_SPIN_INTERVAL', 0.01)
+    monkeypatch.setitem(app.config, 'AUTOPLAY_CHUNK_SIZE', 4)
+
+
+def _events(client, session_id):
+    body = client.get(f'/api/games/autoplay/{session_id}/stream').get_data(as_text=True)
+    events = []
+    for block in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if lines:
+            events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_autoplay_streams_every_round_and_settles_them(app, client, player, fast_autoplay):
+    started = client.post('/api/games/1/autoplay', json={'amount': 1, 'spins': 10}).get_json()
+    assert started['success']
+
+    events = _events(client, started['session_id'])
+    rounds = [data for event, data in events if event == 'round']
+    end = events[-1]
+    assert end[0] == 'end'
+    assert end[1]['reason'] == 'completed'
+    assert [r['round'] for r in rounds] == list(range(1, 11))
+
+    with app.app_context():
+        assert Bet.query.filter_by(user_id=player).count() == 10
+        assert db.session.get(User, player).balance == rounds[-1]['balance']
+
+
+def test_only_one_autoplay_runs_per_player(client, fast_autoplay):
+    started = client.post('/api/games/1/autoplay', json={'amount': 1, 'spins': 20}).get_json()
+    second = client.post('/api/games/1/autoplay', json={'amount': 1, 'spins': 20})
+
+    assert second.status_code == 400
+    assert second.get_json()['error'] == 'Auto-play is already running'
+    _events(client, started['session_id'])
+
+
+def test_stopping_ends_the_session_early(client, fast_autoplay):
+    started = client.post('/api/games/1/autoplay', json={'amount': 1, 'spins': 500}).get_json()
+    assert client.post(f"/api/games/autoplay/{started['session_id']}/stop").get_json()['success']
+
+    end = _events(client, started['session_id'])[-1][1]
+    assert end['reason'] == 'stopped'
+    assert end['rounds_played'] < 500
+
+
+def test_other_players_cannot_read_a_session(client, admin_client, fast_autoplay):
+    started = client.post('/api/games/1/autoplay', json={'amount': 1, 'spins': 2}).get_json()
+
+    assert admin_client.get(f"/api/games/autoplay/{started['session_id']}/stream").status_code == 404
+    assert admin_client.post(f"/api/games/autoplay/{started['session_id']}/stop").status_code == 404
+    _events(client, started['session_id'])
+
+
+def _finished_run(app, session_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with app.app_context():
+            run = db.session.get(AutoplayRun, session_id)
+            if run.status == 'finished':
+                return run.reason, run.rounds_played
+        time.sleep(0.02)
+    raise AssertionError('auto-play did not finish')
+
+
+def test_closing_the_stream_stops_the_session(app, client, fast_autoplay):
+    started = client.post('/api/games/1/autoplay', json={'amount': 1, 'spins': 500}).get_json()
+
+    response = client.get(f"/api/games/autoplay/{started['session_id']}/stream", buffered=False)
+    chunks = iter(response.response)
+    while b'event: round' not in next(chunks):
+        pass
+    response.close()
+
+    reason, rounds_played = _finished_run(app, started['session_id'])
+    assert reason == 'stopped'
+    assert rounds_played < 500
+
+
+def test_a_stop_on_another_worker_reaches_the_session(app, client, fast_autoplay, monkeypatch):
+    started = client.post('/api/games/1/autoplay', json={'amount': 1, 'spins': 500}).get_json()
+    # That worker has no handle on the thread playing the session, only the row
+    monkeypatch.setattr(AutoplayService, '_running', {})
+
+    assert client.post(f"/api/games/autoplay/{started['session_id']}/stop").get_json()['success']
+    end = _events(client, started['session_id'])[-1]
+    assert end[0] == 'end' and end[1]['reason'] == 'stopped'
+
+
+def test_a_stream_without_the_rounds_still_sees_the_end(app, client, fast_autoplay, monkeypatch):
+    # Without a redis bridge a stream on another worker hears nothing but the row
+    dispatch = event_hub._dispatch
+    monkeypatch.setattr(event_hub, '_dispatch', lambda message: message['event'] == 'attached' and dispatch(message))
+    monkeypatch.setattr(event_hub, 'keepalive', 0.05)
+    started = client.post('/api/games/1/autoplay', json={'amount': 1, 'spins': 6}).get_json()
+
+    events = _events(client, started['session_id'])
+    assert [event for event, data in events if event != 'progress'] == ['end']
+    assert events[-1][1] == {'reason': 'completed', 'rounds_played': 6, 'net': events[-1][1]['net']}
+
+
+def test_a_session_left_by_a_dead_worker_does_not_block_a_new_one(app, client, player, fast_autoplay):
+    with app.app_context():
+        long_ago = datetime.now() - timedelta(seconds=app.config['AUTOPLAY_STALE_AFTER'] + 1)
+        db.session.add(AutoplayRun(id='gone', user_id=player, game_id=1, updated_at=long_ago))
+        db.session.commit()
+
+    started = client.post('/api/games/1/autoplay', json={'amount': 1, 'spins': 2}).get_json()
+    assert started['success']
+    _events(client, started['session_id'])
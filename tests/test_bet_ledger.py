@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+from models import db, User, Bet, Transaction
+from services.bet_ledger import BetLedger, bet_ledger
+from services.limits_service import LimitsService
+
+
+@pytest.fixture
+def group_commit():
+    bet_ledger.set_mode('group')
+    yield bet_ledger
+    bet_ledger.set_mode('direct')
+
+
+def _assert_chain(user_id):
+    # Every transaction starts from the balance the previous one left
+    previous = None
+    for tx in Transaction.query.filter_by(user_id=user_id).order_by(Transaction.id):
+        if previous is not None:
+            assert tx.balance_before == pytest.approx(previous)
+        previous = tx.balance_after
+    return previous
+
+
+def test_group_commit_settles_bets_like_direct_mode(app, client, player, group_commit):
+    balances = [client.post('/api/games/1/play', json={'amount': 2}).get_json()['new_balance'] for _ in range(5)]
+
+    with app.app_context():
+        assert db.session.get(User, player).balance == balances[-1]
+        assert Bet.query.filter_by(user_id=player).count() == 5
+        assert _assert_chain(player) == pytest.approx(balances[-1])
+        assert LimitsService.get_totals(player).wagered == 10
+
+
+def test_concurrent_group_commits_never_overdraw(app, login, player, group_commit):
+    with app.app_context():
+        db.session.get(User, player).balance = 35
+        db.session.commit()
+
+    clients = [login() for _ in range(6)]
+    codes = []
+
+    def play(client):
+        for _ in range(3):
+            codes.append(client.post('/api/games/2/play', json={'amount': 10}).status_code)
+
+    threads = [threading.Thread(target=play, args=(c,)) for c in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        user = db.session.get(User, player)
+        bets = Bet.query.filter_by(user_id=player).all()
+        assert codes.count(200) == len(bets)
+        assert user.balance >= 0
+        assert user.balance == pytest.approx(35 - sum(b.amount for b in bets) + sum(b.win_amount for b in bets))
+        assert _assert_chain(player) == pytest.approx(user.balance)
+
+
+def test_a_failed_group_commit_answers_with_an_error(app, client, player, group_commit, monkeypatch):
+    def broken(entries):
+        raise RuntimeError('database went away')
+    monkeypatch.setattr(BetLedger, '_settle', staticmethod(broken))
+
+    response = client.post('/api/games/1/play', json={'amount': 2})
+    assert response.status_code == 400
+    assert 'check your game history' in response.get_json()['error']
+    with app.app_context():
+        assert Bet.query.filter_by(user_id=player).count() == 0
+        assert db.session.get(User, player).balance == 1000
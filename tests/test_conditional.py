@@ -0,0 +1,98 @@
+import pytest
+from sqlalchemy import event
+
+from models import db, User, Game, SupportMessage
+from services.game_counters import game_counters
+
+
+def _revalidate(client, path, tag):
+    return client.get(path, headers={'If-None-Match': tag})
+
+
+@pytest.mark.parametrize('path', ['/api/auth/status', '/api/games/available', '/api/payments/methods',
+                                  '/api/support/unread-count'])
+def test_an_unchanged_resource_answers_304(app, client, path):
+    first = client.get(path)
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    record = lambda conn, cursor, statement, *rest: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        second = _revalidate(client, path, first.headers['ETag'])
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    assert second.status_code == 304
+    assert second.data == b''
+    assert second.headers['ETag'] == first.headers['ETag']
+    # The status version comes from the cached identity, the others from one aggregate
+    assert len(statements) <= (0 if path in ('/api/auth/status', '/api/payments/methods') else 1)
+
+
+def test_status_changes_with_the_balance_but_not_with_last_login(app, client, player):
+    tag = client.get('/api/auth/status').headers['ETag']
+    with app.app_context():
+        db.session.get(User, player).last_login = None
+        db.session.commit()
+    assert _revalidate(client, '/api/auth/status', tag).status_code == 304
+
+    client.post('/api/games/1/play', json={'amount': 10})
+    assert _revalidate(client, '/api/auth/status', tag).status_code == 200
+
+
+def test_unread_count_changes_with_replies_and_reads(app, client, admin_client):
+    ticket_id = client.post('/api/support/tickets', json={
+        'subject': 'Bonus', 'message': 'Where is my bonus?', 'category': 'general'
+    }).get_json()['ticket_id']
+    tag = client.get('/api/support/unread-count').headers['ETag']
+
+    admin_client.post(f'/api/admin/support/tickets/{ticket_id}/reply', json={'message': 'Checking'})
+    replied = _revalidate(client, '/api/support/unread-count', tag)
+    assert replied.status_code == 200
+
+    with app.app_context():
+        admin = User.query.filter_by(username='admin').one()
+        db.session.add(SupportMessage(ticket_id=ticket_id, user_id=admin.id, message='Credited', is_admin=True, read=False))
+        db.session.commit()
+    unread = _revalidate(client, '/api/support/unread-count', replied.headers['ETag'])
+    assert unread.get_json() == {'count': 1}
+
+    client.get(f'/api/support/tickets/{ticket_id}')
+    read = _revalidate(client, '/api/support/unread-count', unread.headers['ETag'])
+    assert read.get_json() == {'count': 0}
+    assert _revalidate(client, '/api/support/unread-count', read.headers['ETag']).status_code == 304
+
+
+def test_game_list_changes_with_plays_and_edits(app, client):
+    tag = client.get('/api/games/available').headers['ETag']
+    client.post('/api/games/1/play', json={'amount': 1})
+    response = _revalidate(client, '/api/games/available', tag)
+    assert response.status_code == 200
+
+    with app.app_context():
+        game_counters.flush()
+    tag = client.get('/api/games/available').headers['ETag']
+    with app.app_context():
+        db.session.get(Game, 2).maintenance = True
+        db.session.commit()
+    response = _revalidate(client, '/api/games/available', tag)
+    assert response.status_code == 200
+    assert [g['id'] for g in response.get_json()['games']] == [1, 3]
+
+
+def test_tags_are_per_user(client, admin_client):
+    tag = client.get('/api/auth/status').headers['ETag']
+
+    assert _revalidate(admin_client, '/api/auth/status', tag).status_code == 200
+
+
+def test_hit_ratio_is_reported_to_admins(client, admin_client):
+    tag = client.get('/api/payments/methods').headers['ETag']
+    _revalidate(client, '/api/payments/methods', tag)
+
+    stats = admin_client.get('/api/admin/conditional-stats').get_json()
+    assert stats['endpoints']['payments.get_payment_methods']['hits'] >= 1
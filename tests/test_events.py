@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from models import db
+from services.event_hub import event_hub
+
+
+@pytest.fixture
+def subscribe():
+    subscribers = []
+
+    def subscribed(*channels):
+        subscriber = event_hub.subscribe(channels)
+        subscribers.append(subscriber)
+        return subscriber
+
+    yield subscribed
+    for subscriber in subscribers:
+        event_hub.unsubscribe(subscriber)
+
+
+def _drain(subscriber):
+    messages = []
+    while not subscriber.events.empty():
+        messages.append(subscriber.events.get())
+    return messages
+
+
+def test_a_batch_sends_one_balance_event_after_commit(client, player, subscribe):
+    balance = subscribe(f'user:{player}')
+    data = client.post('/api/games/1/play-batch', json={'amount': 1, 'rounds': 10}).get_json()
+
+    assert _drain(balance) == [{'channel': f'user:{player}', 'event': 'balance', 'data': {'balance': data['new_balance']}}]
+
+
+def test_rolled_back_events_are_never_sent(app, player, subscribe):
+    balance = subscribe(f'user:{player}')
+    with app.app_context():
+        db.session.execute(db.select(1))
+        event_hub.publish(f'user:{player}', 'balance', {'balance': 1}, key='balance')
+        db.session.rollback()
+
+    assert _drain(balance) == []
+
+
+def test_ticket_messages_reach_the_other_side(client, admin_client, player, subscribe):
+    staff, inbox = subscribe('staff'), subscribe(f'user:{player}')
+
+    ticket_id = client.post('/api/support/tickets', json={
+        'subject': 'Withdrawal', 'message': 'Where is my money?', 'category': 'general'
+    }).get_json()['ticket_id']
+    assert [m['data']['ticket_id'] for m in _drain(staff)] == [ticket_id]
+
+    admin_client.post(f'/api/admin/support/tickets/{ticket_id}/reply', json={'message': 'On its way'})
+    assert [m['event'] for m in _drain(inbox)] == ['ticket']
+    assert _drain(staff) == []
+
+
+def test_the_stream_only_subscribes_to_the_users_channels(app, client, player):
+    response = client.get('/api/user/events', buffered=False)
+    chunks = iter(response.response)
+    try:
+        assert next(chunks).decode().startswith('retry: 5000\nevent: ready')
+
+        event_hub.publish('staff', 'ticket', {'ticket_id': 1})
+        event_hub.publish(f'user:{player}', 'balance', {'balance': 5})
+        chunk = next(chunks).decode()
+    finally:
+        response.close()
+
+    assert chunk == f"event: balance\ndata: {json.dumps({'balance': 5})}\n\n"
+
+
+def test_a_stream_that_falls_behind_is_closed(app, subscribe, monkeypatch):
+    monkeypatch.setattr(event_hub, 'max_queue', 2)
+    slow = subscribe('user:999')
+    for i in range(3):
+        event_hub.publish('user:999', 'balance', {'balance': i})
+
+    assert slow.overflowed
+    assert [m['data']['balance'] for m in _drain(slow)] == [0, 1]
@@ -0,0 +1,53 @@
+from models import db, Game
+from services.game_counters import game_counters
+
+
+def test_plays_reach_the_games_row_through_one_flush(app, client):
+    for _ in range(3):
+        assert client.post('/api/games/1/play', json={'amount': 1}).status_code == 200
+    client.post('/api/games/1/play-batch', json={'amount': 1, 'rounds': 5})
+
+    # Flushed or still pending, readers see every play
+    games = {g['id']: g for g in client.get('/api/games/available').get_json()['games']}
+    assert games[1]['popularity'] == 8
+
+    with app.app_context():
+        game_counters.flush()
+        assert game_counters.pending(1) == {'popularity': 0, 'jackpot': 0}
+        assert db.session.get(Game, 1).popularity == 8
+
+
+def test_flush_folds_increments_into_the_stored_values(app):
+    with app.app_context():
+        game = db.session.get(Game, 2)
+        game.jackpot = 100
+        db.session.commit()
+
+        game_counters.increment(2, popularity=1)
+        game_counters.increment(2, popularity=1, jackpot=2.5)
+        assert game_counters.jackpot(db.session.get(Game, 2)) == 102.5
+
+        assert game_counters.flush() == 1
+        db.session.expire_all()
+        game = db.session.get(Game, 2)
+        assert (game.popularity, game.jackpot) == (2, 102.5)
+
+
+def test_write_through_when_flushing_is_off(app, monkeypatch):
+    monkeypatch.setattr(game_counters, 'flush_interval', 0)
+    with app.app_context():
+        game_counters.increment(3, popularity=4)
+        db.session.commit()
+        assert game_counters.pending(3)['popularity'] == 0
+        assert db.session.get(Game, 3).popularity == 4
+
+
+def test_a_play_that_fails_to_commit_leaves_the_counters_alone(app, client, monkeypatch):
+    def broken():
+        raise RuntimeError('database went away')
+    monkeypatch.setattr(db.session, 'commit', broken)
+    monkeypatch.setitem(app.config, 'PROPAGATE_EXCEPTIONS', False)
+
+    assert client.post('/api/games/1/play', json={'amount': 1}).status_code == 500
+    assert client.post('/api/games/1/play-batch', json={'amount': 1, 'rounds': 5}).status_code == 500
+    assert game_counters.pending(1) == {'popularity': 0, 'jackpot': 0}
@@ -0,0 +1,92 @@
+from sqlalchemy import event
+
+from models import db, User, Bet, Transaction
+
+
+def test_play_batch_settles_every_round_in_one_request(app, client, player):
+    response = client.post('/api/games/1/play-batch', json={'amount': 10, 'rounds': 20})
+    assert response.status_code == 200
+    data = response.get_json()
+
+    assert data['rounds_played'] == len(data['rounds']) == 20
+    assert data['stop_reason'] == 'completed'
+    assert data['total_bet'] == 200
+    assert data['new_balance'] == 1000 - data['total_bet'] + data['total_win']
+    assert data['rounds'][-1]['balance'] == data['new_balance']
+    with app.app_context():
+        assert db.session.get(User, player).balance == data['new_balance']
+        assert Bet.query.filter_by(user_id=player).count() == 20
+
+
+def test_play_batch_stops_at_the_loss_limit(client):
+    data = client.post('/api/games/1/play-batch', json={'amount': 10, 'rounds': 100, 'loss_limit': 30}).get_json()
+
+    if data['stop_reason'] == 'loss_limit':
+        assert data['total_bet'] - data['total_win'] >= 30
+        assert data['rounds_played'] < 100
+    else:
+        assert data['stop_reason'] == 'completed'
+        assert data['total_bet'] - data['total_win'] < 30
+
+
+def test_play_batch_rejects_too_many_rounds(app, client, player):
+    limit = app.config['MAX_BATCH_ROUNDS']
+    response = client.post('/api/games/1/play-batch', json={'amount': 1, 'rounds': limit + 1})
+
+    assert response.status_code == 400
+    with app.app_context():
+        assert Transaction.query.filter_by(user_id=player).count() == 0
+
+
+def _walk_history(client, limit):
+    ids, cursor = [], None
+    while True:
+        url = f'/api/games/history?limit={limit}' + (f'&before_id={cursor}' if cursor else '')
+        page = client.get(url).get_json()
+        ids += [bet['id'] for bet in page['bets']]
+        if not page['has_more']:
+            return ids
+        cursor = page['next_cursor']
+
+
+def test_history_pages_by_cursor_without_gaps_or_repeats(app, client, player):
+    client.post('/api/games/1/play-batch', json={'amount': 1, 'rounds': 25})
+    client.post('/api/games/2/play-batch', json={'amount': 1, 'rounds': 5})
+
+    with app.app_context():
+        expected = [b.id for b in Bet.query.filter_by(user_id=player).order_by(Bet.timestamp.desc(), Bet.id.desc())]
+    assert _walk_history(client, 7) == expected
+
+
+def test_history_pages_back_towards_newer_bets(client):
+    client.post('/api/games/1/play-batch', json={'amount': 1, 'rounds': 25})
+    first = client.get('/api/games/history?limit=10').get_json()
+    second = client.get(f"/api/games/history?limit=10&before_id={first['next_cursor']}").get_json()
+    assert first['prev_cursor'] is None
+
+    back = client.get(f"/api/games/history?limit=10&after_id={second['prev_cursor']}").get_json()
+    assert [b['id'] for b in back['bets']] == [b['id'] for b in first['bets']]
+
+
+def test_history_loads_game_titles_in_one_query(app, client):
+    client.post('/api/games/1/play-batch', json={'amount': 1, 'rounds': 5})
+    client.post('/api/games/3/play-batch', json={'amount': 1, 'rounds': 5})
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    record = lambda conn, cursor, statement, *rest: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        page = client.get('/api/games/history?limit=20').get_json()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    assert {b['game_title'] for b in page['bets']} == {'Lucky 7', 'Poker'}
+    assert len([s for s in statements if 'FROM games' in s]) == 1
+
+
+def test_history_rejects_an_unknown_cursor(client):
+    response = client.get('/api/games/history?before_id=999999')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid cursor'
@@ -0,0 +1,70 @@
+import threading
+import time
+
+from models import db, User, Transaction, Payout
+from services.payment_service import PaymentService
+
+
+def test_a_repeated_key_replays_the_first_response(app, client, player):
+    headers = {'Idempotency-Key': 'deposit-1'}
+    first = client.post('/api/payments/deposit', json={'amount': 50, 'method': 'stripe'}, headers=headers)
+    second = client.post('/api/payments/deposit', json={'amount': 50, 'method': 'stripe'}, headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert second.get_json() == first.get_json()
+    with app.app_context():
+        assert Transaction.query.filter_by(user_id=player).count() == 1
+        assert db.session.get(User, player).balance == first.get_json()['new_balance']
+
+
+def test_a_key_reused_with_a_different_body_is_rejected(client):
+    headers = {'Idempotency-Key': 'deposit-2'}
+    client.post('/api/payments/deposit', json={'amount': 50, 'method': 'stripe'}, headers=headers)
+    response = client.post('/api/payments/deposit', json={'amount': 60, 'method': 'stripe'}, headers=headers)
+
+    assert response.status_code == 422
+
+
+def test_requests_without_a_key_are_not_deduplicated(app, client, player):
+    for _ in range(2):
+        client.post('/api/payments/deposit', json={'amount': 50, 'method': 'stripe'})
+
+    with app.app_context():
+        assert Transaction.query.filter_by(user_id=player).count() == 2
+
+
+def test_concurrent_duplicates_wait_for_the_first_request(app, login, player, monkeypatch):
+    original = PaymentService.request_withdrawal
+
+    def slow_withdrawal(*args, **kwargs):
+        time.sleep(0.3)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(PaymentService, 'request_withdrawal', staticmethod(slow_withdrawal))
+    clients = [login() for _ in range(3)]
+    responses = []
+
+    def withdraw(client):
+        responses.append(client.post('/api/payments/withdraw', json={'amount': 20, 'method': 'stripe'},
+                                     headers={'Idempotency-Key': 'withdraw-1'}))
+
+    threads = [threading.Thread(target=withdraw, args=(c,)) for c in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert sum(r.headers.get('Idempotent-Replayed') == 'true' for r in responses) == 2
+    with app.app_context():
+        assert Payout.query.filter_by(user_id=player).count() == 1
+
+
+def test_keys_are_scoped_to_the_user(app, client, admin_client):
+    headers = {'Idempotency-Key': 'shared'}
+    client.post('/api/payments/deposit', json={'amount': 50, 'method': 'stripe'}, headers=headers)
+    response = admin_client.post('/api/payments/deposit', json={'amount': 60, 'method': 'stripe'}, headers=headers)
+
+    assert response.status_code != 422
+    assert 'Idempotent-Replayed' not in response.headers
@@ -0,0 +1,55 @@
+import threading
+
+import pytest
+
+from utils.helpers import generate_reference
+from utils.ids import IdGenerator, NODE_BITS, WORKER_BITS, SEQUENCE_BITS
+
+
+def test_ids_are_unique_and_sort_in_generation_order_across_threads():
+    generator = IdGenerator(node_id=7)
+    generated = [[] for _ in range(8)]
+
+    def run(out):
+        for _ in range(2000):
+            out.append(generator.next())
+
+    threads = [threading.Thread(target=run, args=(out,)) for out in generated]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = [value for out in generated for value in out]
+    assert len(set(ids)) == len(ids)
+    assert all(len(value) == 26 for value in ids)
+    for out in generated:
+        assert out == sorted(out)
+
+
+def test_the_clock_stepping_back_never_reuses_an_id(monkeypatch):
+    generator = IdGenerator()
+    clock = iter([1000.0, 1000.0, 999.0, 999.0, 1001.0])
+    monkeypatch.setattr('utils.ids.time.time', lambda: next(clock))
+
+    values = [generator.next_int() for _ in range(5)]
+    assert values == sorted(values)
+    assert len(set(values)) == 5
+
+
+def test_node_id_is_encoded_and_validated(app):
+    generator = IdGenerator(node_id=513)
+    value = generator.next_int()
+    assert value >> (WORKER_BITS + SEQUENCE_BITS) & ((1 << NODE_BITS) - 1) == 513
+
+    app.config['NODE_ID'] = 1 << NODE_BITS
+    try:
+        with pytest.raises(ValueError):
+            IdGenerator().init_app(app)
+    finally:
+        app.config['NODE_ID'] = 0
+
+
+def test_references_keep_their_prefix():
+    first, second = generate_reference('DEP'), generate_reference('DEP')
+    assert first.startswith('DEP_') and first < second
@@ -0,0 +1,123 @@
+import time
+from datetime import datetime, timedelta
+
+import jwt
+
+from models import db, User, Game, Session, Payout
+from services.limits_service import LimitsService
+from services.token_auth import token_auth, token_hash
+
+
+def _set_user(app, user_id, **values):
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        for name, value in values.items():
+            setattr(user, name, value)
+        db.session.commit()
+
+
+def test_running_totals_follow_bets_and_payments(app, client, player):
+    batch = client.post('/api/games/1/play-batch', json={'amount': 2, 'rounds': 10}).get_json()
+    client.post('/api/payments/deposit', json={'amount': 100, 'method': 'stripe'})
+    client.post('/api/payments/withdraw', json={'amount': 30, 'method': 'stripe'})
+
+    with app.app_context():
+        totals = LimitsService.get_totals(player)
+        assert totals.wagered == 20
+        assert totals.losses == batch['total_bet'] - batch['total_win']
+        assert totals.deposits == 100
+        assert totals.withdrawals == 30
+
+
+def test_batch_play_stops_at_the_daily_loss_limit(app, client, player):
+    with app.app_context():
+        db.session.get(Game, 2).rtp = 10
+        db.session.commit()
+    _set_user(app, player, daily_loss_limit=45)
+
+    data = client.post('/api/games/2/play-batch', json={'amount': 10, 'rounds': 100}).get_json()
+    assert data['stop_reason'] == 'daily_loss_limit'
+    assert data['total_bet'] - data['total_win'] <= 45
+
+    with app.app_context():
+        remaining = LimitsService.remaining_loss(db.session.get(User, player))
+    if remaining < 10:
+        response = client.post('/api/games/2/play', json={'amount': 10})
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'Daily loss limit exceeded'
+
+
+def test_deposits_beyond_the_daily_limit_are_refused(app, client, player):
+    _set_user(app, player, daily_deposit_limit=150)
+
+    assert client.post('/api/payments/deposit', json={'amount': 100, 'method': 'stripe'}).get_json()['success']
+    response = client.post('/api/payments/deposit', json={'amount': 100, 'method': 'stripe'})
+    assert 'Daily deposit limit exceeded' in response.get_data(as_text=True)
+
+
+def test_a_rejected_withdrawal_no_longer_counts_against_the_daily_limit(app, client, admin_client, player, monkeypatch):
+    monkeypatch.setitem(app.config, 'DAILY_WITHDRAWAL_LIMIT', 100)
+    assert client.post('/api/payments/withdraw', json={'amount': 80, 'method': 'stripe'}).get_json()['success']
+    assert 'Daily withdrawal limit exceeded' in client.post(
+        '/api/payments/withdraw', json={'amount': 80, 'method': 'stripe'}).get_data(as_text=True)
+
+    with app.app_context():
+        payout_id = Payout.query.filter_by(user_id=player).one().id
+    assert admin_client.post(f'/api/admin/payouts/{payout_id}/reject').status_code == 200
+    with app.app_context():
+        assert LimitsService.get_totals(player).withdrawals == 0
+    assert client.post('/api/payments/withdraw', json={'amount': 80, 'method': 'stripe'}).get_json()['success']
+
+
+def test_a_refund_is_taken_off_the_day_the_withdrawal_was_requested(app, client, admin_client, player):
+    assert client.post('/api/payments/withdraw', json={'amount': 50, 'method': 'stripe'}).get_json()['success']
+    yesterday = datetime.now() - timedelta(days=1)
+    with app.app_context():
+        payout = Payout.query.filter_by(user_id=player).one()
+        payout.request_date = yesterday
+        totals = LimitsService.get_totals(player)
+        totals.day = yesterday.date()
+        db.session.commit()
+        payout_id = payout.id
+
+    assert admin_client.post(f'/api/admin/payouts/{payout_id}/reject').status_code == 200
+    with app.app_context():
+        assert LimitsService.get_totals(player, yesterday.date()).withdrawals == 0
+        assert LimitsService.get_totals(player).withdrawals == 0
+
+
+def test_session_time_limit_counts_from_login(app, client, player):
+    _set_user(app, player, session_time_limit=60)
+    assert client.post('/api/games/1/play', json={'amount': 1}).status_code == 200
+
+    with client.session_transaction() as session:
+        session['login_at'] = time.time() - 2 * 3600
+    response = client.post('/api/games/1/play', json={'amount': 1})
+    assert 'Session time limit reached' in response.get_json()['error']
+
+
+def test_bearer_tokens_are_held_to_the_session_time_limit(app, player):
+    _set_user(app, player, session_time_limit=60)
+    token = app.test_client().post('/api/auth/login', json={'username': 'player', 'password': 'Test123!'}).get_json()['token']
+    claims = jwt.decode(token, token_auth.secret, algorithms=['HS256'])
+    claims['iat'] = int(time.time()) - 2 * 3600
+    stale = jwt.encode(claims, token_auth.secret, algorithm='HS256')
+
+    api = app.test_client(use_cookies=False)
+    fresh = api.post('/api/games/1/play', json={'amount': 1}, headers={'Authorization': f'Bearer {token}'})
+    assert fresh.status_code == 200
+    # Only the token stored on the session is accepted, so the older one takes its place
+    with app.app_context():
+        Session.query.filter_by(user_id=player).one().token_hash = token_hash(stale)
+        db.session.commit()
+    old = api.post('/api/games/1/play', json={'amount': 1}, headers={'Authorization': f'Bearer {stale}'})
+    assert 'Session time limit reached' in old.get_json()['error']
+
+
+def test_remember_me_restores_start_the_session_clock(app, client, player):
+    restored = app.test_client()
+    restored.set_cookie('remember_token', client.get_cookie('remember_token').value)
+
+    assert restored.post('/api/games/1/play', json={'amount': 1}).status_code == 200
+    with restored.session_transaction() as session:
+        assert 'login_at' in session
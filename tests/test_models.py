@@ -0,0 +1,48 @@
+import json
+from datetime import datetime
+
+from models import db, Bet
+from utils.round_data import ROUND_FORMAT, pack_round, unpack_round
+
+
+def test_round_data_packs_into_a_fixed_width_blob():
+    blob = pack_round(3, 0.123456789)
+    assert len(blob) == ROUND_FORMAT.size == 11
+    assert unpack_round(blob) == {'outcome': 3, 'random_seed': 0.123456789}
+    assert unpack_round(pack_round(None, 0.5))['outcome'] is None
+
+
+def test_played_bets_store_packed_round_data(app, client, player):
+    client.post('/api/games/1/play', json={'amount': 1})
+
+    with app.app_context():
+        bet = Bet.query.filter_by(user_id=player).one()
+        assert bet.game_data is None
+        assert len(bet.round_data) == ROUND_FORMAT.size
+
+    entry = client.get('/api/games/history?details=1').get_json()['bets'][0]
+    assert entry['game_data']['multiplier'] == entry['multiplier']
+    assert entry['game_data']['result_type'] == entry['result']
+    assert entry['game_data']['game_type'] == 'slots'
+    assert 'game_data' not in client.get('/api/games/history').get_json()['bets'][0]
+
+
+def test_compact_bet_data_converts_legacy_json(app, client, player):
+    with app.app_context():
+        db.session.add(Bet(user_id=player, game_id=1, amount=5, multiplier=2, result='win', win_amount=10,
+                           timestamp=datetime(2024, 1, 1), game_data=json.dumps({'random_seed': 0.25, 'multiplier': 2})))
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['compact-bet-data'])
+    assert 'Converted 1 bets' in result.output
+
+    with app.app_context():
+        bet = Bet.query.filter_by(user_id=player).one()
+        assert bet.game_data is None
+        facts = unpack_round(bet.round_data)
+        assert facts['random_seed'] == 0.25
+        assert facts['outcome'] is not None
+
+    entry = client.get('/api/games/history?details=1').get_json()['bets'][0]
+    assert entry['game_data']['random_seed'] == 0.25
+    assert entry['game_data']['multiplier'] == 2
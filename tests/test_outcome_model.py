@@ -0,0 +1,52 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from services.outcome_model import OutcomeModel, get_outcome_model, win_probability
+
+
+@pytest.mark.parametrize('category,volatility', [('slots', 'low'), ('slots', 'high'), ('roulette', None), ('poker', None)])
+def test_alias_table_reproduces_the_outcome_probabilities(category, volatility):
+    model = OutcomeModel.for_game(category, volatility, 96.5)
+    accept, alias = model.alias_table()
+    n = len(accept)
+
+    implied = [a / n for a in accept]
+    for column, target in enumerate(alias):
+        implied[target] += (1 - accept[column]) / n
+    assert implied == pytest.approx(model.probabilities)
+    assert sum(model.probabilities) == pytest.approx(1)
+
+
+@pytest.mark.parametrize('rtp', [10, 50, 90.4, 96.5, 99.9])
+def test_win_probability_folds_in_the_per_bet_jitter(rtp):
+    # Midpoint rule over the jitter interval of the clamp the old code drew per bet
+    steps = 100000
+    low, high = rtp / 100 * 0.95, rtp / 100 * 1.05
+    expected = sum(min(0.95, max(0.05, low + (high - low) * (i + 0.5) / steps)) for i in range(steps)) / steps
+
+    assert win_probability(rtp) == pytest.approx(expected, abs=1e-9)
+
+
+def test_draw_follows_the_table():
+    model = OutcomeModel.for_game('slots', 'medium', 96.5)
+    source = random.Random(7)
+    draws = 200000
+    counts = [0] * len(model.outcomes)
+    for _ in range(draws):
+        counts[model.draw(source)[0]] += 1
+
+    for count, probability in zip(counts, model.probabilities):
+        assert count / draws == pytest.approx(probability, abs=0.005)
+
+
+def test_cached_model_is_rebuilt_when_the_game_changes():
+    game = SimpleNamespace(id=9001, category='slots', volatility='medium', rtp=96.5)
+    first = get_outcome_model(game)
+    assert get_outcome_model(game) is first
+
+    game.rtp = 50
+    rebuilt = get_outcome_model(game)
+    assert rebuilt is not first
+    assert rebuilt.win_probability == pytest.approx(win_probability(50))
@@ -0,0 +1,238 @@
+import json
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from werkzeug.serving import make_server
+
+from models import db, User, Transaction, PaymentIntent
+from services.payment_gateway import PaymentGateway, Provider, payment_gateway, get_provider, sign_payload
+from services.payment_gateway.providers import StripeProvider
+from services.payment_gateway.stub import create_stub_app
+from services.payment_service import PaymentService
+
+SECRET = 'test-webhook-secret'
+
+
+def _resolved(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    # Deposits stay pending; tests deliver the provider's side themselves
+    submitted = []
+    monkeypatch.setattr(payment_gateway, 'enabled', True)
+    monkeypatch.setattr(payment_gateway, 'webhook_secret', SECRET)
+    monkeypatch.setattr(payment_gateway, 'submit_deposit', lambda intent_id: _resolved(submitted.append(intent_id)))
+    return submitted
+
+
+def _webhook(client, provider, reference, provider_ref, succeeded, secret=SECRET):
+    body = json.dumps(get_provider(provider).webhook_event(reference, provider_ref, succeeded)).encode()
+    return client.post(f'/api/payments/webhooks/{provider}', data=body,
+                       headers={'Content-Type': 'application/json', 'X-Signature': sign_payload(secret, body)})
+
+
+def _balance(app, user_id):
+    with app.app_context():
+        return db.session.get(User, user_id).balance
+
+
+@pytest.mark.parametrize('secret,enabled,accepted', [
+    ('', True, False),
+    ('dev-webhook-secret', True, False),
+    ('s3cret', True, True),
+    ('', False, True),
+])
+def test_the_gateway_refuses_a_guessable_webhook_secret(secret, enabled, accepted):
+    app = Flask(__name__)
+    app.config.update(PAYMENT_GATEWAY_ENABLED=enabled, PAYMENT_WEBHOOK_SECRET=secret)
+    gateway = PaymentGateway()
+
+    if not accepted:
+        with pytest.raises(RuntimeError):
+            gateway.init_app(app)
+        return
+    gateway.init_app(app)
+    assert gateway.webhook_secret == (secret or None)
+
+
+def test_a_provider_missing_a_method_cannot_be_constructed():
+    class Incomplete(Provider):
+        name = 'incomplete'
+
+        def charge_payload(self, reference, amount, callback_url):
+            return {}
+
+    with pytest.raises(TypeError):
+        Incomplete()
+    assert isinstance(StripeProvider(), Provider)
+
+
+def test_webhooks_are_refused_when_no_secret_is_configured(app):
+    assert payment_gateway.webhook_secret is None
+    response = app.test_client().post('/api/payments/webhooks/stripe', data=b'{}', headers={'X-Signature': 'x'})
+    assert response.status_code == 404
+
+
+def test_a_deposit_waits_for_the_signed_webhook(app, client, player, gateway):
+    response = client.post('/api/payments/deposit', json={'amount': 100, 'method': 'stripe'})
+    assert response.status_code == 202
+    deposit = response.get_json()
+    assert deposit['status'] == 'pending' and len(gateway) == 1
+    assert _balance(app, player) == 1000
+
+    webhook = app.test_client()
+    assert _webhook(webhook, 'stripe', deposit['reference'], 'ch_1', True, secret='wrong').status_code == 401
+    assert _balance(app, player) == 1000
+
+    assert _webhook(webhook, 'stripe', deposit['reference'], 'ch_1', True).get_json()['status'] == 'completed'
+    # A replayed event is acknowledged but credits nothing more
+    assert _webhook(webhook, 'stripe', deposit['reference'], 'ch_1', True).status_code == 200
+    assert _balance(app, player) == 1000 + deposit['net_amount']
+
+    status = client.get(f"/api/payments/deposit/{deposit['reference']}").get_json()
+    assert status['status'] == 'completed'
+    assert status['balance_after'] == 1000 + deposit['net_amount']
+
+
+def test_a_failed_charge_closes_the_deposit_without_credit(app, client, player, gateway):
+    deposit = client.post('/api/payments/deposit', json={'amount': 100, 'method': 'paypal'}).get_json()
+
+    assert _webhook(app.test_client(), 'paypal', deposit['reference'], 'PAY-1', False).get_json()['status'] == 'failed'
+    assert _balance(app, player) == 1000
+    assert client.get(f"/api/payments/deposit/{deposit['reference']}").get_json()['status'] == 'failed'
+
+
+def test_sweep_resolves_intents_that_never_got_a_webhook(app, client, player, gateway, monkeypatch):
+    references = [client.post('/api/payments/deposit', json={'amount': 100, 'method': 'stripe'}).get_json()['reference']
+                  for _ in range(5)]
+    with app.app_context():
+        intents = PaymentIntent.query.order_by(PaymentIntent.id).all()
+        ids = [intent.id for intent in intents]
+        long_ago = datetime.now() - timedelta(hours=1)
+        # The last one timed out on its charge request, so it has no provider_ref
+        for intent, status in zip(intents, ['created', 'submitted', 'submitted', 'submitted', 'submitted']):
+            intent.status, intent.updated_at = status, long_ago
+            intent.provider_ref = f'ch_{intent.id}' if status == 'submitted' and intent is not intents[4] else None
+        intents[3].created_at = datetime.now() - timedelta(days=2)
+        db.session.commit()
+
+    verdicts = {ids[1]: True, ids[2]: False, ids[3]: None}
+    monkeypatch.setattr(payment_gateway, 'poll_deposit', lambda intent_id: _resolved(verdicts[intent_id]))
+    gateway.clear()
+
+    with app.app_context():
+        counts = PaymentService.sweep_intents(timedelta(minutes=10), timedelta(hours=24))
+    assert counts == {'resubmitted': 2, 'completed': 1, 'failed': 1, 'expired': 1, 'pending': 0, 'errors': 0}
+    assert gateway == [ids[0], ids[4]]
+
+    statuses = [client.get(f'/api/payments/deposit/{reference}').get_json()['status'] for reference in references]
+    assert statuses == ['pending', 'completed', 'failed', 'failed', 'pending']
+    assert _balance(app, player) == 1000 + 100 * (1 - PaymentService.PAYMENT_METHODS['stripe']['fee_percent'] / 100)
+
+
+def test_sweep_leaves_intents_it_cannot_look_up(app, client, gateway, monkeypatch):
+    client.post('/api/payments/deposit', json={'amount': 100, 'method': 'stripe'})
+    with app.app_context():
+        intent = PaymentIntent.query.one()
+        intent.status, intent.provider_ref = 'submitted', 'ch_x'
+        intent.created_at = intent.updated_at = datetime.now() - timedelta(days=2)
+        db.session.commit()
+
+    def unreachable(intent_id):
+        future = Future()
+        future.set_exception(ConnectionError('provider down'))
+        return future
+
+    monkeypatch.setattr(payment_gateway, 'poll_deposit', unreachable)
+    with app.app_context():
+        assert PaymentService.sweep_intents(timedelta(minutes=10), timedelta(hours=24))['errors'] == 1
+        assert PaymentIntent.query.one().status == 'submitted'
+
+
+def _serve(wsgi_app):
+    server = make_server('127.0.0.1', 0, wsgi_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def test_deposits_complete_through_the_local_stub(app, client, player, monkeypatch):
+    stub, stub_url = _serve(create_stub_app(SECRET, delay=0.05))
+    casino, casino_url = _serve(app)
+    monkeypatch.setattr(payment_gateway, 'enabled', True)
+    monkeypatch.setattr(payment_gateway, 'webhook_secret', SECRET)
+    monkeypatch.setitem(app.config, 'PAYMENT_PROVIDER_URLS', dict.fromkeys(('stripe', 'paypal', 'crypto'), stub_url))
+    monkeypatch.setitem(app.config, 'PAYMENT_WEBHOOK_BASE_URL', casino_url)
+
+    try:
+        references = [client.post('/api/payments/deposit', json={'amount': 100, 'method': method}).get_json()['reference']
+                      for method in ('stripe', 'paypal', 'crypto')]
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            statuses = [client.get(f'/api/payments/deposit/{r}').get_json()['status'] for r in references]
+            if 'pending' not in statuses:
+                break
+            time.sleep(0.05)
+    finally:
+        stub.shutdown()
+        casino.shutdown()
+
+    assert statuses == ['completed'] * 3
+    with app.app_context():
+        assert Transaction.query.filter_by(user_id=player, status='completed').count() == 3
+        assert {i.status for i in PaymentIntent.query} == {'completed'}
+
+
+@pytest.fixture
+def provider_answers(app, monkeypatch):
+    # The real gateway against a provider that answers each charge as told
+    answers = []
+
+    def charge(environ, start_response):
+        answer = answers.pop(0)
+        if answer == 'hang':
+            time.sleep(1)
+            answer = (503, {})
+        status, body = answer
+        start_response(f'{status} X', [('Content-Type', 'application/json')])
+        return [json.dumps(body).encode()]
+
+    provider, provider_url = _serve(charge)
+    monkeypatch.setitem(app.config, 'PAYMENT_PROVIDER_URLS', dict.fromkeys(('stripe', 'paypal', 'crypto'), provider_url))
+    monkeypatch.setitem(app.config, 'PAYMENT_PROVIDER_TIMEOUT', 0.2)
+    monkeypatch.setattr(payment_gateway, '_loop', None)
+    yield answers
+    provider.shutdown()
+
+
+@pytest.mark.parametrize('answer,status,provider_ref', [
+    ((201, {'id': 'ch_1', 'status': 'pending'}), 'submitted', 'ch_1'),
+    ((402, {'error': 'card_declined'}), 'failed', None),
+    ((201, {'id': 'ch_2', 'status': 'failed'}), 'failed', None),
+    ((502, {}), 'submitted', None),
+    ((429, {}), 'submitted', None),
+    ('hang', 'submitted', None),
+])
+def test_only_a_definite_decline_fails_the_charge(app, client, player, gateway, provider_answers,
+                                                  answer, status, provider_ref):
+    client.post('/api/payments/deposit', json={'amount': 100, 'method': 'stripe'})
+    with app.app_context():
+        intent_id = PaymentIntent.query.one().id
+    provider_answers.append(answer)
+
+    PaymentGateway.submit_deposit(payment_gateway, intent_id).result(5)
+    with app.app_context():
+        intent = db.session.get(PaymentIntent, intent_id)
+        assert (intent.status, intent.provider_ref) == (status, provider_ref)
+        reference = intent.transaction.reference
+    if status == 'submitted':
+        # The late webhook still credits a charge whose request got no clear answer
+        assert _webhook(app.test_client(), 'stripe', reference, 'ch_late', True).get_json()['status'] == 'completed'
+        assert _balance(app, player) > 1000
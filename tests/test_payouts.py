@@ -0,0 +1,91 @@
+import csv
+import io
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from models import db, User, Payout, PayoutStatus, Transaction, TransactionType
+
+
+@pytest.fixture
+def payouts(app, client):
+    for amount in (30, 40, 50, 60):
+        response = client.post('/api/payments/withdraw', json={
+            'amount': amount, 'method': 'bank_transfer' if amount == 60 else 'stripe',
+            'account_details': {'iban': 'DE89370400440532013000', 'name': 'Player'}
+        })
+        assert response.status_code == 200, response.get_json()
+    with app.app_context():
+        return [p.id for p in Payout.query.order_by(Payout.id)]
+
+
+def test_batch_approval_settles_the_payouts_and_returns_a_provider_file(app, admin_client, player, payouts):
+    result = admin_client.post('/api/admin/payouts/batch', json={
+        'action': 'approve', 'payout_ids': payouts[:2] + [9999]
+    }).get_json()
+
+    assert result['processed'] == payouts[:2]
+    assert result['failures'] == [{'id': 9999, 'error': 'Payout not found'}]
+    assert result['total_amount'] == 70
+    rows = list(csv.DictReader(io.StringIO(result['batch_file']['content'])))
+    assert [int(r['payout_id']) for r in rows] == payouts[:2]
+
+    with app.app_context():
+        statuses = [p.status for p in Payout.query.order_by(Payout.id)]
+        assert statuses[:2] == [PayoutStatus.COMPLETED] * 2
+        assert db.session.get(User, player).balance == 1000 - 180
+
+
+def test_a_payout_is_never_processed_twice(admin_client, payouts):
+    admin_client.post('/api/admin/payouts/batch', json={'action': 'approve', 'payout_ids': payouts[:1]})
+
+    again = admin_client.post('/api/admin/payouts/batch', json={'action': 'approve', 'payout_ids': payouts[:1]}).get_json()
+    assert again['processed'] == []
+    assert again['failures'] == [{'id': payouts[0], 'error': 'Payout is completed'}]
+    assert admin_client.post(f'/api/admin/payouts/{payouts[0]}/reject').status_code == 400
+
+
+def test_rejection_refunds_the_balance_once_per_payout(app, admin_client, player, payouts):
+    result = admin_client.post('/api/admin/payouts/batch', json={
+        'action': 'reject', 'filter': {'method': 'stripe', 'min_amount': 40}
+    }).get_json()
+
+    assert result['processed'] == payouts[1:3]
+    assert 'batch_file' not in result
+    with app.app_context():
+        assert db.session.get(User, player).balance == 1000 - 180 + 90
+        refunds = Transaction.query.filter_by(user_id=player, type=TransactionType.ADJUSTMENT).order_by(Transaction.id).all()
+        assert [t.amount for t in refunds] == [40, 50]
+        assert refunds[-1].balance_after == 1000 - 180 + 90
+
+
+def test_approval_requires_a_verified_player(app, admin_client, player, payouts):
+    with app.app_context():
+        db.session.get(User, player).kyc_verified = False
+        db.session.commit()
+
+    result = admin_client.post('/api/admin/payouts/batch', json={'action': 'approve', 'payout_ids': payouts[:1]}).get_json()
+    assert result['processed'] == []
+    assert result['failures'][0]['error'] == 'User is not KYC verified'
+
+
+def test_sepa_xml_batch_file(admin_client, payouts):
+    result = admin_client.post('/api/admin/payouts/batch', json={
+        'action': 'approve', 'payout_ids': payouts, 'format': 'xml'
+    }).get_json()
+
+    document = ET.fromstring(result['batch_file']['content'])
+    ns = {'p': 'urn:iso:std:iso:20022:tech:xsd:pain.001.001.03'}
+    assert document.find('p:CstmrCdtTrfInitn/p:GrpHdr/p:NbOfTxs', ns).text == '4'
+    assert len(document.findall('.//p:CdtTrfTxInf', ns)) == 4
+
+
+def test_process_payouts_command(app, payouts, tmp_path):
+    output = tmp_path / 'batch.csv'
+    result = app.test_cli_runner().invoke(args=[
+        'process-payouts', 'approve', '--method', 'stripe', '--admin', 'admin', '--output', str(output)
+    ])
+
+    assert result.exit_code == 0, result.output
+    assert 'approved 3 payouts totalling 120.00' in result.output
+    assert len(output.read_text().splitlines()) == 4
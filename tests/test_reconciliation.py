@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, User, Transaction, TransactionType
+from services.archive_service import ArchiveService
+from services.reconciliation_service import ReconciliationService
+
+
+@pytest.fixture
+def ledger(app, client):
+    for _ in range(5):
+        client.post('/api/games/1/play', json={'amount': 10})
+    client.post('/api/games/1/play-batch', json={'amount': 1, 'rounds': 20})
+    client.post('/api/payments/deposit', json={'amount': 100, 'method': 'stripe'})
+    client.post('/api/payments/withdraw', json={'amount': 30, 'method': 'stripe'})
+    return app.config['SQLALCHEMY_DATABASE_URI']
+
+
+def _kinds(result):
+    return [(user_id, kind, tx_id) for user_id, kind, tx_id, *_ in result['discrepancies']]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_a_consistent_ledger_reconciles_cleanly(app, ledger, player, workers):
+    with app.app_context():
+        result = ReconciliationService.reconcile(ledger, workers=workers)
+        assert result['discrepancies'] == []
+        assert result['transactions'] == Transaction.query.count()
+
+
+def test_a_balance_changed_outside_the_ledger_is_reported(app, ledger, player, tmp_path):
+    report = tmp_path / 'report.csv'
+    with app.app_context():
+        db.session.execute(db.update(User).where(User.id == player).values(balance=User.balance + 5))
+        db.session.commit()
+        result = ReconciliationService.reconcile(ledger, workers=1, report_path=str(report))
+
+    assert [kind for _, kind, _ in _kinds(result)] == ['balance_mismatch']
+    assert report.read_text().splitlines()[1].startswith(f'{player},balance_mismatch')
+
+
+def test_a_broken_chain_is_reported_at_the_first_break(app, ledger, player):
+    with app.app_context():
+        tx = Transaction.query.filter_by(user_id=player).order_by(Transaction.id).offset(3).first()
+        tx.balance_before += 1
+        db.session.commit()
+        broken = tx.id
+        result = ReconciliationService.reconcile(ledger, workers=1)
+
+    assert (player, 'chain_break', broken) in _kinds(result)
+
+
+def test_a_row_whose_amount_disagrees_with_its_balance_change_is_reported(app, ledger, player):
+    with app.app_context():
+        deposit = Transaction.query.filter_by(user_id=player, type=TransactionType.DEPOSIT).one()
+        deposit.amount = 150
+        db.session.commit()
+        tampered = deposit.id
+        result = ReconciliationService.reconcile(ledger, workers=1)
+
+    assert _kinds(result) == [(player, 'amount_mismatch', tampered)]
+
+
+def test_reconciliation_reads_through_the_archive(app, player):
+    now = datetime.now()
+    with app.app_context():
+        balance = 1000.0 - 50
+        rows = []
+        for i in range(50):
+            rows.append(dict(user_id=player, type=TransactionType.WIN, amount=1.0, balance_before=balance,
+                             balance_after=balance + 1, status='completed',
+                             timestamp=now - timedelta(days=400 - i * 8), reference=f'R{i}'))
+            balance += 1
+        db.session.execute(db.insert(Transaction), rows)
+        db.session.commit()
+        uri = app.config['SQLALCHEMY_DATABASE_URI']
+
+        ArchiveService.archive(horizon_days=90, tables=['transactions'])
+        hot = Transaction.query.order_by(Transaction.id).all()
+        assert 0 < len(hot) < 50
+        boundary = hot[0].id
+
+        result = ReconciliationService.reconcile(uri, workers=2)
+        assert result['transactions'] == 50
+        assert result['discrepancies'] == []
+
+        # Shift the hot rows so the chain breaks exactly where the archive ends
+        for tx in hot:
+            tx.balance_before += 5
+            tx.balance_after += 5
+        db.session.get(User, player).balance += 5
+        db.session.commit()
+        result = ReconciliationService.reconcile(uri, workers=1)
+
+    assert _kinds(result) == [(player, 'chain_break', boundary)]
@@ -0,0 +1,58 @@
+from sqlalchemy import MetaData, Table, inspect, text
+
+from models import db, User, Session
+from utils.db import upgrade_schema
+
+# What the models gained since the last release that only had db.create_all()
+NEW_TABLES = {'payment_intents', 'user_daily_totals', 'game_stats_hourly', 'idempotency_keys', 'autoplay_runs'}
+NEW_COLUMNS = {('users', 'version'), ('games', 'version'), ('support_tickets', 'version'), ('transactions', 'fee'),
+               ('payouts', 'transaction_id'), ('sessions', 'token_hash'), ('bets', 'round_data')}
+
+
+def _old_release_schema(engine):
+    db.drop_all()
+    old = MetaData()
+    for table in db.metadata.sorted_tables:
+        if table.name not in NEW_TABLES:
+            Table(table.name, old, *[c._copy() for c in table.columns if (table.name, c.name) not in NEW_COLUMNS])
+    old.create_all(engine)
+
+
+def test_upgrade_brings_an_old_database_up_to_the_models(app):
+    with app.app_context():
+        engine = db.engine
+        _old_release_schema(engine)
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO users (username, email, password_hash, role, status, balance, registered_at) "
+                              "VALUES ('legacy', 'legacy@example.com', 'x', 'PLAYER', 'ACTIVE', 5, '2024-01-01')"))
+
+        statements = upgrade_schema()
+        assert any('ADD COLUMN version INTEGER DEFAULT 0 NOT NULL' in s for s in statements)
+
+        inspector = inspect(engine)
+        assert NEW_TABLES <= set(inspector.get_table_names())
+        for table, column in NEW_COLUMNS:
+            assert column in {c['name'] for c in inspector.get_columns(table)}
+        assert 'ix_sessions_token_hash' in {i['name'] for i in inspector.get_indexes('sessions')}
+
+        # Rows written by the old release load and save through the new models
+        user = User.query.filter_by(username='legacy').one()
+        assert user.version == 0
+        db.session.add(Session(user_id=user.id, ip_address='127.0.0.1', token_hash='a' * 64))
+        db.session.commit()
+
+        assert upgrade_schema() == []
+
+
+def test_upgrade_is_a_no_op_on_a_current_database(app):
+    with app.app_context():
+        assert upgrade_schema() == []
+
+
+def test_upgrade_db_command(app):
+    with app.app_context():
+        _old_release_schema(db.engine)
+
+    result = app.test_cli_runner().invoke(args=['upgrade-db'])
+    assert 'ALTER TABLE users ADD COLUMN version' in result.output
+    assert app.test_cli_runner().invoke(args=['upgrade-db']).output.strip() == 'Schema is up to date'
@@ -0,0 +1,96 @@
+import time
+
+import pytest
+from flask import Flask
+from itsdangerous import Signer
+
+from utils.sessions import MemorySessionStore, ServerSessionInterface, init_sessions, serializer
+
+
+class CountingStore(MemorySessionStore):
+
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def set(self, sid, value, ttl):
+        self.writes += 1
+        super().set(sid, value, ttl)
+
+
+@pytest.fixture
+def store(app, monkeypatch):
+    store = CountingStore()
+    monkeypatch.setattr(app, 'session_interface', ServerSessionInterface(store))
+    return store
+
+
+def _plant(app, store, client):
+    # A session id the attacker obtained before the victim signed in
+    sid = 'planted-session-id'
+    store.set(sid, serializer.dumps({'e': time.time() + 3600, 'd': {'seen': True}}), 3600)
+    cookie = Signer(app.secret_key, salt='server-session').sign(sid.encode()).decode()
+    client.set_cookie('session', cookie)
+    return sid, cookie
+
+
+def test_any_node_sharing_the_store_serves_the_session(app, store, login):
+    client = login()
+    cookie = client.get_cookie('session').value
+    # The cookie carries only the signed id; the data is in the store
+    sid = Signer(app.secret_key, salt='server-session').unsign(cookie).decode()
+    assert '_user_id' in serializer.loads(store.get(sid))['d']
+
+    other_node = app.test_client()
+    other_node.set_cookie('session', cookie)
+    assert other_node.get('/api/auth/status').get_json()['authenticated']
+
+
+def test_plain_reads_never_write_the_store(store, login):
+    client = login()
+    writes = store.writes
+
+    for _ in range(3):
+        assert client.get('/api/auth/status').get_json()['authenticated']
+    assert store.writes == writes
+    assert 'Set-Cookie' not in client.get('/health').headers
+
+
+def test_login_rotates_a_planted_session_id(app, store):
+    victim = app.test_client()
+    sid, cookie = _plant(app, store, victim)
+
+    assert victim.post('/api/auth/login', json={'username': 'player', 'password': 'Test123!'}).status_code == 200
+    assert victim.get_cookie('session').value != cookie
+    assert store.get(sid) is None
+
+    attacker = app.test_client()
+    attacker.set_cookie('session', cookie)
+    assert not attacker.get('/api/auth/status').get_json()['authenticated']
+    assert victim.get('/api/auth/status').get_json()['authenticated']
+
+
+def test_logout_drops_the_stored_session(app, store, login):
+    client = login()
+    cookie = client.get_cookie('session').value
+    client.post('/api/auth/logout')
+
+    replayed = app.test_client()
+    replayed.set_cookie('session', cookie)
+    assert not replayed.get('/api/auth/status').get_json()['authenticated']
+    assert not client.get('/api/auth/status').get_json()['authenticated']
+
+
+def test_a_forged_session_cookie_is_ignored(app, store, login):
+    client = login()
+    forged = app.test_client()
+    forged.set_cookie('session', client.get_cookie('session').value[:-2] + 'xx')
+
+    assert not forged.get('/api/auth/status').get_json()['authenticated']
+
+
+def test_unknown_session_types_are_refused():
+    app = Flask(__name__)
+    app.config['SESSION_TYPE'] = 'memcached'
+    with pytest.raises(ValueError):
+        init_sessions(app)
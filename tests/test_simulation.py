@@ -0,0 +1,37 @@
+import pytest
+
+from models import db, Game
+from services.simulation_service import SimulationService
+
+
+def test_simulation_converges_on_the_theoretical_rtp(app):
+    with app.app_context():
+        game = db.session.get(Game, 1)
+        result = SimulationService.simulate_game(game, 200_000, workers=1, chunk_size=50_000, seed=3)
+
+    assert result['rounds'] == 200_000
+    low, high = result['rtp_ci_95']
+    margin = (high - low) / 2
+    assert abs(result['empirical_rtp'] - result['theoretical_rtp']) < 2 * margin
+    assert result['std_dev'] ** 2 == pytest.approx(result['variance'])
+
+
+def test_seeded_runs_are_reproducible(app):
+    with app.app_context():
+        game = db.session.get(Game, 2)
+        first = SimulationService.simulate_game(game, 30_000, workers=1, chunk_size=7_000, seed=11)
+        second = SimulationService.simulate_game(game, 30_000, workers=1, chunk_size=7_000, seed=11)
+
+    assert first == second
+
+
+def test_simulate_rtp_command_reports_each_requested_game(app):
+    result = app.test_cli_runner().invoke(args=[
+        'simulate-rtp', '--rounds', '20000', '--game-id', '1', '--game-id', '3', '--workers', '1', '--seed', '1'
+    ])
+
+    assert result.exit_code == 0, result.output
+    assert '#1 Lucky 7' in result.output
+    assert '#3 Poker' in result.output
+    assert 'Roulette' not in result.output
+    assert result.output.count('empirical RTP') == 2
@@ -0,0 +1,52 @@
+import pytest
+
+from models import db, User, Transaction
+from services.unit_of_work import unit_of_work
+
+
+@pytest.mark.parametrize('url,body', [
+    ('/api/games/1/play', {'amount': 1}),
+    ('/api/games/1/play-batch', {'amount': 1, 'rounds': 10}),
+    ('/api/payments/deposit', {'amount': 100, 'method': 'stripe'}),
+    ('/api/payments/withdraw', {'amount': 50, 'method': 'stripe'}),
+])
+def test_money_flows_commit_once(client, url, body):
+    response = client.post(url, json=body)
+
+    assert response.status_code == 200, response.get_json()
+    assert response.headers['X-DB-Commits'] == '1'
+
+
+def test_nested_units_commit_with_the_outermost(app, player):
+    with app.test_request_context():
+        with unit_of_work():
+            db.session.get(User, player).username = 'renamed'
+            with unit_of_work():
+                db.session.get(User, player).email = 'renamed@example.com'
+            # The inner unit left the work pending
+            assert db.session.get(User, player) in db.session.dirty
+
+        db.session.expire_all()
+        user = db.session.get(User, player)
+        assert (user.username, user.email) == ('renamed', 'renamed@example.com')
+
+
+def test_a_failure_rolls_back_the_whole_unit(app, player):
+    with app.test_request_context():
+        with pytest.raises(RuntimeError):
+            with unit_of_work():
+                db.session.add(Transaction(user_id=player, amount=1, reference='UOW-1'))
+                with unit_of_work():
+                    raise RuntimeError('declined')
+
+        assert Transaction.query.filter_by(reference='UOW-1').count() == 0
+
+
+@pytest.mark.parametrize('enabled', [False, True])
+def test_db_stats_headers_stay_out_of_production_responses(app, client, monkeypatch, enabled):
+    monkeypatch.setattr(app, 'testing', False)
+    monkeypatch.setitem(app.config, 'DB_STATS_HEADERS', enabled)
+
+    response = client.post('/api/games/1/play', json={'amount': 1})
+    assert ('X-DB-Commits' in response.headers) is enabled
+    assert ('X-DB-Flushes' in response.headers) is enabled
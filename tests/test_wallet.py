@@ -0,0 +1,50 @@
+from models import db, User
+from services.wallet_service import WalletService
+
+
+def test_debit_refuses_to_overdraw(app, player):
+    with app.app_context():
+        user = db.session.get(User, player)
+        assert WalletService.debit(user, 1000.01) is None
+        assert WalletService.debit(user, 400) == 600
+        assert WalletService.debit(user, 600.01) is None
+        db.session.commit()
+
+        db.session.expire_all()
+        assert db.session.get(User, player).balance == 600
+
+
+def test_debit_applies_to_the_stored_balance_not_the_loaded_one(app, player):
+    with app.app_context():
+        user = db.session.get(User, player)
+        assert user.balance == 1000
+
+        # Another request moves the balance after this one loaded the row
+        WalletService.apply_to(player, -300, required=300)
+        assert WalletService.debit(user, 500) == 200
+        assert user.balance == 200
+        assert WalletService.debit(user, 500) is None
+
+        # The loaded object is not dirty, so a flush cannot write an old balance back
+        user.last_login = None
+        db.session.commit()
+        db.session.expire_all()
+        assert db.session.get(User, player).balance == 200
+
+
+def test_credit_has_no_floor(app, player):
+    with app.app_context():
+        user = db.session.get(User, player)
+        assert WalletService.credit(user, 25) == 1025
+        db.session.commit()
+        db.session.expire_all()
+        assert db.session.get(User, player).balance == 1025
+
+
+def test_debit_without_returning_support(app, player, monkeypatch):
+    with app.app_context():
+        monkeypatch.setattr(db.engine.dialect, 'update_returning', False)
+        user = db.session.get(User, player)
+        assert WalletService.debit(user, 100) == 900
+        assert WalletService.debit(user, 10000) is None
+        assert user not in db.session.dirty
@@ -0,0 +1,91 @@
+import atexit
+import queue
+import threading
+from flask import has_request_context
+from models import db, AuditLog
+
+
+class AuditWriter:
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._app = None
+        self._engine = None
+        self._thread = None
+        self._registered = False
+        self._write_lock = threading.Lock()
+        self.sync = True
+        self.batch_size = 500
+        self.flush_interval = 1.0
+
+    def init_app(self, app):
+        self._app = app
+        self.sync = app.config.get('AUDIT_LOG_SYNC', False) or app.config.get('TESTING', False)
+        self.batch_size = app.config.get('AUDIT_BATCH_SIZE', 500)
+        self.flush_interval = app.config.get('AUDIT_FLUSH_INTERVAL', 1.0)
+        self._queue = queue.Queue(maxsize=app.config.get('AUDIT_QUEUE_SIZE', 10000))
+
+        with app.app_context():
+            self._engine = db.engine
+
+        # Sync mode still keeps audit rows out of the request transaction:
+        # they are written on their own connection once the view is done
+        app.teardown_request(lambda exc: self.flush() if self.sync else None)
+
+        if not self.sync and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+        if not self._registered:
+            atexit.register(self.flush)
+            self._registered = True
+
+    def enqueue(self, row):
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            # Never drop audit events; this one row pays for a synchronous
+            # write and the queued backlog is left to the writer thread
+            self._write([row])
+            return
+
+        if self.sync and not has_request_context():
+            self.flush()
+
+    def flush(self):
+        rows = self._drain([])
+        if rows:
+            self._write(rows)
+        return len(rows)
+
+    def _drain(self, rows):
+        while True:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                return rows
+
+    def _write(self, rows):
+        if not rows or self._engine is None:
+            return
+        try:
+            with self._write_lock, self._engine.begin() as conn:
+                for start in range(0, len(rows), self.batch_size):
+                    conn.execute(db.insert(AuditLog), rows[start:start + self.batch_size])
+        except Exception:
+            self._app.logger.exception(f'Failed to write {len(rows)} audit log entries')
+
+    def _run(self):
+        while True:
+            try:
+                rows = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(rows) < self.batch_size:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(rows)
+
+
+audit_writer = AuditWriter()
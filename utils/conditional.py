@@ -0,0 +1,56 @@
+import hashlib
+import threading
+from functools import wraps
+from flask import current_app, request, make_response
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def conditional(version):
+    # ETag/If-None-Match for polled GET endpoints. version(*args, **kwargs)
+    # must be cheap and change whenever the response would; a matching tag
+    # is answered with 304 before the view runs. Sits below @login_required.
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            digest = hashlib.sha1(f'{request.endpoint}:{version(*args, **kwargs)!r}'.encode()).hexdigest()
+            etag = digest[:20]
+
+            if request.if_none_match.contains_weak(etag):
+                _record(request.endpoint, hit=True)
+                response = current_app.response_class(status=304)
+            else:
+                _record(request.endpoint, hit=False)
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            # Browsers revalidate every poll and reuse their copy on 304
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.update(('Cookie', 'Authorization'))
+            return response
+
+        return decorated_function
+    return decorator
+
+
+def _record(endpoint, hit):
+    with _stats_lock:
+        counts = _stats.setdefault(endpoint, [0, 0])
+        counts[0 if hit else 1] += 1
+
+
+def conditional_stats():
+    # Per process since start-up
+    with _stats_lock:
+        snapshot = {endpoint: tuple(counts) for endpoint, counts in _stats.items()}
+    return {
+        endpoint: {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else 0.0
+        }
+        for endpoint, (hits, misses) in sorted(snapshot.items())
+    }
@@ -0,0 +1,79 @@
+from sqlalchemy import inspect, literal, text
+from sqlalchemy.schema import CreateIndex
+from models import db
+
+
+def upsert_increment(model, keys, increments, maximums=None):
+    # INSERT ... ON CONFLICT (keys) DO UPDATE SET col = col + excluded.col
+    # and, for maximums, col = max(col, excluded.col)
+    maximums = maximums or {}
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        greatest = db.func.greatest
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        greatest = db.func.max
+    else:
+        insert = None
+
+    if insert is None:
+        values = {k: getattr(model, k) + v for k, v in increments.items()}
+        values.update({
+            k: db.case((getattr(model, k) < v, v), else_=getattr(model, k))
+            for k, v in maximums.items()
+        })
+        updated = db.session.execute(
+            db.update(model)
+            .where(*[getattr(model, k) == v for k, v in keys.items()])
+            .values(values)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not updated:
+            db.session.execute(db.insert(model).values(**keys, **increments, **maximums))
+        return
+
+    stmt = insert(model).values(**keys, **increments, **maximums)
+    set_ = {k: getattr(model, k) + stmt.excluded[k] for k in increments}
+    set_.update({k: greatest(getattr(model, k), stmt.excluded[k]) for k in maximums})
+    stmt = stmt.on_conflict_do_update(index_elements=list(keys), set_=set_)
+    db.session.execute(stmt)
+
+
+def upgrade_schema():
+    # Brings a database created by an older release up to the models:
+    # db.create_all() only adds missing tables, so columns and indexes that
+    # were added to existing tables are added here. Safe to run repeatedly.
+    # Returns the DDL it ran.
+    db.create_all()
+    engine = db.engine
+    dialect = engine.dialect
+    inspector = inspect(engine)
+    statements = []
+
+    for table in db.metadata.sorted_tables:
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=dialect)}'
+            for fk in column.foreign_keys:
+                ddl += f' REFERENCES {fk.column.table.name} ({fk.column.name})'
+            default = column.default.arg if column.default is not None and column.default.is_scalar else None
+            if default is not None:
+                ddl += ' DEFAULT ' + str(literal(default, column.type).compile(
+                    dialect=dialect, compile_kwargs={'literal_binds': True}))
+            if not column.nullable and default is not None:
+                # Existing rows take the default, so the constraint holds from the start
+                ddl += ' NOT NULL'
+            statements.append(text(ddl))
+
+        indexes = {i['name'] for i in inspector.get_indexes(table.name)}
+        statements.extend(
+            CreateIndex(index) for index in table.indexes if index.name not in indexes
+        )
+
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.execute(statement)
+    return [str(statement.compile(dialect=dialect)).strip() for statement in statements]
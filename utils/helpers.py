@@ -2,16 +2,13 @@ import csv
 import json
 from io import StringIO
 from datetime import datetime, timedelta
-import secrets
-import string
+from utils.ids import id_generator
 
 def format_currency(amount):
     return f"${amount:,.2f}"
 
 def generate_reference(prefix='REF'):
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    random_str = ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(6))
-    return f"{prefix}_{timestamp}_{random_str}"
+    return f"{prefix}_{id_generator.next()}"
 
 def export_to_csv(data, filename='report.csv'):
     if not data:
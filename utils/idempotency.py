@@ -0,0 +1,148 @@
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, request, jsonify, make_response
+from flask_login import current_user
+from sqlalchemy.exc import IntegrityError
+from models import db, IdempotencyKey
+
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def idempotent(f):
+    # Replays the stored response for a repeated Idempotency-Key; must sit
+    # below @login_required since keys are scoped per user
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({'error': 'Idempotency-Key must be at most 255 characters'}), 400
+
+        user_id = current_user.id
+        fingerprint = hashlib.sha256(
+            b'\n'.join([request.method.encode(), request.path.encode(), request.get_data()])
+        ).hexdigest()
+
+        record = _claim(user_id, key, fingerprint)
+        if record is not None:
+            if record.fingerprint != fingerprint:
+                return jsonify({'error': 'Idempotency-Key was already used with a different request'}), 422
+            record = _wait(user_id, key)
+            if record is None:
+                return jsonify({'error': 'The original request with this Idempotency-Key failed, please retry'}), 409
+            if record.status_code is None:
+                return jsonify({'error': 'A request with this Idempotency-Key is still in progress'}), 409
+            return _replay(record)
+
+        event = threading.Event()
+        with _in_flight_lock:
+            _in_flight[(user_id, key)] = event
+        try:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code >= 500:
+                _release(user_id, key)
+            else:
+                _store(user_id, key, response)
+            return response
+        except Exception:
+            _release(user_id, key)
+            raise
+        finally:
+            with _in_flight_lock:
+                _in_flight.pop((user_id, key), None)
+            event.set()
+
+    return decorated_function
+
+
+def purge_expired():
+    deleted = db.session.execute(
+        db.delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.now())
+    ).rowcount
+    db.session.commit()
+    return deleted
+
+
+def _claim(user_id, key, fingerprint):
+    # Returns None once this request owns the key, else the existing record
+    now = datetime.now()
+    for _ in range(2):
+        try:
+            db.session.add(IdempotencyKey(
+                user_id=user_id,
+                key=key,
+                fingerprint=fingerprint,
+                expires_at=now + timedelta(seconds=current_app.config.get('IDEMPOTENCY_IN_FLIGHT_TTL', 60))
+            ))
+            db.session.commit()
+            return None
+        except IntegrityError:
+            db.session.rollback()
+
+        existing = db.session.get(IdempotencyKey, (user_id, key), populate_existing=True)
+        if existing is not None and existing.expires_at >= now:
+            return existing
+        # Expired replay, or an abandoned claim: evict it and try again
+        db.session.execute(
+            db.delete(IdempotencyKey).where(
+                IdempotencyKey.user_id == user_id,
+                IdempotencyKey.key == key,
+                IdempotencyKey.expires_at < now
+            )
+        )
+        db.session.commit()
+
+    return db.session.get(IdempotencyKey, (user_id, key), populate_existing=True)
+
+
+def _wait(user_id, key):
+    # The local event wakes same-process duplicates at once; polling covers other workers
+    deadline = time.monotonic() + current_app.config.get('IDEMPOTENCY_WAIT_TIMEOUT', 10)
+    while True:
+        with _in_flight_lock:
+            event = _in_flight.get((user_id, key))
+        if event is not None:
+            event.wait(max(0, min(0.1, deadline - time.monotonic())))
+
+        db.session.rollback()
+        record = db.session.get(IdempotencyKey, (user_id, key), populate_existing=True)
+        if record is None or record.status_code is not None or time.monotonic() >= deadline:
+            return record
+        if event is None:
+            time.sleep(0.1)
+
+
+def _store(user_id, key, response):
+    db.session.rollback()
+    db.session.execute(
+        db.update(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        .values(
+            status_code=response.status_code,
+            response_body=response.get_data(as_text=True),
+            content_type=response.content_type,
+            expires_at=datetime.now() + timedelta(seconds=current_app.config.get('IDEMPOTENCY_KEY_TTL', 86400))
+        )
+    )
+    db.session.commit()
+
+
+def _release(user_id, key):
+    # A failed attempt leaves nothing to replay, so the client may retry
+    db.session.rollback()
+    db.session.execute(
+        db.delete(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+    )
+    db.session.commit()
+
+
+def _replay(record):
+    response = make_response(record.response_body, record.status_code)
+    response.content_type = record.content_type
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
@@ -0,0 +1,61 @@
+import os
+import threading
+import time
+
+CROCKFORD = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+# 128-bit id: 48-bit ms timestamp | 16-bit node | 22-bit worker (pid) | 42-bit sequence
+NODE_BITS = 16
+WORKER_BITS = 22
+SEQUENCE_BITS = 42
+
+
+class IdGenerator:
+
+    def __init__(self, node_id=0):
+        self.node_id = node_id
+        self._lock = threading.Lock()
+        self._reset()
+
+    def init_app(self, app):
+        node_id = int(app.config.get('NODE_ID', 0))
+        if not 0 <= node_id < 1 << NODE_BITS:
+            raise ValueError(f'NODE_ID must be between 0 and {(1 << NODE_BITS) - 1}')
+        self.node_id = node_id
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._last_ms = 0
+        self._sequence = 0
+
+    def next_int(self):
+        with self._lock:
+            if os.getpid() != self._pid:
+                # Forked worker: never continue the parent's sequence
+                self._reset()
+
+            # Never step backwards, even if the wall clock does
+            now = max(int(time.time() * 1000), self._last_ms)
+            if now == self._last_ms:
+                self._sequence += 1
+                if self._sequence >> SEQUENCE_BITS:
+                    now += 1
+                    self._sequence = 0
+            else:
+                self._sequence = 0
+            self._last_ms = now
+
+            worker = self._pid & ((1 << WORKER_BITS) - 1)
+            return (((now << NODE_BITS | self.node_id) << WORKER_BITS | worker) << SEQUENCE_BITS) | self._sequence
+
+    def next(self):
+        # 26 Crockford base32 characters; lexical order matches generation order
+        value = self.next_int()
+        chars = []
+        for _ in range(26):
+            chars.append(CROCKFORD[value & 31])
+            value >>= 5
+        return ''.join(reversed(chars))
+
+
+id_generator = IdGenerator()
@@ -0,0 +1,46 @@
+import json
+import struct
+
+# version, outcome index into the game's compiled table, RNG draw
+ROUND_FORMAT = struct.Struct('<BHd')
+ROUND_VERSION = 1
+UNKNOWN_OUTCOME = 0xFFFF
+
+
+def pack_round(outcome, draw):
+    if outcome is None:
+        outcome = UNKNOWN_OUTCOME
+    return ROUND_FORMAT.pack(ROUND_VERSION, outcome, draw)
+
+
+def unpack_round(blob):
+    version, outcome, draw = ROUND_FORMAT.unpack(blob)
+    return {
+        'outcome': None if outcome == UNKNOWN_OUTCOME else outcome,
+        'random_seed': draw
+    }
+
+
+def describe_round(bet, game):
+    # Rebuilds the legacy game_data shape from the packed facts plus the
+    # columns that already live on the bet and game rows
+    if bet.round_data:
+        facts = unpack_round(bet.round_data)
+    elif bet.game_data:
+        try:
+            return json.loads(bet.game_data)
+        except ValueError:
+            return {}
+    else:
+        return {}
+
+    facts.update({
+        'timestamp': bet.timestamp.isoformat() if bet.timestamp else None,
+        'game_type': game.category if game else None,
+        'volatility': game.volatility if game else None,
+        'result_type': bet.result,
+        'multiplier': bet.multiplier,
+        'rtp': game.rtp if game else None,
+        'bet_amount': bet.amount
+    })
+    return facts
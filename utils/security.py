@@ -1,10 +1,11 @@
+import os
 import re
-import bcrypt
 import hashlib
 import secrets
+import threading
 from datetime import datetime
 from flask import request
-from models import db, AuditLog
+from utils.audit import audit_writer
 
 def validate_password(password):
     if len(password) < 8:
@@ -29,26 +30,27 @@ def validate_email(email):
     return re.match(pattern, email) is not None
 
 def generate_password_hash(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    # One hashing path for the whole app: the pooled hasher and its cost policy
+    from services.password_hasher import password_hasher
+    return password_hasher.hash(password)
 
 def check_password_hash(password_hash, password):
-    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    from services.password_hasher import password_hasher
+    return password_hasher.verify(password_hash, password)
 
 def create_audit_log(action, description, user_id=None, request_obj=None):
     try:
         ip_address = request_obj.remote_addr if request_obj else 'unknown'
         user_agent = request_obj.user_agent.string if request_obj else 'unknown'
         
-        log = AuditLog(
-            actor_id=user_id,
-            action=action,
-            description=description,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            timestamp=datetime.now()
-        )
-        db.session.add(log)
-        db.session.commit()
+        audit_writer.enqueue({
+            'actor_id': user_id,
+            'action': action,
+            'description': description,
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'timestamp': datetime.now()
+        })
         return True
     except Exception as e:
         print(f"Failed to create audit log: {e}")
@@ -58,4 +60,26 @@ def generate_secure_random():
     return secrets.randbelow(10000) / 10000.0
 
 def hash_string(input_string):
-    return hashlib.sha256(input_string.encode()).hexdigest()
\ No newline at end of file
+    return hashlib.sha256(input_string.encode()).hexdigest()
+
+class SecureRandomBuffer:
+    def __init__(self, buffer_size=4096):
+        self.buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self._buffer = b''
+        self._offset = 0
+        self._pid = None
+
+    def random(self):
+        with self._lock:
+            if self._pid != os.getpid() or self._offset + 8 > len(self._buffer):
+                # Refill after fork too, so workers never replay the parent's bytes
+                self._buffer = os.urandom(self.buffer_size)
+                self._offset = 0
+                self._pid = os.getpid()
+            chunk = self._buffer[self._offset:self._offset + 8]
+            self._offset += 8
+        return (int.from_bytes(chunk, 'big') >> 11) * (1.0 / (1 << 53))
+
+
+secure_random = SecureRandomBuffer()
@@ -0,0 +1,207 @@
+import secrets
+import threading
+import time
+from flask import session
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin, SecureCookieSessionInterface
+from itsdangerous import Signer, BadSignature
+
+serializer = TaggedJSONSerializer()
+
+
+class MemorySessionStore:
+    # Per-process store for development and single-node runs
+
+    def __init__(self, max_size=100000):
+        self._lock = threading.Lock()
+        self._data = {}
+        self.max_size = max_size
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._data[sid]
+                return None
+            return entry[1]
+
+    def set(self, sid, value, ttl):
+        now = time.time()
+        with self._lock:
+            if len(self._data) >= self.max_size:
+                for key in [k for k, (deadline, _) in self._data.items() if deadline < now]:
+                    del self._data[key]
+            self._data[sid] = (now + ttl, value)
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+
+class RedisSessionStore:
+    # Any Redis-protocol server; sessions expire there with their lifetime
+
+    def __init__(self, client, prefix='session:'):
+        self._client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, prefix='session:'):
+        import redis
+        return cls(redis.Redis.from_url(url), prefix)
+
+    def get(self, sid):
+        value = self._client.get(self.prefix + sid)
+        return value.decode() if isinstance(value, bytes) else value
+
+    def set(self, sid, value, ttl):
+        self._client.set(self.prefix + sid, value, ex=max(1, int(ttl)))
+
+    def delete(self, sid):
+        self._client.delete(self.prefix + sid)
+
+
+class ServerSession(SessionMixin):
+    # Reads its record on first access only, so requests that never touch
+    # the session never reach the store
+
+    def __init__(self, store, sid, new=False):
+        self._store = store
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.accessed = False
+        self.expires_at = None
+        self._data = {} if new else None
+
+    @property
+    def loaded(self):
+        return self.accessed or self.modified
+
+    def _load(self):
+        self.accessed = True
+        if self._data is None:
+            record = self._store.get(self.sid)
+            if record is None:
+                # Unknown or expired id: start over under a fresh one
+                self.sid = secrets.token_urlsafe(32)
+                self.new = True
+                self._data = {}
+            else:
+                record = serializer.loads(record)
+                self.expires_at = record['e']
+                self._data = record['d']
+        return self._data
+
+    def regenerate(self):
+        # Moves the data under a fresh id and drops the old record, so an id
+        # handed out before authentication is worthless after it
+        data = self._load()
+        if not self.new:
+            self._store.delete(self.sid)
+        self.sid = secrets.token_urlsafe(32)
+        self.new = True
+        self.modified = True
+        self._data = data
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __setitem__(self, key, value):
+        self._load()[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self._load()[key]
+        self.modified = True
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+
+class ServerSessionInterface(SessionInterface):
+    # Only a signed session id lives in the cookie; the data lives in the
+    # store, which is written when the session changes or passes half its
+    # lifetime, never on plain reads
+
+    def __init__(self, store):
+        self.store = store
+
+    def _signer(self, app):
+        if app.config.get('SESSION_USE_SIGNER', True):
+            return Signer(app.secret_key, salt='server-session')
+        return None
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        signer = self._signer(app)
+        if cookie:
+            try:
+                sid = signer.unsign(cookie).decode() if signer else cookie
+                return ServerSession(self.store, sid)
+            except BadSignature:
+                pass
+        return ServerSession(self.store, secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session.loaded:
+            return
+        response.vary.add('Cookie')
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        now = time.time()
+        stale = session.expires_at is None or session.expires_at - now < lifetime / 2
+        if not (session.modified or session.new or stale):
+            return
+
+        self.store.set(session.sid, serializer.dumps({'e': now + lifetime, 'd': dict(session)}), lifetime)
+        signer = self._signer(app)
+        response.set_cookie(
+            name,
+            signer.sign(session.sid.encode()).decode() if signer else session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+
+
+def regenerate_session():
+    # Call when a request changes who the session belongs to; signed cookie
+    # sessions carry no server-side id, so there is nothing to rotate
+    regenerate = getattr(session, 'regenerate', None)
+    if regenerate is not None:
+        regenerate()
+
+
+def init_sessions(app):
+    # cookie: signed client-side sessions; memory: one node only;
+    # redis: shared, so nodes need no sticky sessions
+    session_type = app.config.get('SESSION_TYPE', 'cookie')
+    if session_type == 'cookie':
+        app.session_interface = SecureCookieSessionInterface()
+    elif session_type == 'memory':
+        app.session_interface = ServerSessionInterface(MemorySessionStore())
+    elif session_type == 'redis':
+        app.session_interface = ServerSessionInterface(
+            RedisSessionStore.from_url(app.config['REDIS_URL'], app.config.get('SESSION_KEY_PREFIX', 'session:'))
+        )
+    else:
+        raise ValueError(f'Unknown SESSION_TYPE {session_type!r}; use cookie, memory or redis')
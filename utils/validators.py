@@ -1,7 +1,4 @@
 import re
-from datetime import datetime
-from flask import current_app
-from models import Bet, db
 
 def sanitize_input(input_string):
     if not input_string:
@@ -26,17 +23,10 @@ def validate_bet_amount(user, game, amount):
     if amount > float(user.balance):
         return False, "Insufficient balance"
     
-    today = datetime.now().date()
-    today_loss = Bet.query.with_entities(
-        db.func.sum(Bet.amount - Bet.win_amount)
-    ).filter(
-        Bet.user_id == user.id,
-        Bet.timestamp >= today,
-        Bet.result != 'return'
-    ).scalar() or 0
-    
-    if today_loss + amount > current_app.config.get('DAILY_LOSS_LIMIT', 1000):
-        return False, "Daily loss limit exceeded"
+    from services.limits_service import LimitsService
+    error = LimitsService.check_bet(user, amount)
+    if error:
+        return False, error
     
     return True, "Valid bet"
 